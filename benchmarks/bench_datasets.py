@@ -0,0 +1,66 @@
+"""Measure the load times of the datasets with and without the column cache.
+
+For every ticker all available timeframes are loaded by parsing the CSV
+files, by building the cache (cold) and from the cache (warm). Run from the
+repository root:
+
+    python benchmarks/bench_datasets.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import pandas as pd
+
+import src.utils.datasets as datasets
+
+
+tickers = ['BTCBUSD', 'ETHBUSD', 'SOLBUSD', 'BNBBUSD', 'DOGEBUSD',
+           'LINKBUSD', 'LTCBUSD', 'MATICBUSD', 'XRPBUSD']
+
+
+def timeframes(ticker: str) -> list:
+    """Returns the timeframes available for a ticker."""
+
+    return sorted(name[:-len('.csv')] for name in
+                  os.listdir(os.path.join(datasets.DATASETS_DIR, ticker)))
+
+
+def timed(load: callable, ticker: str) -> float:
+    """Loads every timeframe of a ticker and returns the time it took."""
+
+    start = time.perf_counter()
+    for timeframe in timeframes(ticker):
+        # Read the whole close column, so memory-mapped loads are paid for.
+        load(ticker, timeframe).close.sum()
+
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+
+        def cached(ticker, timeframe):
+            return datasets.load_bars(ticker, timeframe,
+                                      cache_dir=cache_dir)
+
+        def csv(ticker, timeframe):
+            return pd.read_csv(datasets.csv_path(ticker, timeframe))
+
+        print(f'{"ticker":>9} {"timeframes":>22} {"read_csv":>10} '
+              f'{"cold":>10} {"warm":>10}')
+
+        for ticker in tickers:
+            parsed = timed(csv, ticker)
+            cold = timed(cached, ticker)
+            warm = timed(cached, ticker)
+            print(f'{ticker:>9} {",".join(timeframes(ticker)):>22} '
+                  f'{parsed*1000:>8.1f}ms {cold*1000:>8.1f}ms '
+                  f'{warm*1000:>8.1f}ms')
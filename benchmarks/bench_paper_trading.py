@@ -0,0 +1,80 @@
+"""Measure how many trade logs one event loop can drive per candle.
+
+Replays the last candles of BTCBUSD and ETHBUSD 1h unpaced to a growing
+number of ContinuationTrade subscribers, split evenly between both
+streams, and reports the per-candle latency and queue depth. Run from the
+repository root:
+
+    python benchmarks/bench_paper_trading.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import numpy as np
+
+from src.Assets import Asset, Params, TradeData
+from src.MarketStructure import MarketStructure
+from src.PaperTrading import ReplayServer
+from src.strategies.ContinuationTrade import ContinuationTrade
+from src.Strategy import TradeLog
+from src.utils.replay import CsvReplay
+import src.utils.datasets as datasets
+
+
+tickers = ['BTCBUSD', 'ETHBUSD']
+timeframe = '1h'
+candles = 2000
+subscriber_counts = [2, 20, 200, 1000]
+
+
+def make_server(subscribers: int) -> ReplayServer:
+    """Builds a server replaying the last candles to the subscribers."""
+
+    sources = {}
+    for ticker in tickers:
+        bars = datasets.load_bars(ticker, timeframe)
+        sources[ticker] = CsvReplay(ticker, timeframe,
+                                    start_after=int(bars.open_time[-candles]))
+    server = ReplayServer(sources)
+
+    for idx in range(subscribers):
+        ticker = tickers[idx % len(tickers)]
+        first = datasets.load_bars(ticker, timeframe)[-candles]
+        ms = MarketStructure((first.high, first.open_time),
+                             (first.low, first.open_time),
+                             (first.high, first.open_time),
+                             (first.low, first.open_time))
+        risk = 0.01 + 0.09 * idx / subscribers
+        server.subscribe(ticker, TradeLog(ContinuationTrade(),
+                                          Asset(ticker, 3, ms),
+                                          Params(risk, 2.0, 5, timeframe),
+                                          TradeData(0.0004)))
+
+    return server
+
+
+if __name__ == '__main__':
+
+    print(f'{"subscribers":>11} {"p50 us":>10} {"p99 us":>10} '
+          f'{"max depth":>9} {"bars/s":>10}')
+
+    for subscribers in subscriber_counts:
+        server = make_server(subscribers)
+        start = time.perf_counter()
+        asyncio.run(server.run())
+        elapsed = time.perf_counter() - start
+
+        latencies = np.concatenate([subscriber.latencies
+                                    for subscriber in server.subscribers])
+        p50, p99 = np.percentile(latencies * 1e6, [50, 99])
+        depth = max(max(subscriber.depths)
+                    for subscriber in server.subscribers)
+        print(f'{subscribers:>11} {p50:>10,.0f} {p99:>10,.0f} '
+              f'{depth:>9} {latencies.size / elapsed:>10,.0f}')
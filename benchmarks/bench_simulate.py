@@ -0,0 +1,61 @@
+"""Measure the bar throughput of TradeLog.simulate on the BTCBUSD datasets.
+
+Compares the pd.Series loop over DataFrame.iterrows with the columnar loop
+over NumPy arrays. Run from the repository root:
+
+    python benchmarks/bench_simulate.py
+"""
+
+import os
+import sys
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import pandas as pd
+
+from src.Assets import Asset, Params, TradeData
+from src.MarketStructure import MarketStructure
+from src.strategies.ContinuationTrade import ContinuationTrade
+from src.Strategy import TradeLog
+
+
+timeframes = ['1d', '4h', '1h', '30m']
+
+
+def make_trade_log(df: pd.DataFrame) -> TradeLog:
+    """Builds a fresh trade log starting at the first candle of df."""
+
+    first = df.iloc[0]
+    date = first['open time']
+    ms = MarketStructure((first.high, date), (first.low, date),
+                         (first.high, date), (first.low, date))
+
+    return TradeLog(ContinuationTrade(), Asset('BTCBUSD', 3, ms),
+                    Params(0.05, 2.0, 5), TradeData(0.0004))
+
+
+def bars_per_second(df: pd.DataFrame, columnar: bool) -> float:
+    """Simulates df once and returns the number of bars per second."""
+
+    trade_log = make_trade_log(df)
+    start = time.perf_counter()
+    trade_log.simulate(df, columnar=columnar)
+
+    return len(df) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+
+    print(f'{"timeframe":>9} {"bars":>7} {"iterrows":>12} '
+          f'{"columnar":>12} {"speedup":>8}')
+
+    for timeframe in timeframes:
+        df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/'
+                         + timeframe + '.csv')
+        before = bars_per_second(df, columnar=False)
+        after = bars_per_second(df, columnar=True)
+        print(f'{timeframe:>9} {len(df):>7} {before:>12,.0f} '
+              f'{after:>12,.0f} {after/before:>7.1f}x')
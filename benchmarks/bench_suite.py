@@ -0,0 +1,416 @@
+"""Run the benchmark suite of the backtest engine and track regressions.
+
+Covers TradeLog.simulate, MarketStructure.next_bar, Backtest.train over the
+parameter grid of backtest.py, every metric of utils/metrics, loading the
+datasets and plot_backtest, on every timeframe of the BTCBUSD and ETHBUSD
+datasets. Every case runs in a forked process, so its peak RSS is not
+inflated by earlier cases. The results are written as JSON with the wall
+time, bars per second and peak RSS of every case, and can be compared with
+a stored baseline. Run from the repository root:
+
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --filter simulate --output run.json
+    python benchmarks/bench_suite.py --save-baseline
+    python benchmarks/bench_suite.py --compare --threshold 0.2
+
+The baseline depends on the machine, so none is shipped: save it on the
+machine comparing against it. With --compare the script exits with status
+1 if a case got slower, or grew its peak RSS, by more than the threshold.
+It also exits with status 1 if a case fails. On shared or throttled
+machines timings drift by tens of percent between runs, so raise the
+threshold there.
+"""
+
+import argparse
+import contextlib
+from dataclasses import dataclass
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from src.Backtest import Backtest
+import src.backtest as backtest
+from src.strategies.ContinuationTrade import ContinuationTrade
+import src.utils.datasets as datasets
+import src.utils.metrics as metrics
+import src.utils.plotting as plotting
+
+
+tickers = [backtest.Tickers.BTCBUSD.value, backtest.Tickers.ETHBUSD.value]
+BASELINE = os.path.join(currentdir, 'baseline.json')
+
+# Metrics computed from equity curves, all others from returns
+_CURVE_METRICS = {metrics.calculate_returns, metrics.calculate_max_drawdown,
+                  metrics.calculate_musch, metrics.get_stats,
+                  metrics.calculate_returns_2d,
+                  metrics.calculate_max_drawdown_2d,
+                  metrics.calculate_musch_2d}
+
+
+@dataclass
+class Case:
+    """Hold one benchmark.
+
+    ...
+
+    Attributes
+    ----------
+    name : str
+        The unique name of the case, group/ticker/timeframe.
+    bars : int
+        The number of candles processed by one run.
+    make : callable
+        Prepares a run untimed and returns the timed callable.
+    pure : bool
+        If True, the timed callable may be called repeatedly on the same
+        preparation, which fast cases need to be timed precisely.
+    """
+
+    name: str
+    bars: int
+    make: callable
+    pure: bool = False
+
+
+def timeframes(ticker: str) -> list:
+    """Returns the timeframes with a dataset for a ticker."""
+
+    return sorted((name[:-len('.csv')] for name in
+                   os.listdir(os.path.join(datasets.DATASETS_DIR, ticker))),
+                  key=lambda timeframe: datasets.TIMEFRAME_MS[timeframe])
+
+
+def make_trade_log(df: pd.DataFrame, ticker: tuple, timeframe: str):
+    """Builds the first trade log of the parameter grid of backtest.py."""
+
+    return backtest.make_trade_logs(df, ticker, ContinuationTrade(),
+                                    timeframe)[0]
+
+
+def dataset_cases(ticker: tuple, timeframe: str) -> list:
+    """Builds all cases of one dataset."""
+
+    name, tag = ticker[0], f'{ticker[0]}/{timeframe}'
+    df = datasets.load_frame(name, timeframe)
+    bars = datasets.load_bars(name, timeframe)
+    n = len(df)
+
+    def simulate():
+        trade_log = make_trade_log(df, ticker, timeframe)
+        return lambda: trade_log.simulate(bars)
+
+    def market_structure():
+        ms = make_trade_log(df, ticker, timeframe).asset.ms
+        next_bar = ms.next_bar
+
+        def run():
+            for bar in bars:
+                next_bar(bar)
+        return run
+
+    def train(vectorized: bool):
+        def make():
+            trade_logs = backtest.make_trade_logs(df, ticker,
+                                                  ContinuationTrade(),
+                                                  timeframe)
+            return lambda: Backtest().train(
+                trade_logs, bars, metrics.calculate_returns,
+                metrics.calculate_sharpe, vectorized=vectorized)
+        return make
+
+    def load_csv():
+        return lambda: pd.read_csv(datasets.csv_path(name, timeframe))
+
+    def load_bars():
+        # The column cache is built outside of the timed run.
+        datasets.load_bars(name, timeframe)
+        return lambda: datasets.load_bars(name, timeframe).close.sum()
+
+    def plot():
+        trade_log = make_trade_log(df, ticker, timeframe)
+        trade_log.simulate(bars)
+        curve = trade_log.trade_data.equity_curve.copy()
+        split = round(len(curve) * backtest.train_test_split)
+        directory = tempfile.mkdtemp()
+
+        def run():
+            # plot_backtest saves relative to the working directory.
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    plotting.plot_backtest(trade_log, 'bench',
+                                           curve[:split], curve[split-1:],
+                                           seed=0)
+            finally:
+                os.chdir(cwd)
+                plt.close('all')
+        return run
+
+    n_grid = len(backtest.make_trade_logs(df, ticker, ContinuationTrade(),
+                                          timeframe))
+    cases = [Case(f'simulate/{tag}', n, simulate),
+             Case(f'market_structure/{tag}', n, market_structure),
+             Case(f'train/{tag}', n*n_grid, train(False)),
+             Case(f'train_vectorized/{tag}', n*n_grid, train(True)),
+             Case(f'load_csv/{tag}', n, load_csv, pure=True),
+             Case(f'load_bars/{tag}', n, load_bars, pure=True),
+             Case(f'plot_backtest/{tag}', n, plot)]
+
+    curve = df['close'].to_numpy()
+    for metric in metric_functions():
+        rows = n_grid if metric.__name__.endswith('_2d') else 1
+        cases.append(Case(f'metrics.{metric.__name__}/{tag}', n*rows,
+                          metric_case(metric, curve, n_grid), pure=True))
+
+    return cases
+
+
+def metric_functions() -> list:
+    """Returns every metric function of utils/metrics."""
+
+    return [getattr(metrics, name) for name in dir(metrics)
+            if (name.startswith('calculate_') or name == 'get_stats')
+            and callable(getattr(metrics, name))]
+
+
+def metric_case(metric: callable, curve: np.array, rows: int) -> callable:
+    """Builds the preparation of a metric case.
+
+    Batch metrics are applied to the curve stacked as often as the
+    parameter grid has candidates.
+    """
+
+    def make():
+        data = curve if metric in _CURVE_METRICS \
+            else metrics.calculate_returns(curve)
+        if metric.__name__.endswith('_2d'):
+            data = np.tile(data, (rows, 1))
+        return lambda: metric(data)
+
+    return make
+
+
+def build_cases() -> list:
+    """Builds the cases of all datasets."""
+
+    cases = []
+    for ticker in tickers:
+        for timeframe in timeframes(ticker[0]):
+            cases += dataset_cases(ticker, timeframe)
+
+    return cases
+
+
+def measure(case: Case, repeat: int, min_time: float,
+            max_time: float) -> dict:
+    """Runs a case and returns its best time and peak RSS.
+
+    Pure cases are called in loops of growing size until a loop takes at
+    least min_time. Runs are repeated until repeat runs are done and a
+    quarter of max_time is spent, but never beyond max_time, so short
+    cases get many runs and their best time is stable.
+    """
+
+    loops = 1
+    if case.pure:
+        run = case.make()
+        while True:
+            start = time.perf_counter()
+            for _ in range(loops):
+                run()
+            if time.perf_counter() - start >= min_time or loops >= 10**6:
+                break
+            loops *= 10
+
+    times = []
+    spent = 0.
+    while not times or (spent < max_time
+                        and (len(times) < repeat or spent < max_time/4)):
+        run = case.make()
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed / loops)
+        spent += elapsed
+
+    best = min(times)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    scale = 1 if sys.platform == 'darwin' else 1024
+
+    return {'name': case.name, 'bars': case.bars, 'runs': len(times),
+            'loops': loops, 'wall_seconds': best,
+            'mean_seconds': sum(times) / len(times),
+            'bars_per_second': case.bars / best if best else 0.,
+            'peak_rss_bytes': resource.getrusage(
+                resource.RUSAGE_SELF).ru_maxrss * scale}
+
+
+def run_isolated(cases: list, idx: int, repeat: int, min_time: float,
+                 max_time: float) -> dict:
+    """Measures a case in a forked process, or here without fork.
+
+    Returns None if the case raised or its process died.
+    """
+
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        try:
+            return measure(cases[idx], repeat, min_time, max_time)
+        except Exception as error:
+            print(f'{cases[idx].name} raised {error!r}', file=sys.stderr)
+            return None
+
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+
+    def child():
+        sender.send(measure(cases[idx], repeat, min_time, max_time))
+
+    process = context.Process(target=child)
+    process.start()
+    # Only the child may hold the sending end, so the pipe reports EOF as
+    # soon as the child exits without a result.
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = None
+    finally:
+        receiver.close()
+        process.join()
+
+    return result if process.exitcode == 0 else None
+
+
+def compare(results: list, baseline: list, threshold: float) -> list:
+    """Compares results with a baseline.
+
+    Parameters
+    ----------
+    results : list
+        The results of this run.
+    baseline : list
+        The results of the baseline run.
+    threshold : float
+        The relative increase of the wall time or peak RSS counted as a
+        regression.
+
+    Returns
+    -------
+    list
+        The (name, field, baseline, current) of every regression.
+    """
+
+    previous = {result['name']: result for result in baseline}
+    regressions = []
+    for result in results:
+        if result['name'] not in previous:
+            continue
+        for field in ['wall_seconds', 'peak_rss_bytes']:
+            before, now = previous[result['name']][field], result[field]
+            if before and now > (1+threshold) * before:
+                regressions.append((result['name'], field, before, now))
+
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--filter', default='',
+                        help='only run cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per case, the best one counts')
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help='seconds a loop of a fast case takes at least')
+    parser.add_argument('--max-time', type=float, default=2.,
+                        help='seconds after which a case is not repeated')
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='the baseline file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results to the baseline file')
+    parser.add_argument('--compare', action='store_true',
+                        help='compare the results with the baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slowdown counted as a regression')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    args = parse_args()
+    cases = [case for case in build_cases() if args.filter in case.name]
+
+    print(f'{"case":<44} {"bars/s":>12} {"wall ms":>10} {"rss MB":>8}')
+    results = []
+    failed = []
+    for idx, case in enumerate(cases):
+        result = run_isolated(cases, idx, args.repeat, args.min_time,
+                              args.max_time)
+        if result is None:
+            failed.append(case.name)
+            print(f'{case.name:<44} {"FAILED":>12}')
+            continue
+        results.append(result)
+        print(f'{case.name:<44} {result["bars_per_second"]:>12,.0f} '
+              f'{result["wall_seconds"]*1000:>10.2f} '
+              f'{result["peak_rss_bytes"]/2**20:>8.1f}')
+
+    report = {'meta': {'created': datetime.datetime.now().isoformat(),
+                       'python': platform.python_version(),
+                       'numpy': np.__version__,
+                       'platform': platform.platform(),
+                       'cpus': os.cpu_count()},
+              'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    regressions = []
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            sys.exit(f'No baseline at {args.baseline}, save one on this '
+                     'machine with --save-baseline first.')
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, field, before, now in regressions:
+            print(f'REGRESSION {name} {field}: {before:.6g} -> {now:.6g} '
+                  f'({now/before - 1:+.0%})')
+        if not regressions:
+            print(f'No regressions beyond {args.threshold:.0%}.')
+
+    if args.save_baseline and not (failed or regressions):
+        if args.filter and os.path.exists(args.baseline):
+            # Only replace the cases of this run.
+            with open(args.baseline) as f:
+                kept = [result for result in json.load(f)['results']
+                        if args.filter not in result['name']]
+            report['results'] = kept + results
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if failed:
+        print(f'{len(failed)} cases failed: {", ".join(failed)}')
+    if failed or regressions:
+        sys.exit(1)
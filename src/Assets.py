@@ -12,13 +12,22 @@ Params:
 TradeData:
     Implement a dataclass TradeData holding relevant information for one trade
     for one set of parameters.
+LaneData:
+    Implement a dataclass LaneData holding the same information as TradeData
+    for many sets of parameters at once, with one array lane per set.
+MarginAccount:
+    Implement a dataclass MarginAccount holding the cash and positions shared
+    by the trade data of several assets.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import math
 
 import numpy as np
 
-from src.MarketStructure import MarketStructure
+from src.Ledger import Ledger
+from src.MarketStructure import MarketStructure, MarketStructureState
+from src.utils.metrics import RunningStats
 
 
 @dataclass
@@ -36,12 +45,57 @@ class Asset:
         The maximum number of decimals allowed for the asset.
     ms : MarketStructure
         The current market structure of the asset.
+
+    Methods
+    -------
+    snapshot() -> MarketStructureState:
+        Returns the current state of the market structure of the asset.
+    restore(state: MarketStructureState) -> None:
+        Puts the market structure of the asset back into a previous state.
+    copy() -> Asset:
+        Returns the same asset with an independent market structure.
     """
 
     ticker: str
     decimals: int
     ms: MarketStructure
 
+    def snapshot(self) -> MarketStructureState:
+        """Returns the current state of the market structure of the asset.
+
+        Returns
+        -------
+        MarketStructureState
+            The state of the market structure.
+        """
+
+        return self.ms.snapshot()
+
+    def restore(self, state: MarketStructureState) -> None:
+        """Puts the market structure of the asset back into a previous state.
+
+        Parameters
+        ----------
+        state : MarketStructureState
+            The state returned by snapshot.
+        """
+
+        self.ms.restore(state)
+
+    def copy(self) -> 'Asset':
+        """Returns the same asset with an independent market structure.
+
+        Use this to give every TradeLog of a parameter grid its own market
+        structure starting from the same state.
+
+        Returns
+        -------
+        Asset
+            A new asset whose market structure is a copy of this one.
+        """
+
+        return Asset(self.ticker, self.decimals, self.ms.copy())
+
 
 @dataclass
 class Params:
@@ -67,10 +121,13 @@ class Params:
     timeframe: str = '1h'
 
 
-@dataclass
+@dataclass(slots=True)
 class TradeData:
     """Represent the data of a trade.
 
+    The attributes live in slots instead of a per instance dict, which
+    keeps thousands of candidates of a sweep small.
+
     ...
 
     Attributes
@@ -102,9 +159,33 @@ class TradeData:
     short_position : bool
         True if the strategy is currently in an active short trade.
     equity_curve : np.array
-        The equity curve of the strategy.
+        The equity curve of the strategy. This is a zero-copy view into a
+        growable float64 buffer owned by the instance, so it only stays
+        valid until the next append_equity call that has to grow it.
     equity : float
         The current equity value of the strategy.
+    stats : RunningStats
+        If set, updated with every point appended to the equity curve.
+    keep_curve : bool
+        If False, only the last point of the equity curve is kept.
+    ledger : Ledger
+        If set, records the entry and exit of every trade.
+    account : MarginAccount
+        If set, entries are capped by the free margin of this shared
+        account. Only honoured by TradeLog.simulate and TradeLog.push.
+
+    Methods
+    -------
+    track_stats(keep_curve: bool) -> None:
+        Starts accumulating the performance metrics of the equity curve.
+    record_trades() -> None:
+        Starts recording every trade in a ledger.
+    reserve(n: int) -> None:
+        Makes room for n more points on the equity curve.
+    append_equity(value: float) -> None:
+        Appends a point to the equity curve in amortized constant time.
+    extend_equity(values: np.ndarray) -> None:
+        Appends several points to the equity curve at once.
     """
 
     exchange_fees: float
@@ -120,8 +201,131 @@ class TradeData:
     long_position: bool = False
     short_trigger: bool = False
     short_position: bool = False
-    equity_curve: np.array = np.array([100.0])
     equity: float = 100.0
+    stats: RunningStats = field(default=None, repr=False, compare=False)
+    keep_curve: bool = True
+    ledger: Ledger = field(default=None, repr=False, compare=False)
+    account: 'MarginAccount' = field(default=None, repr=False, compare=False)
+    _curve: np.ndarray = field(init=False, repr=False, compare=False)
+    _curve_length: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._curve = np.empty(64)
+        self._curve[0] = self.equity
+        self._curve_length = 1
+
+    @property
+    def equity_curve(self) -> np.ndarray:
+        """Returns a view of the equity curve recorded so far."""
+
+        return self._curve[:self._curve_length]
+
+    @equity_curve.setter
+    def equity_curve(self, values: np.ndarray) -> None:
+        """Replaces the equity curve by a copy of the given values."""
+
+        values = np.asarray(values, dtype=np.float64).ravel()
+        self._curve = np.empty(max(64, values.shape[0]))
+        self._curve[:values.shape[0]] = values
+        self._curve_length = values.shape[0]
+
+    def track_stats(self, keep_curve: bool = True) -> None:
+        """Starts accumulating the performance metrics of the equity curve.
+
+        From now on every appended point updates stats in constant time,
+        starting from the last point recorded so far.
+
+        Parameters
+        ----------
+        keep_curve : bool
+            If False, the equity curve is dropped down to its last point and
+            only that point is kept from now on, so long simulations that
+            are scored by their stats run in constant memory.
+        """
+
+        self.stats = RunningStats()
+        self.stats.update(float(self.equity_curve[-1]))
+        self.keep_curve = keep_curve
+        if not keep_curve:
+            self.equity_curve = self.equity_curve[-1:]
+
+    def record_trades(self) -> None:
+        """Starts recording every trade in a ledger.
+
+        The bar indices of the ledger count the candles simulated from now
+        on, so call this before the first simulation of the trade data.
+        """
+
+        self.ledger = Ledger()
+
+    def reserve(self, n: int) -> None:
+        """Makes room for n more points on the equity curve.
+
+        Call this with the length of the data before a simulation so the
+        buffer is allocated once instead of grown while appending.
+
+        Parameters
+        ----------
+        n : int
+            The number of points about to be appended.
+        """
+
+        if not self.keep_curve:
+            return
+
+        required = self._curve_length + n
+        if required > self._curve.shape[0]:
+            curve = np.empty(required)
+            curve[:self._curve_length] = self.equity_curve
+            self._curve = curve
+
+    def append_equity(self, value: float) -> None:
+        """Appends a point to the equity curve.
+
+        The buffer doubles in size whenever it is full, so appends run in
+        amortized constant time.
+
+        Parameters
+        ----------
+        value : float
+            The equity value to append.
+        """
+
+        if self.stats is not None:
+            self.stats.update(value)
+        if self.ledger is not None:
+            self.ledger.bar += 1
+        if not self.keep_curve:
+            self._curve[0] = value
+            return
+
+        if self._curve_length == self._curve.shape[0]:
+            self.reserve(self._curve_length)
+        self._curve[self._curve_length] = value
+        self._curve_length += 1
+
+    def extend_equity(self, values: np.ndarray) -> None:
+        """Appends several points to the equity curve at once.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            The equity values to append.
+        """
+
+        if self.stats is not None:
+            self.stats.extend(values)
+        if self.ledger is not None:
+            self.ledger.bar += len(values)
+        if not self.keep_curve:
+            if len(values):
+                self._curve[0] = values[-1]
+            return
+
+        self.reserve(len(values))
+        self._curve[self._curve_length:self._curve_length+len(values)] = \
+            values
+        self._curve_length += len(values)
 
     @property
     def mark_to_market(self) -> float:
@@ -136,4 +340,329 @@ class TradeData:
         if self.long_position or self.short_position:
             return (self.position*self.close) + self.equity
         else:
-            return self.equity_curve[-1]
+            return self._curve[self._curve_length-1]
+
+
+@dataclass
+class LaneData:
+    """Represent the data of trades for many sets of parameters at once.
+
+    Every attribute of TradeData is stored as a NumPy array with one lane
+    per set of parameters, so a strategy can advance all of them with a
+    few vectorized operations per candle.
+
+    ...
+
+    Attributes
+    ----------
+    risk, reward_risk, leverage : np.ndarray
+        The parameters of every lane.
+    exchange_fees : np.ndarray
+        The exchange fees of every lane.
+    entry, stop_loss, target, close : np.ndarray
+        The prices of the current trade of every lane, NaN if unset.
+    num_trades, wins, win_rate : np.ndarray
+        The trade counters of every lane.
+    position, equity : np.ndarray
+        The position size and the equity of every lane.
+    long_trigger, long_position, short_trigger, short_position : np.ndarray
+        The trade flags of every lane.
+    curve : np.ndarray
+        The equity curves recorded so far, one row per candle and one column
+        per lane. The first row holds the last point before the simulation.
+    ledgers : list
+        The ledger of every lane, None if no lane records its trades.
+
+    Methods
+    -------
+    from_trade_data(trade_data: list, params: list, n: int) -> LaneData:
+        Stacks the trade data of several parameter sets into lanes.
+    write_back(trade_data: list) -> None:
+        Copies the state of every lane back into its TradeData.
+    append_equity(values: np.ndarray) -> None:
+        Appends one point per lane to the equity curves.
+    """
+
+    risk: np.ndarray
+    reward_risk: np.ndarray
+    leverage: np.ndarray
+    exchange_fees: np.ndarray
+    entry: np.ndarray
+    stop_loss: np.ndarray
+    target: np.ndarray
+    close: np.ndarray
+    num_trades: np.ndarray
+    wins: np.ndarray
+    win_rate: np.ndarray
+    position: np.ndarray
+    equity: np.ndarray
+    long_trigger: np.ndarray
+    long_position: np.ndarray
+    short_trigger: np.ndarray
+    short_position: np.ndarray
+    curve: np.ndarray
+    curve_length: int = 1
+    ledgers: list = None
+
+    @classmethod
+    def from_trade_data(cls, trade_data: list, params: list,
+                        n: int) -> 'LaneData':
+        """Stacks the trade data of several parameter sets into lanes.
+
+        Parameters
+        ----------
+        trade_data : list
+            The TradeData of every lane.
+        params : list
+            The Params of every lane.
+        n : int
+            The number of candles about to be simulated.
+
+        Returns
+        -------
+        LaneData
+            The lanes in the state of the given trade data.
+        """
+
+        def column(values: list, dtype: type) -> np.ndarray:
+            return np.array([np.nan if value is None else value
+                             for value in values], dtype=dtype)
+
+        def attribute(name: str, dtype: type) -> np.ndarray:
+            return column([getattr(data, name) for data in trade_data], dtype)
+
+        curve = np.empty((n+1, len(trade_data)))
+        curve[0] = [data.equity_curve[-1] for data in trade_data]
+
+        return cls(column([p.risk for p in params], float),
+                   column([p.reward_risk for p in params], float),
+                   column([p.leverage for p in params], float),
+                   attribute('exchange_fees', float),
+                   attribute('entry', float), attribute('stop_loss', float),
+                   attribute('target', float), attribute('close', float),
+                   attribute('num_trades', float), attribute('wins', int),
+                   attribute('win_rate', float), attribute('position', float),
+                   attribute('equity', float),
+                   attribute('long_trigger', bool),
+                   attribute('long_position', bool),
+                   attribute('short_trigger', bool),
+                   attribute('short_position', bool), curve,
+                   ledgers=None if all(data.ledger is None
+                                       for data in trade_data)
+                   else [data.ledger for data in trade_data])
+
+    def write_back(self, trade_data: list) -> None:
+        """Copies the state of every lane back into its TradeData.
+
+        Parameters
+        ----------
+        trade_data : list
+            The TradeData of every lane, in the order of from_trade_data.
+        """
+
+        def scalar(value: float) -> float:
+            return None if np.isnan(value) else float(value)
+
+        for lane, data in enumerate(trade_data):
+            data.entry = scalar(self.entry[lane])
+            data.stop_loss = scalar(self.stop_loss[lane])
+            data.target = scalar(self.target[lane])
+            data.close = scalar(self.close[lane])
+            data.num_trades = float(self.num_trades[lane])
+            data.wins = int(self.wins[lane])
+            data.win_rate = float(self.win_rate[lane])
+            data.position = float(self.position[lane])
+            data.equity = float(self.equity[lane])
+            data.long_trigger = bool(self.long_trigger[lane])
+            data.long_position = bool(self.long_position[lane])
+            data.short_trigger = bool(self.short_trigger[lane])
+            data.short_position = bool(self.short_position[lane])
+            data.extend_equity(self.curve[1:self.curve_length, lane])
+
+    def append_equity(self, values: np.ndarray) -> None:
+        """Appends one point per lane to the equity curves.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            The equity value of every lane.
+        """
+
+        self.curve[self.curve_length] = values
+        self.curve_length += 1
+
+    def bar(self, lane: int) -> int:
+        """Returns the index of the current candle in the ledger of a lane.
+
+        Parameters
+        ----------
+        lane : int
+            The index of the lane.
+
+        Returns
+        -------
+        int
+            The index of the candle being simulated, counted like the bar of
+            the ledger.
+        """
+
+        return self.ledgers[lane].bar + self.curve_length - 1
+
+    @property
+    def mark_to_market(self) -> np.ndarray:
+        """Returns the current equity value of every lane.
+
+        Returns
+        -------
+        np.ndarray
+            The current equity value of every lane marked to market.
+        """
+
+        return np.where(self.long_position | self.short_position,
+                        (self.position*self.close) + self.equity,
+                        self.curve[self.curve_length-1])
+
+
+@dataclass
+class MarginAccount:
+    """Hold the cash and positions shared by the trade data of several assets.
+
+    Every asset is a leg of the account. The value of a leg is its position
+    marked at the last close seen for its asset, and the account keeps the
+    sum of the values and of their absolute values up to date, so all
+    queries take constant time however many legs there are.
+
+    ...
+
+    Attributes
+    ----------
+    cash : float
+        The cash of the account, including the proceeds of short positions.
+    max_leverage : float
+        The highest ratio of the gross exposure to the equity. Entries are
+        cut down to the exposure still allowed.
+    positions : list
+        The position of every leg.
+    prices : list
+        The last close of every leg.
+    value : float
+        The sum of the values of all legs.
+    exposure : float
+        The sum of the absolute values of all legs.
+
+    Methods
+    -------
+    with_legs(n: int, cash: float, max_leverage: float) -> MarginAccount:
+        Opens an account without positions on n legs.
+    headroom() -> float:
+        Returns the exposure that may still be added.
+    cap(coins: float, price: float, decimals: int) -> float:
+        Cuts an entry down to the headroom of the account.
+    leg_equity(leg: int) -> float:
+        Returns the equity of the account without the value of one leg.
+    mark(leg: int, position: float, price: float) -> None:
+        Updates the position and price of one leg.
+    """
+
+    cash: float
+    max_leverage: float = 1.
+    positions: list = field(default_factory=list)
+    prices: list = field(default_factory=list)
+    value: float = 0.
+    exposure: float = 0.
+
+    @classmethod
+    def with_legs(cls, n: int, cash: float,
+                  max_leverage: float = 1.) -> 'MarginAccount':
+        """Opens an account without positions on n legs."""
+
+        return cls(cash, max_leverage, [0.]*n, [0.]*n)
+
+    @property
+    def equity(self) -> float:
+        """Returns the cash plus the value of all legs."""
+
+        return self.cash + self.value
+
+    @property
+    def margin_used(self) -> float:
+        """Returns the equity tied up by the gross exposure."""
+
+        return self.exposure / self.max_leverage
+
+    def headroom(self) -> float:
+        """Returns the exposure that may still be added.
+
+        Returns
+        -------
+        float
+            The gross exposure allowed by max_leverage minus the current
+            one, at least 0.
+        """
+
+        return max(0., self.max_leverage*self.equity - self.exposure)
+
+    def cap(self, coins: float, price: float, decimals: int) -> float:
+        """Cuts an entry down to the headroom of the account.
+
+        Parameters
+        ----------
+        coins : float
+            The number of coins the strategy wants to trade.
+        price : float
+            The entry price.
+        decimals : int
+            The number of decimals coins are traded in.
+
+        Returns
+        -------
+        float
+            The coins, rounded down to fit into the headroom if they
+            exceed it.
+        """
+
+        if coins*price <= self.headroom():
+            return coins
+
+        scale = 10**decimals
+
+        return math.floor(self.headroom()/price * scale) / scale
+
+    def leg_equity(self, leg: int) -> float:
+        """Returns the equity of the account without the value of one leg.
+
+        This is the cash as seen by the trade data of the leg, so that its
+        own position marked to market adds up to the equity of the account.
+
+        Parameters
+        ----------
+        leg : int
+            The index of the leg.
+
+        Returns
+        -------
+        float
+            The equity minus the value of the leg.
+        """
+
+        return self.cash + self.value - self.positions[leg]*self.prices[leg]
+
+    def mark(self, leg: int, position: float, price: float) -> None:
+        """Updates the position and price of one leg.
+
+        Parameters
+        ----------
+        leg : int
+            The index of the leg.
+        position : float
+            The position of the leg, negative when short.
+        price : float
+            The last close of the asset of the leg.
+        """
+
+        old = self.positions[leg]*self.prices[leg]
+        new = position*price
+        self.value += new - old
+        self.exposure += abs(new) - abs(old)
+        self.positions[leg] = position
+        self.prices[leg] = price
@@ -6,19 +6,53 @@ Backtest:
     Provide parameter optimization and testing for a strategy.
 """
 
+from concurrent.futures import ProcessPoolExecutor
+import copy
+from multiprocessing import shared_memory
+import time
+
+import numpy as np
 import pandas as pd
 
-from Strategy import TradeLog
+from src.Assets import TradeData
+from src.Bars import BarArrays
+from src.MarketStructure import MarketStructureState, StructureArrays
+from src.Pruning import PruningPolicy
+from src.Search import SearchStrategy, features
+from src.SimulationCache import SimulationCache
+from src.Strategy import TradeLog
+import src.utils.metrics as metrics
+from src.utils.profiling import Profiler
 
 
 class Backtest():
-    """Backtests a trading strategy on historical data."""
+    """Backtests a trading strategy on historical data.
+
+    ...
+
+    Attributes
+    ----------
+    cache : SimulationCache
+        If set, train and test replay the results of earlier simulations
+        instead of simulating again. Parallel training does not use it.
+    profiler : Profiler
+        If set, every simulation of train and test is profiled, and the
+        counts of all candidates are added up, including those simulated
+        by worker processes.
+    """
 
-    def __init__(self):
-        pass
+    def __init__(self, cache: SimulationCache = None,
+                 profiler: Profiler = None):
+        self.cache = cache
+        self.profiler = profiler
 
     def train(self, trade_logs: list, data: pd.DataFrame,
-              return_metric: callable, reward_metric: callable) -> TradeLog:
+              return_metric: callable, reward_metric: callable,
+              structure: StructureArrays = None,
+              workers: int = 1, vectorized: bool = False,
+              streaming: bool = False,
+              pruning: PruningPolicy = None,
+              search: SearchStrategy = None) -> TradeLog:
         """Train the model on a set of training data.
 
         Parameters
@@ -31,6 +65,39 @@ class Backtest():
             The function to compute the returns of a trade.
         reward_metric : callable
             The metric to be used to evaluate the performance of a trade.
+        structure : StructureArrays
+            The market structure of data precomputed once by
+            MarketStructure.batch and shared by all candidates.
+        workers : int
+            The number of worker processes simulating candidates in
+            parallel. With more than one worker, the OHLC arrays are placed
+            in shared memory once, the workers only send back the reward of
+            each candidate, and the best candidate is simulated once more in
+            this process. The result does not depend on the number of
+            workers.
+        vectorized : bool
+            If True, all candidates are simulated in a single pass over the
+            data with TradeLog.simulate_grid instead of one after another.
+            The candidates have to share strategy and asset, and workers is
+            ignored.
+        streaming : bool
+            If True, candidates are scored by a RunningStats accumulator
+            updated while simulating, and keep only the last point of their
+            equity curves. The reward_metric has to be one of the
+            metrics.RUNNING_METRICS. The best candidate is simulated once
+            more to record its full equity curve.
+        pruning : PruningPolicy
+            If given, candidates are simulated up to the checkpoints of the
+            policy, and only the candidates it keeps are simulated further.
+            The counts of simulated and skipped candles are recorded on the
+            policy. Candidates are simulated in this process, so workers is
+            ignored.
+        search : SearchStrategy
+            If given, only the candidates proposed by the search are
+            simulated, batch by batch, until it is done or its budget is
+            spent. The batches are simulated in lanes if vectorized, else
+            by the worker processes if there is more than one, and pruning
+            is ignored.
 
         Returns
         -------
@@ -38,21 +105,52 @@ class Backtest():
             The strategy that performed best on training data.
         """
 
+        if streaming and reward_metric not in metrics.RUNNING_METRICS:
+            raise ValueError(f'{reward_metric.__name__} cannot be computed '
+                             'from running stats.')
+
+        if pruning is not None:
+            pruning.reset()
+
+        if search is not None and not streaming:
+            return self._train_search(trade_logs, data, return_metric,
+                                      reward_metric, structure, vectorized,
+                                      search, workers)
+
+        if workers > 1 and not vectorized and pruning is None:
+            return self._train_parallel(trade_logs, data, return_metric,
+                                        reward_metric, structure, workers,
+                                        streaming)
+
+        if streaming:
+            return self._train_streaming(trade_logs, data, return_metric,
+                                         reward_metric, structure, vectorized,
+                                         pruning, search)
+
+        if pruning is not None:
+            return self._train_pruned(trade_logs, data, return_metric,
+                                      reward_metric, structure, vectorized,
+                                      pruning)
+
+        if vectorized:
+            self._simulate(trade_logs, data, structure, vectorized)
+            rewards = _rewards([log.trade_data for log in trade_logs],
+                               return_metric, reward_metric)
+            return trade_logs[_argmax_first(rewards)]
+
         log = trade_logs.pop(0)
-        log.simulate(data)
+        self._simulate([log], data, structure)
 
-        returns = return_metric(log.trade_data.equity_curve)
-        reward_tmp = reward_metric(returns)
+        reward_tmp = _reward(log.trade_data, return_metric, reward_metric)
 
         optimal_trade = log
         reward_max = reward_tmp
 
         for log in trade_logs:
 
-            log.simulate(data)
+            self._simulate([log], data, structure)
 
-            returns = return_metric(log.trade_data.equity_curve)
-            reward_tmp = reward_metric(returns)
+            reward_tmp = _reward(log.trade_data, return_metric, reward_metric)
 
             if reward_tmp > reward_max:
                 optimal_trade = log
@@ -60,6 +158,250 @@ class Backtest():
 
         return optimal_trade
 
+    def _train_parallel(self, trade_logs: list, data: pd.DataFrame,
+                        return_metric: callable, reward_metric: callable,
+                        structure: StructureArrays, workers: int,
+                        streaming: bool) -> TradeLog:
+        """Train the model by simulating candidates in worker processes.
+
+        Ties are broken in favour of the earlier candidate, just like the
+        sequential loop in train. Every candidate starts from the state its
+        asset has now, even if candidates share an asset and are sent to
+        the same worker together.
+
+        With a cache, the candidates are looked up before any is sent to a
+        worker, and only the missing ones are simulated and then stored.
+        Candidates tracking running stats are never cached.
+        """
+
+        bars = data if isinstance(data, BarArrays) \
+            else BarArrays.from_frame(data)
+        states = [log.asset.snapshot() for log in trade_logs]
+        rewards = [None]*len(trade_logs)
+        # The cache entry of every candidate to be simulated, and the final
+        # asset state of every candidate replayed from the cache
+        pending, replayed = {}, {}
+
+        for idx, log in enumerate(trade_logs):
+            if self.cache is None or streaming:
+                pending[idx] = (None, log, 0)
+                continue
+            log.asset.restore(states[idx])
+            missing = self.cache.lookup([log], bars)
+            if missing:
+                pending[idx] = missing[0]
+            else:
+                replayed[idx] = log.asset.snapshot()
+                rewards[idx] = _reward(log.trade_data, return_metric,
+                                       reward_metric)
+
+        simulated = self._simulate_parallel(
+            [trade_logs[idx] for idx in pending],
+            [states[idx] for idx in pending],
+            [key is not None for key, _, _ in pending.values()], bars,
+            return_metric, reward_metric, structure, workers, streaming)
+
+        stored = {}
+        for idx, (reward, log) in zip(pending, simulated):
+            rewards[idx] = reward
+            if log is not None:
+                stored[idx] = log
+        if stored:
+            self.cache.store([(pending[idx][0], log, pending[idx][2])
+                              for idx, log in stored.items()])
+
+        best = _argmax_first(rewards)
+        optimal_trade = trade_logs[best]
+        if best in replayed:
+            optimal_trade.asset.restore(replayed[best])
+        elif best in stored:
+            log = stored[best]
+            optimal_trade.trade_data = log.trade_data
+            optimal_trade.asset.restore(log.asset.snapshot())
+            optimal_trade.last_open_time = log.last_open_time
+        else:
+            optimal_trade.asset.restore(states[best])
+            self._simulate([optimal_trade], bars, structure)
+
+        return optimal_trade
+
+    def _simulate_parallel(self, trade_logs: list, states: list, keep: list,
+                           bars: BarArrays, return_metric: callable,
+                           reward_metric: callable,
+                           structure: StructureArrays, workers: int,
+                           streaming: bool) -> list:
+        """Simulates candidates from their asset states in worker processes.
+
+        Returns the reward of every candidate, next to the simulated
+        candidate where keep is True and None elsewhere.
+        """
+
+        if not trade_logs:
+            return []
+
+        shm, layout = _share_bars(bars)
+        try:
+            with ProcessPoolExecutor(max_workers=workers,
+                                     initializer=_init_worker,
+                                     initargs=(shm.name, layout,
+                                               structure)) as executor:
+                results = list(executor.map(
+                    _simulate_reward, trade_logs, states,
+                    [return_metric]*len(trade_logs),
+                    [reward_metric]*len(trade_logs),
+                    [streaming]*len(trade_logs),
+                    [self.profiler is not None]*len(trade_logs), keep,
+                    chunksize=max(1, len(trade_logs) // (4*workers))))
+        finally:
+            shm.close()
+            shm.unlink()
+
+        if self.profiler is not None:
+            for _, profiler, _ in results:
+                self.profiler.merge(profiler)
+
+        return [(reward, log) for reward, _, log in results]
+
+    def _train_streaming(self, trade_logs: list, data: pd.DataFrame,
+                         return_metric: callable, reward_metric: callable,
+                         structure: StructureArrays, vectorized: bool,
+                         pruning: PruningPolicy,
+                         search: SearchStrategy) -> TradeLog:
+        """Train the model scoring candidates by their running stats."""
+
+        saved = [(copy.deepcopy(log.trade_data), log.asset.snapshot())
+                 for log in trade_logs]
+        for log in trade_logs:
+            log.trade_data.track_stats(keep_curve=False)
+
+        optimal_trade = self.train(list(trade_logs), data, return_metric,
+                                   reward_metric, structure,
+                                   vectorized=vectorized, pruning=pruning,
+                                   search=search)
+
+        best = next(idx for idx, log in enumerate(trade_logs)
+                    if log is optimal_trade)
+        optimal_trade.trade_data, state = saved[best]
+        optimal_trade.asset.restore(state)
+        self._simulate([optimal_trade], data, structure)
+
+        return optimal_trade
+
+    def _train_pruned(self, trade_logs: list, data: pd.DataFrame,
+                      return_metric: callable, reward_metric: callable,
+                      structure: StructureArrays, vectorized: bool,
+                      pruning: PruningPolicy) -> TradeLog:
+        """Train the model dropping candidates at pruning checkpoints."""
+
+        bars = data if isinstance(data, BarArrays) \
+            else BarArrays.from_frame(data)
+        n = len(bars)
+        alive = list(range(len(trade_logs)))
+
+        def score(candidates: list) -> list:
+            return _rewards([trade_logs[idx].trade_data
+                             for idx in candidates],
+                            return_metric, reward_metric)
+
+        start = 0
+        for end in pruning.checkpoints(n) + [n]:
+            chunk = bars[start:end]
+            chunk_structure = None if structure is None \
+                else structure[start:end]
+            self._simulate([trade_logs[idx] for idx in alive], chunk,
+                           chunk_structure, vectorized)
+            pruning.evaluated += len(alive)*(end-start)
+            start = end
+
+            if end < n:
+                survivors = pruning.select(trade_logs, alive, end, score)
+                if survivors:
+                    pruning.pruned += len(alive) - len(survivors)
+                    pruning.skipped += (len(alive)-len(survivors)) * (n-end)
+                    alive = survivors
+
+        return trade_logs[alive[_argmax_first(score(alive))]]
+
+    def _train_search(self, trade_logs: list, data: pd.DataFrame,
+                      return_metric: callable, reward_metric: callable,
+                      structure: StructureArrays, vectorized: bool,
+                      search: SearchStrategy, workers: int = 1) -> TradeLog:
+        """Train the model on the candidates proposed by a search.
+
+        Without lanes and with more than one worker, the candidates of a
+        batch are continued in worker processes on the bars in shared
+        memory, and sent back to continue them later.
+        """
+
+        bars = data if isinstance(data, BarArrays) \
+            else BarArrays.from_frame(data)
+        n = len(bars)
+        search.reset(features(trade_logs))
+        # The fraction of the data every candidate is simulated up to
+        progress = [0.]*len(trade_logs)
+
+        executor = None
+        if workers > 1 and not vectorized:
+            shm, layout = _share_bars(bars)
+            executor = ProcessPoolExecutor(max_workers=workers,
+                                           initializer=_init_worker,
+                                           initargs=(shm.name, layout,
+                                                     structure))
+
+        def simulate(group: list, start: int, end: int) -> None:
+            if executor is None:
+                self._simulate([trade_logs[idx] for idx in group],
+                               bars[start:end],
+                               None if structure is None
+                               else structure[start:end], vectorized)
+                return
+
+            results = executor.map(
+                _simulate_chunk, [trade_logs[idx] for idx in group],
+                [start]*len(group), [end]*len(group),
+                [self.profiler is not None]*len(group))
+            for idx, (simulated, profiler) in zip(group, results):
+                # Keep the candidate objects, their callers look them up.
+                log = trade_logs[idx]
+                log.asset, log.trade_data, log.last_open_time = \
+                    simulated.asset, simulated.trade_data, \
+                    simulated.last_open_time
+                if profiler is not None:
+                    self.profiler.merge(profiler)
+
+        def advance(candidates: list, fraction: float) -> None:
+            # Candidates continued from the same candle share one pass.
+            for done in sorted({progress[idx] for idx in candidates}):
+                if done >= fraction:
+                    continue
+                group = [idx for idx in candidates if progress[idx] == done]
+                simulate(group, round(done*n), round(fraction*n))
+                for idx in group:
+                    progress[idx] = fraction
+                search.evaluated += len(group)*(fraction - done)
+
+        try:
+            started = time.perf_counter()
+            while not search.exhausted(time.perf_counter() - started):
+                batch, fraction = search.propose()
+                if not batch:
+                    break
+                advance(batch, fraction)
+                search.observe(batch, fraction,
+                               _rewards([trade_logs[idx].trade_data
+                                         for idx in batch],
+                                        return_metric, reward_metric))
+
+            best = search.best()
+            advance([best], 1.)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+                shm.close()
+                shm.unlink()
+
+        return trade_logs[best]
+
     def test(self, optimal_trade: TradeLog, data: pd.DataFrame) -> None:
         """Test the trained model on prviously unknown test data.
 
@@ -71,6 +413,169 @@ class Backtest():
             The historical data to be simulated.
         """
 
-        optimal_trade.simulate(data)
+        self._simulate([optimal_trade], data)
 
         return optimal_trade
+
+    def _simulate(self, trade_logs: list, data: pd.DataFrame,
+                  structure: StructureArrays = None,
+                  vectorized: bool = False) -> None:
+        """Simulates the trade logs through the cache if there is one."""
+
+        if self.profiler is not None:
+            with self.profiler.profile([log.strategy for log in trade_logs],
+                                       len(data), len(trade_logs)):
+                self._simulate_unprofiled(trade_logs, data, structure,
+                                          vectorized)
+        else:
+            self._simulate_unprofiled(trade_logs, data, structure, vectorized)
+
+    def _simulate_unprofiled(self, trade_logs: list, data: pd.DataFrame,
+                             structure: StructureArrays = None,
+                             vectorized: bool = False) -> None:
+        """Simulates the trade logs without profiling them."""
+
+        if self.cache is not None:
+            self.cache.simulate(trade_logs, data, structure, vectorized)
+        elif vectorized:
+            TradeLog.simulate_grid(trade_logs, data, structure)
+        else:
+            for log in trade_logs:
+                log.simulate(data, structure=structure)
+
+
+def _reward(trade_data: TradeData, return_metric: callable,
+            reward_metric: callable) -> float:
+    """Scores a simulated candidate by its running stats if it has any."""
+
+    if trade_data.stats is not None:
+        return metrics.RUNNING_METRICS[reward_metric](trade_data.stats)
+
+    return reward_metric(return_metric(trade_data.equity_curve))
+
+
+def _rewards(trade_data: list, return_metric: callable,
+             reward_metric: callable) -> list:
+    """Scores many simulated candidates, in one call if possible.
+
+    Equity curves of equal length are stacked into a matrix and scored by
+    the _2d variants of the metrics, otherwise every candidate is scored on
+    its own.
+    """
+
+    curves = [data.equity_curve for data in trade_data]
+    if (return_metric in metrics.BATCH_METRICS
+            and reward_metric in metrics.BATCH_METRICS
+            and all(data.stats is None for data in trade_data)
+            and len({len(curve) for curve in curves}) == 1):
+        returns = metrics.BATCH_METRICS[return_metric](np.stack(curves))
+        return metrics.BATCH_METRICS[reward_metric](returns).tolist()
+
+    return [_reward(data, return_metric, reward_metric)
+            for data in trade_data]
+
+
+def _argmax_first(rewards: list) -> int:
+    """Returns the index of the first of the highest rewards."""
+
+    best = 0
+    for idx, reward in enumerate(rewards):
+        if reward > rewards[best]:
+            best = idx
+
+    return best
+
+
+# Bars and market structure of the worker process, set by _init_worker.
+_worker_shm = None
+_worker_bars = None
+_worker_structure = None
+
+
+def _share_bars(bars: BarArrays) -> tuple:
+    """Copies the columns of bars into one block of shared memory.
+
+    Returns
+    -------
+    shared_memory.SharedMemory
+        The shared memory block, to be closed and unlinked by the caller.
+    list
+        The name, dtype, offset and length of every column in the block.
+    """
+
+    columns = [(name, getattr(bars, name))
+               for name in ['open_time', 'open', 'high', 'low', 'close',
+                            'volume']]
+    size = sum(column.nbytes for _, column in columns)
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+    layout = []
+    offset = 0
+    for name, column in columns:
+        shared = np.ndarray(column.shape, column.dtype, shm.buf, offset)
+        shared[:] = column
+        layout.append((name, column.dtype.str, offset, column.shape[0]))
+        offset += column.nbytes
+
+    return shm, layout
+
+
+def _init_worker(name: str, layout: list,
+                 structure: StructureArrays) -> None:
+    """Attaches a worker process to the bars in shared memory."""
+
+    global _worker_shm, _worker_bars, _worker_structure
+
+    # The parent owns the block and unlinks it once training is done.
+    _worker_shm = shared_memory.SharedMemory(name=name)
+
+    columns = {column: np.ndarray(length, dtype, _worker_shm.buf, offset)
+               for column, dtype, offset, length in layout}
+    _worker_bars = BarArrays(**columns)
+    _worker_structure = structure
+
+
+def _simulate_reward(trade_log: TradeLog, state: MarketStructureState,
+                     return_metric: callable, reward_metric: callable,
+                     streaming: bool, profile: bool = False,
+                     keep: bool = False) -> tuple:
+    """Simulates one candidate from the asset state on the shared bars and
+    returns its reward, its profiler if profile is True, and the simulated
+    candidate if keep is True."""
+
+    # Candidates pickled in one chunk share their asset again.
+    trade_log.asset.restore(state)
+
+    if streaming:
+        trade_log.trade_data.track_stats(keep_curve=False)
+
+    profiler = None
+    if profile:
+        profiler = Profiler()
+        with profiler.profile([trade_log.strategy], len(_worker_bars)):
+            trade_log.simulate(_worker_bars, structure=_worker_structure)
+    else:
+        trade_log.simulate(_worker_bars, structure=_worker_structure)
+
+    return (_reward(trade_log.trade_data, return_metric, reward_metric),
+            profiler, trade_log if keep else None)
+
+
+def _simulate_chunk(trade_log: TradeLog, start: int, end: int,
+                    profile: bool = False) -> tuple:
+    """Continues one candidate on a range of the shared bars and returns it,
+    and its profiler if profile is True."""
+
+    bars = _worker_bars[start:end]
+    structure = None if _worker_structure is None \
+        else _worker_structure[start:end]
+
+    profiler = None
+    if profile:
+        profiler = Profiler()
+        with profiler.profile([trade_log.strategy], len(bars)):
+            trade_log.simulate(bars, structure=structure)
+    else:
+        trade_log.simulate(bars, structure=structure)
+
+    return trade_log, profiler
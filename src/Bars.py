@@ -0,0 +1,155 @@
+"""Implement lightweight containers for historical price data candles.
+
+Classes
+----------
+Bar:
+    Represent one price data candle as an immutable named tuple.
+BarArrays:
+    Hold the price data of a whole dataset as one NumPy array per column.
+"""
+
+from dataclasses import dataclass
+from itertools import starmap
+from typing import Iterator, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class Bar(NamedTuple):
+    """Represent one price data candle.
+
+    ...
+
+    Attributes
+    ----------
+    open_time : int
+        The opening time of the candle in milliseconds since epoch.
+    open : float
+        The opening price of the candle.
+    high : float
+        The highest price of the candle.
+    low : float
+        The lowest price of the candle.
+    close : float
+        The closing price of the candle.
+    volume : float
+        The traded volume of the candle.
+    """
+
+    open_time: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float = 0.
+
+    @classmethod
+    def from_series(cls, row: pd.Series) -> 'Bar':
+        """Builds a bar from a row of a historical price data frame.
+
+        Parameters
+        ----------
+        row : pd.Series
+            Row of a historical price data frame.
+
+        Returns
+        -------
+        Bar
+            The candle represented by the row.
+        """
+
+        return cls(row['open time'], row['open'], row['high'], row['low'],
+                   row['close'], row.get('volume', 0.))
+
+    def to_series(self) -> pd.Series:
+        """Converts the bar into a row as produced by DataFrame.iterrows.
+
+        Returns
+        -------
+        pd.Series
+            The candle with the column names of the binance datasets.
+        """
+
+        return pd.Series({'open time': self.open_time, 'open': self.open,
+                          'high': self.high, 'low': self.low,
+                          'close': self.close, 'volume': self.volume})
+
+
+@dataclass
+class BarArrays:
+    """Hold historical price data as one NumPy array per column.
+
+    ...
+
+    Attributes
+    ----------
+    open_time : np.ndarray
+        The opening times of the candles in milliseconds since epoch.
+    open : np.ndarray
+        The opening prices of the candles.
+    high : np.ndarray
+        The highest prices of the candles.
+    low : np.ndarray
+        The lowest prices of the candles.
+    close : np.ndarray
+        The closing prices of the candles.
+    volume : np.ndarray
+        The traded volumes of the candles.
+    """
+
+    open_time: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame) -> 'BarArrays':
+        """Pulls the OHLCV columns out of a historical price data frame.
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            The historical price data.
+
+        Returns
+        -------
+        BarArrays
+            The columns of the data frame as NumPy arrays.
+        """
+
+        volume = data['volume'] if 'volume' in data else np.zeros(len(data))
+
+        return cls(np.asarray(data['open time'], dtype=np.int64),
+                   np.asarray(data['open'], dtype=np.float64),
+                   np.asarray(data['high'], dtype=np.float64),
+                   np.asarray(data['low'], dtype=np.float64),
+                   np.asarray(data['close'], dtype=np.float64),
+                   np.asarray(volume, dtype=np.float64))
+
+    def __len__(self) -> int:
+        return self.close.shape[0]
+
+    def __getitem__(self, key):
+        """Returns a single bar for an integer and a view for a slice."""
+
+        if isinstance(key, slice):
+            return BarArrays(self.open_time[key], self.open[key],
+                             self.high[key], self.low[key], self.close[key],
+                             self.volume[key])
+
+        return Bar(int(self.open_time[key]), float(self.open[key]),
+                   float(self.high[key]), float(self.low[key]),
+                   float(self.close[key]), float(self.volume[key]))
+
+    def __iter__(self) -> Iterator[Bar]:
+        """Yields the candles one after another as Bar objects."""
+
+        return starmap(Bar, zip(self.open_time.tolist(),
+                                self.open.tolist(),
+                                self.high.tolist(),
+                                self.low.tolist(),
+                                self.close.tolist(),
+                                self.volume.tolist()))
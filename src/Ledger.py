@@ -0,0 +1,281 @@
+"""Record every trade of a backtest in a compact columnar ledger.
+
+Classes
+----------
+Ledger:
+    Append-only record of the entries and exits of one trade log.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.Bars import BarArrays
+
+
+# One row per trade. Open trades have an exit_bar of -1.
+TRADE_DTYPE = np.dtype([('entry_bar', np.int64), ('exit_bar', np.int64),
+                        ('side', np.int8), ('entry_price', np.float64),
+                        ('exit_price', np.float64), ('size', np.float64),
+                        ('entry_fees', np.float64),
+                        ('exit_fees', np.float64)])
+
+
+class Ledger:
+    """Append-only record of the entries and exits of one trade log.
+
+    The trades are stored in a preallocated structured NumPy array that
+    doubles in size whenever it is full, so recording a trade runs in
+    amortized constant time, and all analytics are computed on whole
+    columns at once.
+
+    ...
+
+    Attributes
+    ----------
+    bar : int
+        The number of candles simulated since the ledger was attached,
+        which is the index of the candle being simulated.
+    trades : np.ndarray
+        A view of the trades recorded so far, with the fields of
+        TRADE_DTYPE.
+
+    Methods
+    -------
+    open(bar: int, side: int, price: float, size: float, fees: float)
+         -> None:
+        Records the entry of a trade.
+    close(bar: int, price: float, fee_rate: float) -> None:
+        Records the exit of all open trades.
+    closed() -> np.ndarray:
+        Returns the trades that were closed.
+    pnl() -> np.array:
+        Returns the profit of every closed trade after fees.
+    returns() -> np.array:
+        Returns the profit of every closed trade relative to its entry.
+    expectancy() -> float:
+        Returns the mean profit per closed trade.
+    holding_time() -> np.array:
+        Returns the number of candles every closed trade was held.
+    excursions(bars: BarArrays) -> tuple:
+        Returns the maximum adverse and favourable excursion of every
+        closed trade.
+    summary() -> dict:
+        Returns the trade statistics of the ledger.
+    to_frame() -> pd.DataFrame:
+        Returns the trades as a data frame.
+    save(path: str) -> None:
+        Writes the trades to a .npy file.
+    load(path: str) -> Ledger:
+        Reads the trades of a .npy file, memory-mapped.
+    """
+
+    __slots__ = ('bar', '_trades', '_length', '_open')
+
+    def __init__(self, capacity: int = 16):
+        self.bar = 0
+        self._trades = np.zeros(capacity, dtype=TRADE_DTYPE)
+        self._length = 0
+        # Indices of the trades not closed yet
+        self._open = []
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def trades(self) -> np.ndarray:
+        """Returns a view of the trades recorded so far."""
+
+        return self._trades[:self._length]
+
+    def open(self, bar: int, side: int, price: float, size: float,
+             fees: float) -> None:
+        """Records the entry of a trade.
+
+        Parameters
+        ----------
+        bar : int
+            The index of the candle of the entry.
+        side : int
+            1 for long trades, -1 for short trades.
+        price : float
+            The entry price.
+        size : float
+            The number of coins traded.
+        fees : float
+            The exchange fees paid on entry.
+        """
+
+        if self._length == self._trades.shape[0]:
+            trades = np.zeros(max(16, 2*self._length), dtype=TRADE_DTYPE)
+            trades[:self._length] = self._trades
+            self._trades = trades
+
+        self._trades[self._length] = (bar, -1, side, price, np.nan, size,
+                                      fees, 0.)
+        self._open.append(self._length)
+        self._length += 1
+
+    def close(self, bar: int, price: float, fee_rate: float) -> None:
+        """Records the exit of all open trades.
+
+        Parameters
+        ----------
+        bar : int
+            The index of the candle of the exit.
+        price : float
+            The exit price.
+        fee_rate : float
+            The exchange fees as a fraction of the traded value. They are
+            charged on the signed value of the position, like
+            Strategy._close_long_trade and Strategy._close_short_trade do.
+        """
+
+        trades = self._trades
+        for idx in self._open:
+            trades['exit_bar'][idx] = bar
+            trades['exit_price'][idx] = price
+            trades['exit_fees'][idx] = \
+                fee_rate * trades['side'][idx] * trades['size'][idx] * price
+        self._open.clear()
+
+    def closed(self) -> np.ndarray:
+        """Returns the trades that were closed."""
+
+        trades = self.trades
+
+        return trades[trades['exit_bar'] >= 0]
+
+    def pnl(self) -> np.array:
+        """Returns the profit of every closed trade after fees."""
+
+        trades = self.closed()
+
+        return (trades['side'] * trades['size']
+                * (trades['exit_price'] - trades['entry_price'])
+                - trades['entry_fees'] - trades['exit_fees'])
+
+    def returns(self) -> np.array:
+        """Returns the profit of every closed trade relative to its entry."""
+
+        trades = self.closed()
+
+        return self.pnl() / (trades['size'] * trades['entry_price'])
+
+    def expectancy(self) -> float:
+        """Returns the mean profit per closed trade, 0 without trades."""
+
+        pnl = self.pnl()
+
+        return float(pnl.mean()) if pnl.size else 0.
+
+    def holding_time(self) -> np.array:
+        """Returns the number of candles every closed trade was held."""
+
+        trades = self.closed()
+
+        return trades['exit_bar'] - trades['entry_bar']
+
+    def excursions(self, bars: BarArrays) -> tuple:
+        """Returns the maximum adverse and favourable excursion of every
+        closed trade.
+
+        The excursions are the worst and best price reached from the entry
+        candle to the exit candle, relative to the entry price and signed
+        by the side, so adverse excursions are negative for long and short
+        trades alike.
+
+        Parameters
+        ----------
+        bars : BarArrays
+            The candles the bar indices of the ledger refer to.
+
+        Returns
+        -------
+        np.array
+            The maximum adverse excursion of every closed trade.
+        np.array
+            The maximum favourable excursion of every closed trade.
+        """
+
+        trades = self.closed()
+        if not trades.size:
+            return np.zeros(0), np.zeros(0)
+
+        # Pairs of (entry, exit + 1) bounds, reduced in one call each. The
+        # padding keeps the bound after the last candle a valid index.
+        bounds = np.column_stack((trades['entry_bar'],
+                                  trades['exit_bar'] + 1)).ravel()
+        high = np.append(bars.high, np.nan)
+        low = np.append(bars.low, np.nan)
+        highest = np.maximum.reduceat(high, bounds)[::2]
+        lowest = np.minimum.reduceat(low, bounds)[::2]
+
+        entry, long = trades['entry_price'], trades['side'] > 0
+        adverse = np.where(long, lowest/entry - 1, 1 - highest/entry)
+        favourable = np.where(long, highest/entry - 1, 1 - lowest/entry)
+
+        return adverse, favourable
+
+    def summary(self) -> dict:
+        """Returns the trade statistics of the ledger.
+
+        Returns
+        -------
+        dict
+            The number of closed trades, win rate, expectancy, mean return
+            and mean holding time.
+        """
+
+        pnl = self.pnl()
+        if not pnl.size:
+            return {'trades': 0, 'win_rate': 0., 'expectancy': 0.,
+                    'mean_return': 0., 'mean_holding_time': 0.}
+
+        return {'trades': int(pnl.size),
+                'win_rate': float((pnl > 0).mean()),
+                'expectancy': float(pnl.mean()),
+                'mean_return': float(self.returns().mean()),
+                'mean_holding_time': float(self.holding_time().mean())}
+
+    def to_frame(self) -> pd.DataFrame:
+        """Returns the trades as a data frame."""
+
+        return pd.DataFrame(self.trades)
+
+    def save(self, path: str) -> None:
+        """Writes the trades to a .npy file.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+        """
+
+        np.save(path, self.trades)
+
+    @classmethod
+    def load(cls, path: str) -> 'Ledger':
+        """Reads the trades of a .npy file, memory-mapped.
+
+        The file is mapped copy-on-write, so recording more trades never
+        changes it.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+
+        Returns
+        -------
+        Ledger
+            A ledger holding the trades. Trades that were open when it was
+            saved stay open.
+        """
+
+        ledger = cls(0)
+        ledger._trades = np.load(path, mmap_mode='c')
+        ledger._length = ledger._trades.shape[0]
+        ledger._open = np.flatnonzero(
+            ledger._trades['exit_bar'] < 0).tolist()
+
+        return ledger
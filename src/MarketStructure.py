@@ -4,17 +4,97 @@ Classes
 ----------
 MarketStructure:
     Represents the market structure of an asset at one point in time.
+MarketStructureState:
+    Holds an immutable snapshot of the state of a MarketStructure.
+StructureArrays:
+    Holds the market structure after every candle of a whole dataset.
 """
 
-import logging
-from typing import Any
+from dataclasses import dataclass, field, fields
+from typing import Any, NamedTuple, Union
 
+import numpy as np
 import pandas as pd
 
+from src.Bars import Bar, BarArrays
+import src.utils.tracing as tracing
+
+
+class MarketStructureState(NamedTuple):
+    """Hold an immutable snapshot of the state of a MarketStructure.
+
+    Every level is stored as a price and a time field, so a snapshot is a
+    flat tuple of numbers. The levels are also available as (price, time)
+    tuples through properties.
+
+    ...
+
+    Attributes
+    ----------
+    trend : bool
+        True if the market structure is in an up trend.
+    msb : bool
+        True if the market structure broke recently.
+    continuation : bool
+        True if the market structure continued recently.
+    stay_in_range : bool
+        True if the market structure stayed in range recently.
+    prev_high_price, prev_high_time : float, int
+        The previous high of the market structure and its time.
+    prev_low_price, prev_low_time : float, int
+        The previous low of the market structure and its time.
+    provisional_high_price, provisional_high_time : float, int
+        The provisional high of the market structure and its time.
+    provisional_low_price, provisional_low_time : float, int
+        The provisional low of the market structure and its time.
+    """
+
+    trend: bool
+    msb: bool
+    continuation: bool
+    stay_in_range: bool
+    prev_high_price: float
+    prev_high_time: int
+    prev_low_price: float
+    prev_low_time: int
+    provisional_high_price: float
+    provisional_high_time: int
+    provisional_low_price: float
+    provisional_low_time: int
+
+    @property
+    def prev_high(self) -> tuple:
+        """Returns the previous high as a (price, time) tuple."""
+
+        return self.prev_high_price, self.prev_high_time
+
+    @property
+    def prev_low(self) -> tuple:
+        """Returns the previous low as a (price, time) tuple."""
+
+        return self.prev_low_price, self.prev_low_time
+
+    @property
+    def provisional_high(self) -> tuple:
+        """Returns the provisional high as a (price, time) tuple."""
+
+        return self.provisional_high_price, self.provisional_high_time
+
+    @property
+    def provisional_low(self) -> tuple:
+        """Returns the provisional low as a (price, time) tuple."""
+
+        return self.provisional_low_price, self.provisional_low_time
+
 
 class MarketStructure:
     """Represent the market structure of an asset at one point in time.
 
+    The attributes live in slots, and every level is stored as a separate
+    price and time, so advancing the structure by a candle allocates no
+    tuples. The levels are still available as (price, time) tuples through
+    properties.
+
     ...
 
     Attributes
@@ -27,22 +107,50 @@ class MarketStructure:
         True if the market structure continued recently.
     trend : bool
         True if the market structure is in an up trend.
+    prev_high_price, prev_high_time : float, int
+        The previous high of the market structure and its time.
+    prev_low_price, prev_low_time : float, int
+        The previous low of the market structure and its time.
+    provisional_high_price, provisional_high_time : float, int
+        The provisional high of the market structure and its time.
+    provisional_low_price, provisional_low_time : float, int
+        The provisional low of the market structure and its time.
     prev_high : tuple
-        The previous high of the market structure.
+        The previous high of the market structure as (price, time).
     prev_low : tuple
-        The previous low of the market structure.
+        The previous low of the market structure as (price, time).
     provisional_high : tuple
-        The provisional high of the market structure.
+        The provisional high of the market structure as (price, time).
     provisional_low : tuple
-        The provisional low of the market structure.
+        The provisional low of the market structure as (price, time).
 
     Methods
     -------
     next_candle(row: pd.Series) -> Any:
         Investigates how the market structure changes with the next
         incoming price data candle.
+    next_bar(bar: Bar) -> Any:
+        Same as next_candle for a lightweight Bar instead of a pd.Series.
+    snapshot() -> MarketStructureState:
+        Returns the current state of the market structure.
+    restore(state: MarketStructureState) -> None:
+        Puts the market structure back into a previous state.
+    copy() -> MarketStructure:
+        Returns an independent market structure in the same state.
+    batch(data: BarArrays) -> StructureArrays:
+        Computes the market structure after every candle of a dataset.
+    attach(structure: StructureArrays, start: int) -> None:
+        Replays precomputed market structure instead of computing it.
+    detach() -> None:
+        Goes back to computing the market structure candle by candle.
     """
 
+    __slots__ = ('msb', 'stay_in_range', 'continuation', 'trend',
+                 'prev_high_price', 'prev_high_time', 'prev_low_price',
+                 'prev_low_time', 'provisional_high_price',
+                 'provisional_high_time', 'provisional_low_price',
+                 'provisional_low_time', '_replay', '_cursor')
+
     def __init__(self, prev_high: tuple, prev_low: tuple,
                  provisional_high: tuple, provisional_low: tuple):
         """
@@ -62,10 +170,54 @@ class MarketStructure:
         self.stay_in_range = False
         self.continuation = False
         self.trend = False
-        self.prev_high = prev_high
-        self.prev_low = prev_low
-        self.provisional_high = provisional_high
-        self.provisional_low = provisional_low
+        self.prev_high_price, self.prev_high_time = prev_high
+        self.prev_low_price, self.prev_low_time = prev_low
+        self.provisional_high_price, self.provisional_high_time = \
+            provisional_high
+        self.provisional_low_price, self.provisional_low_time = \
+            provisional_low
+        self._replay = None
+        self._cursor = 0
+
+    @property
+    def prev_high(self) -> tuple:
+        """The previous high of the market structure as (price, time)."""
+
+        return self.prev_high_price, self.prev_high_time
+
+    @prev_high.setter
+    def prev_high(self, level: tuple) -> None:
+        self.prev_high_price, self.prev_high_time = level
+
+    @property
+    def prev_low(self) -> tuple:
+        """The previous low of the market structure as (price, time)."""
+
+        return self.prev_low_price, self.prev_low_time
+
+    @prev_low.setter
+    def prev_low(self, level: tuple) -> None:
+        self.prev_low_price, self.prev_low_time = level
+
+    @property
+    def provisional_high(self) -> tuple:
+        """The provisional high of the market structure as (price, time)."""
+
+        return self.provisional_high_price, self.provisional_high_time
+
+    @provisional_high.setter
+    def provisional_high(self, level: tuple) -> None:
+        self.provisional_high_price, self.provisional_high_time = level
+
+    @property
+    def provisional_low(self) -> tuple:
+        """The provisional low of the market structure as (price, time)."""
+
+        return self.provisional_low_price, self.provisional_low_time
+
+    @provisional_low.setter
+    def provisional_low(self, level: tuple) -> None:
+        self.provisional_low_price, self.provisional_low_time = level
 
     def next_candle(self, row: pd.Series) -> Any:
         """Investigates how the market structure changes
@@ -88,32 +240,212 @@ class MarketStructure:
             True if the market structure continued recently.
         """
 
-        close = row['close']
+        return self.next_bar(Bar.from_series(row))
+
+    def next_bar(self, bar: Bar) -> Any:
+        """Investigates how the market structure changes
+
+        Investigates how the market structure changes with the next
+        incoming price data candle.
+
+        Parameters
+        ----------
+        bar : Bar
+            The next incoming price data candle.
+
+        Returns
+        -------
+        bool
+            True if the market structure is in an up trend.
+        bool
+            True if the market structure broke recently.
+        bool
+            True if the market structure continued recently.
+        """
+
+        if self._replay is not None:
+            return self._replay_bar(bar)
+
+        close = bar.close
         self.msb = False
         self.continuation = False
         self.stay_in_range = False
         trend = self.trend
 
-        if close > self.prev_high[0]:
+        if close > self.prev_high_price:
             if self.trend is False:
-                self._break_down_trend(row)
+                self._break_down_trend(bar)
                 self.msb = True
             else:
-                self._continue_up_trend(row)
+                self._continue_up_trend(bar)
                 self.continuation = True
-        elif close < self.prev_low[0]:
+        elif close < self.prev_low_price:
             if self.trend is False:
-                self._continue_down_trend(row)
+                self._continue_down_trend(bar)
                 self.continuation = True
             else:
-                self._break_up_trend(row)
+                self._break_up_trend(bar)
                 self.msb = True
         else:
-            self._stay_in_range(row)
+            self._stay_in_range(bar)
             self.stay_in_range = True
 
         return trend, self.msb, self.continuation, self.stay_in_range
 
+    def snapshot(self) -> MarketStructureState:
+        """Returns the current state of the market structure.
+
+        Returns
+        -------
+        MarketStructureState
+            The trend, the flags and the four levels of the structure.
+        """
+
+        return MarketStructureState(
+            self.trend, self.msb, self.continuation, self.stay_in_range,
+            self.prev_high_price, self.prev_high_time, self.prev_low_price,
+            self.prev_low_time, self.provisional_high_price,
+            self.provisional_high_time, self.provisional_low_price,
+            self.provisional_low_time)
+
+    def restore(self, state: MarketStructureState) -> None:
+        """Puts the market structure back into a previous state.
+
+        Parameters
+        ----------
+        state : MarketStructureState
+            The state returned by snapshot.
+        """
+
+        (self.trend, self.msb, self.continuation, self.stay_in_range,
+         self.prev_high_price, self.prev_high_time, self.prev_low_price,
+         self.prev_low_time, self.provisional_high_price,
+         self.provisional_high_time, self.provisional_low_price,
+         self.provisional_low_time) = state
+
+    def copy(self) -> 'MarketStructure':
+        """Returns an independent market structure in the same state.
+
+        The copy computes its structure candle by candle even if this one
+        is replaying precomputed structure.
+
+        Returns
+        -------
+        MarketStructure
+            A new market structure restored from a snapshot of this one.
+        """
+
+        ms = MarketStructure(self.prev_high, self.prev_low,
+                             self.provisional_high, self.provisional_low)
+        ms.restore(self.snapshot())
+
+        return ms
+
+    def batch(self,
+              data: Union[BarArrays, pd.DataFrame]) -> 'StructureArrays':
+        """Computes the market structure after every candle of a dataset.
+
+        Runs the same state machine as next_bar over the whole dataset in a
+        single pass, starting from the current market structure, without
+        changing it. The result does not depend on any strategy parameters
+        and can be shared read-only by every TradeLog simulating the data.
+
+        Parameters
+        ----------
+        data : BarArrays or pd.DataFrame
+            The historical data to be investigated.
+
+        Returns
+        -------
+        StructureArrays
+            The market structure after every candle of the dataset.
+        """
+
+        if not isinstance(data, BarArrays):
+            data = BarArrays.from_frame(data)
+
+        initial = self.snapshot()
+
+        return StructureArrays.from_columns(
+            data.open_time,
+            *_structure_kernel(data.open.tolist(), data.high.tolist(),
+                               data.low.tolist(), data.close.tolist(),
+                               data.open_time.tolist(), initial),
+            initial=initial)
+
+    def attach(self, structure: 'StructureArrays', start: int = 0) -> None:
+        """Replays precomputed market structure instead of computing it.
+
+        Puts the market structure into the state it had right before the
+        candle at position start of the precomputed dataset. Every following
+        call of next_bar or next_candle then looks up the next precomputed
+        candle instead of running the state machine.
+
+        Parameters
+        ----------
+        structure : StructureArrays
+            The precomputed market structure of the dataset.
+        start : int
+            The position of the next candle within the dataset.
+        """
+
+        self.restore(structure.state_at(start))
+        self._replay = structure.rows
+        self._cursor = start
+
+    def detach(self) -> None:
+        """Goes back to computing the market structure candle by candle."""
+
+        self._replay = None
+        self._cursor = 0
+
+    def _replay_bar(self, bar: Bar) -> Any:
+        """Looks up the market structure after the next precomputed candle.
+
+        Parameters
+        ----------
+        bar : Bar
+            The next incoming price data candle.
+
+        Returns
+        -------
+        bool
+            True if the market structure is in an up trend.
+        bool
+            True if the market structure broke recently.
+        bool
+            True if the market structure continued recently.
+        """
+
+        trend = self.trend
+        (open_time, self.trend, self.msb, self.continuation,
+         self.stay_in_range, self.prev_high_price, self.prev_high_time,
+         self.prev_low_price, self.prev_low_time,
+         self.provisional_high_price, self.provisional_high_time,
+         self.provisional_low_price, self.provisional_low_time) = \
+            self._replay[self._cursor]
+
+        if open_time != bar.open_time:
+            raise ValueError(f'Precomputed market structure is at {open_time}'
+                             f' but the candle opened at {bar.open_time}.')
+        self._cursor += 1
+
+        tracer = tracing.tracer
+        if tracer is not None:
+            # The trend before the candle tells which way it broke or
+            # continued, as in next_bar.
+            if self.msb:
+                code = tracing.DOWN_TREND_BROKEN if trend is False \
+                    else tracing.UP_TREND_BROKEN
+            elif self.continuation:
+                code = tracing.CONTINUING_DOWN_TREND if trend is False \
+                    else tracing.CONTINUING_UP_TREND
+            else:
+                code = tracing.STAYING_IN_RANGE
+            tracer.record(bar.open_time, code)
+
+        return trend, self.msb, self.continuation, self.stay_in_range
+
     @property
     def structure(self):
         """Prints the market structure."""
@@ -129,75 +461,299 @@ class MarketStructure:
               + f'provisional_high: {(self.provisional_high[0], prv_h_ts)} \n'
               + f'provisional_low: {(self.provisional_low[0], prv_l_ts)} \n')
 
-    def _break_up_trend(self, row: pd.Series) -> None:
+    def _break_up_trend(self, bar: Bar) -> None:
         """Sets the new market structure after break of an up trend.
 
         Parameters
         ----------
-        row : pd.Series
+        bar : Bar
             The next incoming price data candle.
         """
 
         self.trend = False
-        self.prev_high = self.provisional_high
-        self.prev_low = tuple(row[['low', 'open time']])
-        self.provisional_low = tuple(row[['low', 'open time']])
-        logging.info('Up Trend Broken')
-
-    def _break_down_trend(self, row: pd.Series) -> None:
+        self.prev_high_price = self.provisional_high_price
+        self.prev_high_time = self.provisional_high_time
+        self.prev_low_price = self.provisional_low_price = bar.low
+        self.prev_low_time = self.provisional_low_time = bar.open_time
+        tracer = tracing.tracer
+        if tracer is not None:
+            tracer.record(bar.open_time, tracing.UP_TREND_BROKEN)
+
+    def _break_down_trend(self, bar: Bar) -> None:
         """Sets the new market structure after break of a down trend.
 
         Parameters
         ----------
-        row : pd.Series
+        bar : Bar
             The next incoming price data candle.
         """
 
         self.trend = True
-        self.prev_high = tuple(row[['high', 'open time']])
-        self.prev_low = self.provisional_low
-        self.provisional_high = tuple(row[['high', 'open time']])
-        logging.info('Down Trend Broken')
-
-    def _continue_up_trend(self, row: pd.Series) -> None:
+        self.prev_high_price = self.provisional_high_price = bar.high
+        self.prev_high_time = self.provisional_high_time = bar.open_time
+        self.prev_low_price = self.provisional_low_price
+        self.prev_low_time = self.provisional_low_time
+        tracer = tracing.tracer
+        if tracer is not None:
+            tracer.record(bar.open_time, tracing.DOWN_TREND_BROKEN)
+
+    def _continue_up_trend(self, bar: Bar) -> None:
         """Sets the new market structure after an up trend continues.
 
         Parameters
         ----------
-        row : pd.Series
+        bar : Bar
             The next incoming price data candle.
         """
 
-        self.prev_low = self.provisional_low
-        self.prev_high = tuple(row[['high', 'open time']])
-        self.provisional_high = tuple(row[['high', 'open time']])
-        logging.info('Continuing Up Trend')
+        self.prev_low_price = self.provisional_low_price
+        self.prev_low_time = self.provisional_low_time
+        self.prev_high_price = self.provisional_high_price = bar.high
+        self.prev_high_time = self.provisional_high_time = bar.open_time
+        tracer = tracing.tracer
+        if tracer is not None:
+            tracer.record(bar.open_time, tracing.CONTINUING_UP_TREND)
 
-    def _continue_down_trend(self, row: pd.Series) -> None:
+    def _continue_down_trend(self, bar: Bar) -> None:
         """Sets the new market structure after a down trend continues.
 
         Parameters
         ----------
-        row : pd.Series
+        bar : Bar
             The next incoming price data candle.
         """
 
-        self.prev_high = self.provisional_high
-        self.prev_low = tuple(row[['low', 'open time']])
-        self.provisional_low = tuple(row[['low', 'open time']])
-        logging.info('Continuing Down Trend')
+        self.prev_high_price = self.provisional_high_price
+        self.prev_high_time = self.provisional_high_time
+        self.prev_low_price = self.provisional_low_price = bar.low
+        self.prev_low_time = self.provisional_low_time = bar.open_time
+        tracer = tracing.tracer
+        if tracer is not None:
+            tracer.record(bar.open_time, tracing.CONTINUING_DOWN_TREND)
 
-    def _stay_in_range(self, row: pd.Series) -> None:
+    def _stay_in_range(self, bar: Bar) -> None:
         """Keeps track of provisional information while range bound.
 
         Parameters
         ----------
-        row : pd.Series
+        bar : Bar
             The next incoming price data candle.
         """
 
-        if row['close'] - row['open'] >= 0:
-            self.provisional_high = tuple(row[['high', 'open time']])
-        if row['close'] - row['open'] < 0:
-            self.provisional_low = tuple(row[['low', 'open time']])
-        logging.info('Staying in Range')
+        if bar.close - bar.open >= 0:
+            self.provisional_high_price = bar.high
+            self.provisional_high_time = bar.open_time
+        if bar.close - bar.open < 0:
+            self.provisional_low_price = bar.low
+            self.provisional_low_time = bar.open_time
+        tracer = tracing.tracer
+        if tracer is not None:
+            tracer.record(bar.open_time, tracing.STAYING_IN_RANGE)
+
+
+@dataclass
+class StructureArrays:
+    """Hold the market structure after every candle of a whole dataset.
+
+    All arrays are read-only and share their index with the dataset they
+    were computed from.
+
+    ...
+
+    Attributes
+    ----------
+    open_time : np.ndarray
+        The opening times of the candles.
+    trend : np.ndarray
+        True where the market structure is in an up trend after the candle.
+    msb : np.ndarray
+        True where the market structure broke with the candle.
+    continuation : np.ndarray
+        True where the market structure continued with the candle.
+    stay_in_range : np.ndarray
+        True where the market structure stayed in range with the candle.
+    prev_high, prev_high_time : np.ndarray
+        The previous high of the market structure and its time.
+    prev_low, prev_low_time : np.ndarray
+        The previous low of the market structure and its time.
+    provisional_high, provisional_high_time : np.ndarray
+        The provisional high of the market structure and its time.
+    provisional_low, provisional_low_time : np.ndarray
+        The provisional low of the market structure and its time.
+    initial : MarketStructureState
+        The state of the market structure before the first candle.
+    """
+
+    open_time: np.ndarray
+    trend: np.ndarray
+    msb: np.ndarray
+    continuation: np.ndarray
+    stay_in_range: np.ndarray
+    prev_high: np.ndarray
+    prev_high_time: np.ndarray
+    prev_low: np.ndarray
+    prev_low_time: np.ndarray
+    provisional_high: np.ndarray
+    provisional_high_time: np.ndarray
+    provisional_low: np.ndarray
+    provisional_low_time: np.ndarray
+    initial: MarketStructureState
+    _rows: list = field(default=None, init=False, repr=False, compare=False)
+
+    @classmethod
+    def from_columns(cls, open_time: np.ndarray, *columns: list,
+                     initial: MarketStructureState) -> 'StructureArrays':
+        """Builds read-only arrays from the lists of the structure kernel."""
+
+        trend, msb, continuation, stay_in_range = \
+            [np.array(column, dtype=bool) for column in columns[:4]]
+        levels = [np.array(column, dtype=np.float64)
+                  for column in columns[4::2]]
+        times = [_time_array(column) for column in columns[5::2]]
+
+        structure = cls(np.array(open_time), trend, msb, continuation,
+                        stay_in_range, levels[0], times[0], levels[1],
+                        times[1], levels[2], times[2], levels[3], times[3],
+                        initial)
+        for value in vars(structure).values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+
+        return structure
+
+    def __len__(self) -> int:
+        return self.trend.shape[0]
+
+    def __getitem__(self, key: slice) -> 'StructureArrays':
+        """Returns the market structure of a contiguous part of the dataset.
+
+        The arrays of the part are views, and its initial state is the state
+        right before its first candle, so it can be attached on its own.
+        """
+
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError('Market structure can only be sliced '
+                             'contiguously.')
+
+        arrays = {column.name: getattr(self, column.name)[start:stop]
+                  for column in fields(self)
+                  if column.name not in ('initial', '_rows')}
+        structure = StructureArrays(**arrays, initial=self.state_at(start))
+        if self._rows is not None:
+            structure._rows = self._rows[start:stop]
+
+        return structure
+
+    @property
+    def rows(self) -> list:
+        """Returns the market structure after every candle as flat tuples.
+
+        The list is built on first access and reused afterwards, so
+        replaying the structure does not index NumPy arrays per candle.
+        """
+
+        if self._rows is None:
+            self._rows = list(zip(
+                self.open_time.tolist(), self.trend.tolist(),
+                self.msb.tolist(), self.continuation.tolist(),
+                self.stay_in_range.tolist(), self.prev_high.tolist(),
+                self.prev_high_time.tolist(), self.prev_low.tolist(),
+                self.prev_low_time.tolist(), self.provisional_high.tolist(),
+                self.provisional_high_time.tolist(),
+                self.provisional_low.tolist(),
+                self.provisional_low_time.tolist()))
+
+        return self._rows
+
+    def state_at(self, index: int) -> MarketStructureState:
+        """Returns the state of the market structure right before a candle.
+
+        Parameters
+        ----------
+        index : int
+            The position of the candle within the dataset.
+
+        Returns
+        -------
+        MarketStructureState
+            The state after the previous candle, or the initial state for
+            the first candle.
+        """
+
+        if index == 0:
+            return self.initial
+
+        return MarketStructureState._make(self.rows[index-1][1:])
+
+
+def _time_array(times: list) -> np.ndarray:
+    """Stores level times as int64 unless the initial levels are not."""
+
+    try:
+        return np.array(times, dtype=np.int64)
+    except (TypeError, ValueError):
+        return np.array(times, dtype=object)
+
+
+def _structure_kernel(open_: list, high: list, low: list, close: list,
+                      open_time: list, initial: tuple) -> tuple:
+    """Runs the market structure state machine over whole columns.
+
+    Each level depends on the levels after the previous candle, so the
+    recurrence is scanned sequentially, on plain floats held in local
+    variables instead of attributes and tuples.
+
+    Returns
+    -------
+    tuple
+        Lists of the trend, msb, continuation and stay in range flags and
+        of the prices and times of the four levels after every candle.
+    """
+
+    trend = initial.trend
+    ph, pht = initial.prev_high_price, initial.prev_high_time
+    pl, plt = initial.prev_low_price, initial.prev_low_time
+    pvh, pvht = initial.provisional_high_price, initial.provisional_high_time
+    pvl, pvlt = initial.provisional_low_price, initial.provisional_low_time
+
+    columns = tuple([] for _ in range(12))
+    (trends, msbs, continuations, stay_in_ranges, phs, phts, pls, plts,
+     pvhs, pvhts, pvls, pvlts) = columns
+
+    for o, h, lo, c, t in zip(open_, high, low, close, open_time):
+        if c > ph:
+            msbs.append(not trend)
+            continuations.append(trend)
+            stay_in_ranges.append(False)
+            trend = True
+            pl, plt = pvl, pvlt
+            ph = pvh = h
+            pht = pvht = t
+        elif c < pl:
+            msbs.append(trend)
+            continuations.append(not trend)
+            stay_in_ranges.append(False)
+            trend = False
+            ph, pht = pvh, pvht
+            pl = pvl = lo
+            plt = pvlt = t
+        else:
+            msbs.append(False)
+            continuations.append(False)
+            stay_in_ranges.append(True)
+            if c - o >= 0:
+                pvh, pvht = h, t
+            if c - o < 0:
+                pvl, pvlt = lo, t
+        trends.append(trend)
+        phs.append(ph)
+        phts.append(pht)
+        pls.append(pl)
+        plts.append(plt)
+        pvhs.append(pvh)
+        pvhts.append(pvht)
+        pvls.append(pvl)
+        pvlts.append(pvlt)
+
+    return columns
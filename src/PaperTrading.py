@@ -0,0 +1,179 @@
+"""Drive many trade logs from replayed candles in one asyncio event loop.
+
+Classes
+----------
+Subscriber:
+    Follows one candle stream with a trade log and times every candle.
+ReplayServer:
+    Publishes the candles of replay sources to their subscribers.
+"""
+
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.Strategy import TradeLog
+from src.utils.replay import CsvReplay
+
+
+class Subscriber:
+    """Follows one candle stream with a trade log and times every candle.
+
+    ...
+
+    Attributes
+    ----------
+    trade_log : TradeLog
+        The trade log advanced by every received candle.
+    source : str
+        The name of the stream the subscriber follows.
+    queue : asyncio.Queue
+        The candles published but not processed yet. It is bounded, so a
+        slow subscriber holds back the publisher.
+    latencies : list
+        The seconds from the release of every candle until the trade log
+        has processed it.
+    depths : list
+        The number of candles still waiting in the queue whenever a candle
+        is taken out.
+    """
+
+    def __init__(self, trade_log: TradeLog, source: str, maxsize: int = 64):
+        self.trade_log = trade_log
+        self.source = source
+        self.queue = asyncio.Queue(maxsize)
+        self.latencies = []
+        self.depths = []
+
+    async def run(self) -> None:
+        """Processes candles until the end of the stream."""
+
+        queue, push = self.queue, self.trade_log.push
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+
+            bar, released = item
+            self.depths.append(queue.qsize())
+            push(bar)
+            self.latencies.append(time.perf_counter() - released)
+
+
+class ReplayServer:
+    """Publishes the candles of replay sources to their subscribers.
+
+    Every source is published by its own task, and every subscriber
+    processes its queue in its own task, all in one event loop. Publishing
+    a candle waits until every subscriber of the source has room in its
+    queue, so the replay never runs ahead of the slowest subscriber by
+    more than the queue size.
+
+    ...
+
+    Attributes
+    ----------
+    sources : dict
+        The replay sources by name.
+    subscribers : list
+        All subscribers of all sources.
+
+    Methods
+    -------
+    subscribe(source: str, trade_log: TradeLog, maxsize: int = 64)
+              -> Subscriber:
+        Lets a trade log follow the candles of a source.
+    run() -> None:
+        Replays all sources until every subscriber is done.
+    report() -> pd.DataFrame:
+        Summarizes the latency and queue depth of every subscriber.
+    """
+
+    def __init__(self, sources: dict):
+        """
+        Parameters
+        ----------
+        sources : dict
+            The replay sources by name, e.g. 'BTCBUSD 1h'.
+        """
+
+        self.sources = sources
+        self.subscribers = []
+
+    def subscribe(self, source: str, trade_log: TradeLog,
+                  maxsize: int = 64) -> Subscriber:
+        """Lets a trade log follow the candles of a source.
+
+        Parameters
+        ----------
+        source : str
+            The name of the source.
+        trade_log : TradeLog
+            The trade log advanced by every candle of the source.
+        maxsize : int
+            The number of candles the subscriber may fall behind.
+
+        Returns
+        -------
+        Subscriber
+            The subscriber recording the latencies of the trade log.
+        """
+
+        if source not in self.sources:
+            raise KeyError(f'There is no source named {source}.')
+
+        subscriber = Subscriber(trade_log, source, maxsize)
+        self.subscribers.append(subscriber)
+
+        return subscriber
+
+    async def run(self) -> None:
+        """Replays all sources until every subscriber is done."""
+
+        await asyncio.gather(
+            *(self._publish(name, source)
+              for name, source in self.sources.items()),
+            *(subscriber.run() for subscriber in self.subscribers))
+
+    def report(self) -> pd.DataFrame:
+        """Summarizes the latency and queue depth of every subscriber.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per subscriber with the number of candles, the p50 and
+            p99 latency in microseconds and the mean and maximum queue
+            depth.
+        """
+
+        rows = []
+        for subscriber in self.subscribers:
+            latencies = np.array(subscriber.latencies) * 1e6
+            depths = np.array(subscriber.depths)
+            p50, p99 = np.percentile(latencies, [50, 99]) \
+                if latencies.size else (np.nan, np.nan)
+            rows.append({
+                'source': subscriber.source,
+                'strategy': type(subscriber.trade_log.strategy).__name__,
+                'params': subscriber.trade_log.params,
+                'bars': latencies.size, 'p50_us': p50, 'p99_us': p99,
+                'mean_depth': depths.mean() if depths.size else 0.,
+                'max_depth': depths.max() if depths.size else 0})
+
+        return pd.DataFrame(rows)
+
+    async def _publish(self, name: str, source: CsvReplay) -> None:
+        """Puts every candle of a source into the queues of its subscribers."""
+
+        queues = [subscriber.queue for subscriber in self.subscribers
+                  if subscriber.source == name]
+
+        async for bar in source:
+            released = source.emitted
+            for queue in queues:
+                await queue.put((bar, released))
+
+        for queue in queues:
+            await queue.put(None)
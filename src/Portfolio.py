@@ -0,0 +1,158 @@
+"""Simulate trade logs on several assets sharing one margin account.
+
+Classes
+----------
+Portfolio:
+    Merges the candles of several assets into one time-ordered stream and
+    drives one trade log per asset against a shared margin account.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.Assets import MarginAccount
+from src.Bars import BarArrays
+
+
+class Portfolio:
+    """Merges the candles of several assets into one time-ordered stream and
+    drives one trade log per asset against a shared margin account.
+
+    The candles are never joined into one frame. Only their opening times
+    are merged into an index of (asset, row) events, and every event hands
+    one candle of one asset to its trade log. Before the event the trade
+    data of the asset sees the equity of the account without its own
+    position as cash, so the strategy sizes trades on the shared equity,
+    and afterwards the change of its cash is booked on the account. Entries
+    are capped by the headroom of the account, see MarginAccount.
+
+    Candles of different assets opening at the same time are handed over in
+    the order of the trade logs. The equity curves kept by the trade data of
+    the assets are not meaningful in a portfolio, use equity_curve instead.
+
+    ...
+
+    Attributes
+    ----------
+    trade_logs : list
+        One trade log per asset.
+    account : MarginAccount
+        The account shared by all trade logs.
+    open_time : np.array
+        The distinct opening times of all simulated candles.
+    equity_curve : np.array
+        The equity of the account after all candles of every opening time,
+        starting with the initial equity.
+    exposure_curve : np.array
+        The gross exposure of the account at the same times.
+
+    Methods
+    -------
+    simulate(data: list) -> None:
+        Applies the strategies of all trade logs to their datasets in time
+        order.
+    report() -> pd.DataFrame:
+        Summarizes the trades of every asset.
+    """
+
+    def __init__(self, trade_logs: list, equity: float = 100.,
+                 max_leverage: float = 1.):
+        self.trade_logs = trade_logs
+        self.account = MarginAccount.with_legs(len(trade_logs), equity,
+                                               max_leverage)
+        for log in trade_logs:
+            log.trade_data.account = self.account
+        self.open_time = np.zeros(0, dtype=np.int64)
+        self.equity_curve = np.array([equity])
+        self.exposure_curve = np.array([0.])
+
+    def simulate(self, data: list) -> None:
+        """Applies the strategies of all trade logs to their datasets in time
+        order.
+
+        Parameters
+        ----------
+        data : list
+            The historical data of every trade log, as pd.DataFrame or
+            BarArrays.
+        """
+
+        bars = [d if isinstance(d, BarArrays) else BarArrays.from_frame(d)
+                for d in data]
+        legs, rows, times = merge_index([b.open_time for b in bars])
+        # Record the account after the last event of every opening time
+        last = times[1:] != times[:-1]
+        if len(times):
+            last = np.append(last, True)
+
+        n = int(last.sum())
+        equity_curve = np.empty(n)
+        exposure_curve = np.empty(n)
+        account, point = self.account, 0
+        pushes = [log.push for log in self.trade_logs]
+        trade_data = [log.trade_data for log in self.trade_logs]
+        for leg, row, is_last in zip(legs.tolist(), rows.tolist(),
+                                     last.tolist()):
+            data_ = trade_data[leg]
+            bar = bars[leg][row]
+            cash = account.leg_equity(leg)
+            data_.equity = cash
+            pushes[leg](bar)
+            account.cash += data_.equity - cash
+            account.mark(leg, data_.position, bar.close)
+            if is_last:
+                equity_curve[point] = account.equity
+                exposure_curve[point] = account.exposure
+                point += 1
+
+        self.open_time = np.append(self.open_time, times[last])
+        self.equity_curve = np.append(self.equity_curve, equity_curve)
+        self.exposure_curve = np.append(self.exposure_curve,
+                                        exposure_curve)
+
+    def report(self) -> pd.DataFrame:
+        """Summarizes the trades of every asset.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per asset with its number of trades, wins and current
+            position.
+        """
+
+        return pd.DataFrame(
+            [{'ticker': log.asset.ticker,
+              'trades': log.trade_data.num_trades,
+              'wins': log.trade_data.wins,
+              'position': log.trade_data.position}
+             for log in self.trade_logs]).set_index('ticker')
+
+
+def merge_index(open_times: list) -> tuple:
+    """Merges the opening times of several datasets into one event order.
+
+    Parameters
+    ----------
+    open_times : list
+        The ascending opening times of every dataset.
+
+    Returns
+    -------
+    np.array
+        The dataset of every event.
+    np.array
+        The row of every event within its dataset.
+    np.array
+        The opening time of every event, in ascending order.
+    """
+
+    lengths = np.array([len(times) for times in open_times], dtype=np.int64)
+    merged = np.concatenate([np.asarray(times, dtype=np.int64)
+                             for times in open_times]
+                            + [np.zeros(0, dtype=np.int64)])
+    # A stable sort keeps the order of the datasets on equal times.
+    order = np.argsort(merged, kind='stable')
+    starts = np.cumsum(lengths) - lengths
+    legs = np.repeat(np.arange(len(open_times)), lengths)[order]
+
+    return legs, order - starts[legs], merged[order]
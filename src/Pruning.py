@@ -0,0 +1,222 @@
+"""Implement policies to stop simulating hopeless candidates during training.
+
+Classes
+----------
+PruningPolicy:
+    Implements the bookkeeping common to all pruning policies.
+DrawdownFloor:
+    Prunes candidates whose maximum draw down falls below a floor.
+EquityFloor:
+    Prunes candidates whose equity falls below a floor.
+SuccessiveHalving:
+    Keeps only the best fraction of candidates after prefixes of the data.
+"""
+
+from abc import ABC, abstractmethod
+import math
+
+import numpy as np
+
+
+class PruningPolicy(ABC):
+    """Implements the bookkeeping common to all pruning policies.
+
+    Backtest.train simulates all candidates up to the next checkpoint of the
+    policy, asks the policy which candidates to keep, and only simulates
+    those up to the following checkpoint. A selection that would prune every
+    remaining candidate is ignored.
+
+    ...
+
+    Attributes
+    ----------
+    evaluated : int
+        The number of candles simulated summed over all candidates.
+    skipped : int
+        The number of candles not simulated because of pruning, summed over
+        all pruned candidates.
+    pruned : int
+        The number of pruned candidates.
+
+    Methods
+    -------
+    checkpoints(n: int) -> list:
+        Returns the candle indices after which candidates are pruned.
+    select(trade_logs: list, alive: list, end: int, score: callable) -> list:
+        Returns the indices of the candidates to keep simulating.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Clears the counters before training on new data."""
+
+        self.evaluated = 0
+        self.skipped = 0
+        self.pruned = 0
+
+    @abstractmethod
+    def checkpoints(self, n: int) -> list:
+        """Returns the candle indices after which candidates are pruned.
+
+        Parameters
+        ----------
+        n : int
+            The number of candles of the training data.
+
+        Returns
+        -------
+        list
+            Increasing candle indices between 0 and n.
+        """
+
+        pass
+
+    @abstractmethod
+    def select(self, trade_logs: list, alive: list, end: int,
+               score: callable) -> list:
+        """Returns the indices of the candidates to keep simulating.
+
+        Parameters
+        ----------
+        trade_logs : list
+            All candidates of the training run.
+        alive : list
+            The indices of the candidates simulated up to end.
+        end : int
+            The number of candles simulated so far.
+        score : callable
+            Returns the rewards of a list of candidate indices on the
+            candles simulated so far.
+
+        Returns
+        -------
+        list
+            The indices of the candidates to keep, in increasing order.
+        """
+
+        pass
+
+
+class _FloorPolicy(PruningPolicy):
+    """Checks every candidate against a floor at regular intervals."""
+
+    def __init__(self, floor: float, every: int):
+        super().__init__()
+        self.floor = floor
+        self.every = every
+
+    def checkpoints(self, n: int) -> list:
+        return list(range(self.every, n, self.every))
+
+    def select(self, trade_logs: list, alive: list, end: int,
+               score: callable) -> list:
+        return [idx for idx in alive
+                if self._value(idx, trade_logs[idx].trade_data) >= self.floor]
+
+    @abstractmethod
+    def _value(self, idx: int, trade_data) -> float:
+        """Returns the value of a candidate compared against the floor."""
+
+        pass
+
+
+class DrawdownFloor(_FloorPolicy):
+    """Prunes candidates whose maximum draw down falls below a floor.
+
+    The draw down is tracked incrementally over the equity curve, or read
+    from the running stats of candidates that do not keep their curve.
+
+    ...
+
+    Attributes
+    ----------
+    floor : float
+        The lowest acceptable maximum draw down, e.g. -0.5 for 50 %.
+    every : int
+        The number of candles between two checks.
+    """
+
+    def __init__(self, floor: float = -0.5, every: int = 500):
+        super().__init__(floor, every)
+
+    def reset(self) -> None:
+        super().reset()
+        self._peak = {}
+        self._max_dd = {}
+        self._seen = {}
+
+    def _value(self, idx: int, trade_data) -> float:
+        if trade_data.stats is not None:
+            return trade_data.stats.max_dd
+
+        curve = trade_data.equity_curve[self._seen.get(idx, 0):]
+        if curve.size:
+            peaks = np.maximum.accumulate(
+                np.maximum(curve, self._peak.get(idx, 0.)))
+            self._max_dd[idx] = min(self._max_dd.get(idx, 0.),
+                                    (curve/peaks - 1).min())
+            self._peak[idx] = peaks[-1]
+            self._seen[idx] = self._seen.get(idx, 0) + curve.size
+
+        return self._max_dd.get(idx, 0.)
+
+
+class EquityFloor(_FloorPolicy):
+    """Prunes candidates whose equity falls below a floor.
+
+    ...
+
+    Attributes
+    ----------
+    floor : float
+        The lowest acceptable equity marked to market.
+    every : int
+        The number of candles between two checks.
+    """
+
+    def __init__(self, floor: float = 10., every: int = 500):
+        super().__init__(floor, every)
+
+    def _value(self, idx: int, trade_data) -> float:
+        return trade_data.equity_curve[-1]
+
+
+class SuccessiveHalving(PruningPolicy):
+    """Keeps only the best fraction of candidates after prefixes of the data.
+
+    All candidates are simulated on the first prefix of the training data
+    and ranked by the reward metric of the training run. Only the best
+    fraction is simulated further, up to the next prefix or the end.
+
+    ...
+
+    Attributes
+    ----------
+    prefixes : tuple
+        The fractions of the training data after which candidates are
+        ranked.
+    keep : float
+        The fraction of candidates kept at every prefix.
+    """
+
+    def __init__(self, prefixes: tuple = (0.25,), keep: float = 0.5):
+        super().__init__()
+        self.prefixes = prefixes
+        self.keep = keep
+
+    def checkpoints(self, n: int) -> list:
+        return sorted({round(prefix*n) for prefix in self.prefixes
+                       if 0 < round(prefix*n) < n})
+
+    def select(self, trade_logs: list, alive: list, end: int,
+               score: callable) -> list:
+        rewards = score(alive)
+        ranking = sorted(range(len(alive)),
+                         key=lambda pos: math.inf if math.isnan(rewards[pos])
+                         else -rewards[pos])
+        # Tolerate rounding, e.g. a keep of 1/3 of 9 candidates
+        kept = ranking[:math.ceil(self.keep*len(alive) - 1e-9)]
+
+        return sorted(alive[pos] for pos in kept)
@@ -0,0 +1,408 @@
+"""Implement strategies to search the candidates of a training run adaptively.
+
+Classes
+----------
+SearchStrategy:
+    Implements the budget and bookkeeping common to all search strategies.
+RandomSearch:
+    Simulates candidates in random order.
+SuccessiveHalvingSearch:
+    Simulates random candidates on growing prefixes of the data, keeping
+    only the best of every rung.
+TPESearch:
+    Proposes candidates resembling the best ones simulated so far.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import astuple
+import math
+from numbers import Number
+
+import numpy as np
+
+from src.Pruning import SuccessiveHalving
+
+
+class SearchStrategy(ABC):
+    """Implements the budget and bookkeeping common to all search strategies.
+
+    Backtest.train asks the strategy for a batch of candidates and the
+    fraction of the training data to simulate them on, simulates the whole
+    batch in one pass, and reports their rewards back, until the strategy
+    proposes nothing more or the budget is spent. A candidate simulated on a
+    fraction of the data is continued, not restarted, when it is proposed
+    again on a larger fraction. The best candidate on the largest fraction
+    is finally simulated to the end of the data.
+
+    Batches are sized so that the simulations they start, and the final
+    completion of the best candidate, stay within max_evals. At least one
+    candidate is simulated on all data, so a budget below one simulation is
+    exceeded. The time budget is only checked between batches.
+
+    ...
+
+    Attributes
+    ----------
+    max_evals : float
+        The budget in simulations over the whole training data, including
+        the final completion of the best candidate. Partial simulations
+        count by the fraction of candles they cover.
+    max_seconds : float
+        The budget in seconds of wall time.
+    batch_size : int
+        The number of candidates simulated together, in the lanes of
+        TradeLog.simulate_grid or by the worker processes of training.
+    seed : int
+        The seed of the random number generator.
+    evaluated : float
+        The number of simulations spent so far.
+    history : list
+        The (index, fraction, reward) of every reported simulation.
+
+    Methods
+    -------
+    reset(features: np.ndarray) -> None:
+        Prepares a search over candidates with the given features.
+    propose() -> tuple:
+        Returns the indices of the next batch and the fraction of the data.
+    observe(indices: list, fraction: float, rewards: list) -> None:
+        Records the rewards of a simulated batch.
+    exhausted(elapsed: float) -> bool:
+        Checks if the budget is spent.
+    best() -> int:
+        Returns the index of the best candidate on the largest fraction.
+    """
+
+    def __init__(self, max_evals: float = None, max_seconds: float = None,
+                 batch_size: int = 8, seed: int = 0):
+        self.max_evals = max_evals
+        self.max_seconds = max_seconds
+        self.batch_size = batch_size
+        self.seed = seed
+        self.reset(np.zeros((0, 0)))
+
+    def reset(self, features: np.ndarray) -> None:
+        """Prepares a search over candidates with the given features.
+
+        Parameters
+        ----------
+        features : np.ndarray
+            One row per candidate with its parameters scaled to [0, 1].
+        """
+
+        self.features = features
+        self.rng = np.random.default_rng(self.seed)
+        self.evaluated = 0.
+        self.history = []
+        self._observed = {}
+
+    @abstractmethod
+    def propose(self) -> tuple:
+        """Returns the indices of the next batch and the fraction of the data.
+
+        Returns
+        -------
+        list
+            The indices of the candidates to simulate, empty once the
+            search is done.
+        float
+            The fraction of the training data to simulate them up to.
+        """
+
+        pass
+
+    def observe(self, indices: list, fraction: float, rewards: list) -> None:
+        """Records the rewards of a simulated batch.
+
+        Parameters
+        ----------
+        indices : list
+            The indices of the simulated candidates.
+        fraction : float
+            The fraction of the training data they were simulated on.
+        rewards : list
+            Their rewards on that fraction.
+        """
+
+        for idx, reward in zip(indices, rewards):
+            self.history.append((idx, fraction, reward))
+            self._observed[idx] = (fraction, reward)
+
+    def exhausted(self, elapsed: float) -> bool:
+        """Checks if the budget is spent.
+
+        Parameters
+        ----------
+        elapsed : float
+            The seconds since the search started.
+
+        Returns
+        -------
+        bool
+            True if no more simulations may be started.
+        """
+
+        return ((self.max_evals is not None
+                 and self.evaluated >= self.max_evals)
+                or (self.max_seconds is not None
+                    and elapsed >= self.max_seconds))
+
+    def best(self) -> int:
+        """Returns the index of the best candidate on the largest fraction.
+
+        Ties are broken in favour of the earlier candidate, like exhaustive
+        training, and candidates without a valid reward rank last. Returns
+        0 if nothing was simulated yet.
+        """
+
+        if not self._observed:
+            return 0
+
+        return max(self._observed,
+                   key=lambda idx: (self._observed[idx][0],
+                                    _finite(self._observed[idx][1]), -idx))
+
+    def _batch_size(self, candidates: list, fraction: float) -> int:
+        """Returns how many of the candidates, in order, fit into the next
+        batch within the simulation budget.
+
+        A candidate costs the fraction of the data it is simulated further
+        by. The completion of the best candidate to all data is reserved
+        from the budget.
+        """
+
+        candidates = candidates[:self.batch_size]
+        if self.max_evals is None:
+            return len(candidates)
+
+        reached = max((done for done, _ in self._observed.values()),
+                      default=0.)
+        left = self.max_evals - self.evaluated - (1 - max(reached, fraction))
+        size = 0
+        for idx in candidates:
+            left -= fraction - self._observed.get(idx, (0., None))[0]
+            # Tolerate rounding of the fractions
+            if left < -1e-9:
+                break
+            size += 1
+
+        if not self._observed:
+            # Training needs at least one candidate simulated on all data.
+            size = max(size, min(1, len(candidates)))
+
+        return size
+
+    def _untried(self) -> np.ndarray:
+        """Returns the indices of the candidates never simulated."""
+
+        mask = np.ones(len(self.features), dtype=bool)
+        mask[list(self._observed)] = False
+
+        return np.flatnonzero(mask)
+
+
+class RandomSearch(SearchStrategy):
+    """Simulates candidates in random order.
+
+    Each candidate is simulated at most once, on all training data.
+    """
+
+    def reset(self, features: np.ndarray) -> None:
+        super().reset(features)
+        self._order = self.rng.permutation(len(features)).tolist()
+
+    def propose(self) -> tuple:
+        batch = self._order[:self._batch_size(self._order, 1.)]
+        del self._order[:len(batch)]
+
+        return batch, 1.
+
+
+class SuccessiveHalvingSearch(SearchStrategy):
+    """Simulates random candidates on growing prefixes of the data, keeping
+    only the best of every rung.
+
+    The first rung simulates the sampled candidates on min_fraction of the
+    data. Every following rung continues the best 1/eta of the previous one
+    on eta times as many candles, until the last rung covers all training
+    data. The rungs are selected by the SuccessiveHalving pruning policy.
+
+    ...
+
+    Attributes
+    ----------
+    n_candidates : int
+        The number of candidates of the first rung. If not given, as many
+        as max_evals allows, or all candidates without a simulation budget.
+    eta : float
+        The factor by which the candidates shrink and the fractions grow
+        from one rung to the next.
+    min_fraction : float
+        The fraction of the data simulated in the first rung.
+    """
+
+    def __init__(self, n_candidates: int = None, eta: float = 3.,
+                 min_fraction: float = 1/9, max_evals: float = None,
+                 max_seconds: float = None, batch_size: int = 8,
+                 seed: int = 0):
+        self.n_candidates = n_candidates
+        self.eta = eta
+        self.min_fraction = min_fraction
+        super().__init__(max_evals, max_seconds, batch_size, seed)
+
+    def reset(self, features: np.ndarray) -> None:
+        super().reset(features)
+
+        prefixes = [self.min_fraction]
+        # Tolerate rounding, e.g. 1/7 grown seven times
+        while prefixes[-1] * self.eta < 1 - 1e-9:
+            prefixes.append(prefixes[-1] * self.eta)
+        self._halving = SuccessiveHalving(tuple(prefixes), 1 / self.eta)
+        self._fractions = prefixes + [1.]
+
+        n = len(features)
+        if self.n_candidates is not None:
+            n = min(n, self.n_candidates)
+        elif self.max_evals is not None:
+            # Simulations spent per candidate of the first rung
+            cost = self._fractions[0] + sum(
+                (fraction - previous) / self.eta**rung
+                for rung, (previous, fraction) in enumerate(
+                    zip(self._fractions, self._fractions[1:]), 1))
+            n = min(n, max(1, int(self.max_evals / cost)))
+
+        self._rung = 0
+        self._members = self.rng.choice(len(features), n,
+                                        replace=False).tolist()
+        self._queue = list(self._members)
+
+    def propose(self) -> tuple:
+        if not self._queue:
+            if self._rung == len(self._fractions) - 1 or not self._members:
+                return [], 1.
+
+            self._members = self._halving.select(
+                None, self._members, None,
+                lambda members: [self._observed[idx][1]
+                                 for idx in members])
+            self._queue = list(self._members)
+            self._rung += 1
+
+        fraction = self._fractions[self._rung]
+        batch = self._queue[:self._batch_size(self._queue, fraction)]
+        del self._queue[:len(batch)]
+
+        return batch, fraction
+
+
+class TPESearch(SearchStrategy):
+    """Proposes candidates resembling the best ones simulated so far.
+
+    After a number of random candidates, the simulated candidates are split
+    into the best fraction gamma and the rest. Both groups are smoothed
+    into densities over the scaled parameters by Gaussian kernels, and the
+    untried candidates with the highest ratio of the density of the best to
+    the density of the rest are proposed next, as in the Tree-structured
+    Parzen Estimator.
+
+    ...
+
+    Attributes
+    ----------
+    n_startup : int
+        The number of random candidates simulated first.
+    gamma : float
+        The fraction of simulated candidates counted as the best.
+    min_bandwidth : float
+        The smallest kernel width on the scaled parameters.
+    """
+
+    def __init__(self, n_startup: int = 16, gamma: float = 0.25,
+                 min_bandwidth: float = 0.05, max_evals: float = None,
+                 max_seconds: float = None, batch_size: int = 8,
+                 seed: int = 0):
+        self.n_startup = n_startup
+        self.gamma = gamma
+        self.min_bandwidth = min_bandwidth
+        super().__init__(max_evals, max_seconds, batch_size, seed)
+
+    def propose(self) -> tuple:
+        untried = self._untried()
+        # Untried candidates all cost a full simulation.
+        size = self._batch_size(untried.tolist(), 1.)
+        if len(self._observed) < self.n_startup:
+            size = min(size, self.n_startup - len(self._observed))
+            return self.rng.choice(untried, size, replace=False).tolist(), 1.
+
+        observed = list(self._observed)
+        rewards = np.array([_finite(self._observed[idx][1])
+                            for idx in observed])
+        order = np.argsort(-rewards, kind='stable')
+        n_good = max(1, math.ceil(self.gamma * len(observed)))
+        good = self.features[[observed[i] for i in order[:n_good]]]
+        bad = self.features[[observed[i] for i in order[n_good:]]]
+
+        points = self.features[untried]
+        score = self._log_density(points, good) \
+            - self._log_density(points, bad)
+        # Random tie breaking, so equal scores do not favour low indices.
+        chosen = np.lexsort((self.rng.random(untried.size), -score))[:size]
+
+        return untried[chosen].tolist(), 1.
+
+    def _log_density(self, points: np.ndarray,
+                     samples: np.ndarray) -> np.array:
+        """Returns the log density of Gaussian kernels around the samples,
+        mixed with a uniform prior, at the points."""
+
+        if not samples.size:
+            return np.zeros(len(points))
+
+        n, dims = samples.shape
+        bandwidth = np.maximum(samples.std(axis=0) * n**(-1/(dims+4)),
+                               self.min_bandwidth)
+        z = (points[:, None, :] - samples[None, :, :]) / bandwidth
+        kernels = np.exp(-0.5 * (z**2).sum(axis=2)) \
+            / np.prod(bandwidth * math.sqrt(2*math.pi))
+
+        # The prior is the uniform density on the unit cube.
+        return np.log((kernels.sum(axis=1) + 1.) / (n + 1))
+
+
+def features(trade_logs: list) -> np.ndarray:
+    """Scales the numeric parameters of the candidates to [0, 1].
+
+    Every numeric parameter is replaced by the rank of its value among the
+    distinct values of all candidates, so linear and logarithmic grids are
+    treated alike. Parameters equal in all candidates are dropped.
+
+    Parameters
+    ----------
+    trade_logs : list
+        The candidates of the training run.
+
+    Returns
+    -------
+    np.ndarray
+        One row per candidate and one column per varying parameter.
+    """
+
+    rows = [astuple(log.params) for log in trade_logs]
+    columns = []
+    for values in zip(*rows):
+        if not all(isinstance(value, Number) for value in values):
+            continue
+        levels, ranks = np.unique(values, return_inverse=True)
+        if levels.size > 1:
+            columns.append(ranks / (levels.size - 1))
+
+    if not columns:
+        return np.zeros((len(trade_logs), 0))
+
+    return np.column_stack(columns)
+
+
+def _finite(reward: float) -> float:
+    """Maps invalid rewards to minus infinity, so they rank last."""
+
+    return reward if reward == reward else -math.inf
@@ -0,0 +1,272 @@
+"""Memoize the results of simulations on disk.
+
+Classes
+----------
+SimulationCache:
+    Store and replay the results of TradeLog simulations.
+"""
+
+from dataclasses import astuple
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from src.Bars import BarArrays
+from src.MarketStructure import StructureArrays
+from src.Strategy import TradeLog
+
+
+SIMULATIONS_DIR = './database/cache/simulations'
+
+# Attributes of TradeData that make up its state between two candles
+_STATE_FIELDS = ('entry', 'stop_loss', 'target', 'close', 'num_trades',
+                 'wins', 'win_rate', 'position', 'long_trigger',
+                 'long_position', 'short_trigger', 'short_position', 'equity')
+
+
+class SimulationCache:
+    """Store and replay the results of TradeLog simulations.
+
+    A result is keyed by a hash of the simulated candles, the class,
+    version and settings of the strategy, the parameters, the exchange
+    fees, the state of the trade data and the state of the market structure
+    before the simulation. It holds the appended points of the equity curve
+    and the state of the trade data and market structure afterwards, so
+    replaying it leaves the trade log exactly as simulating would.
+
+    Every result is one file. Replaying a result marks it as recently used,
+    and the least recently used results are removed whenever the files
+    exceed the size limit.
+
+    Trade logs tracking running stats or recording their trades are always
+    simulated and never cached.
+
+    ...
+
+    Attributes
+    ----------
+    cache_dir : str
+        The directory holding the results.
+    max_bytes : int
+        The size limit of all results together.
+    hits : int
+        The number of simulations replayed from the cache.
+    misses : int
+        The number of simulations run and stored in the cache.
+
+    Methods
+    -------
+    simulate(trade_logs: list, data: pd.DataFrame,
+             structure: StructureArrays = None, vectorized: bool = False)
+             -> None:
+        Simulates the trade logs, replaying cached results where possible.
+    lookup(trade_logs: list, data: pd.DataFrame) -> list:
+        Replays the cached results of the trade logs where possible.
+    store(pending: list) -> None:
+        Writes the results of simulated trade logs to the cache.
+    invalidate(strategy: type = None) -> None:
+        Removes the results of a strategy class, or all results.
+    """
+
+    def __init__(self, cache_dir: str = SIMULATIONS_DIR,
+                 max_bytes: int = 2**29):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def simulate(self, trade_logs: list, data: pd.DataFrame,
+                 structure: StructureArrays = None,
+                 vectorized: bool = False) -> None:
+        """Simulates the trade logs, replaying cached results where possible.
+
+        Parameters
+        ----------
+        trade_logs : list
+            The trade logs to be simulated.
+        data : pd.DataFrame or BarArrays
+            The historical data to be simulated.
+        structure : StructureArrays
+            The market structure of data precomputed by MarketStructure.batch.
+        vectorized : bool
+            If True the trade logs missing in the cache are simulated with
+            TradeLog.simulate_grid instead of one after another.
+        """
+
+        bars = data if isinstance(data, BarArrays) \
+            else BarArrays.from_frame(data)
+        pending = self.lookup(trade_logs, bars)
+        missing = [log for key, log, _ in pending if key is not None]
+
+        for key, log, _ in pending:
+            if key is None:
+                log.simulate(bars, structure=structure)
+        if vectorized and missing:
+            TradeLog.simulate_grid(missing, bars, structure)
+        else:
+            for log in missing:
+                log.simulate(bars, structure=structure)
+
+        self.store(pending)
+
+    def lookup(self, trade_logs: list, data: pd.DataFrame) -> list:
+        """Replays the cached results of the trade logs where possible.
+
+        Parameters
+        ----------
+        trade_logs : list
+            The trade logs to be simulated.
+        data : pd.DataFrame or BarArrays
+            The historical data to be simulated.
+
+        Returns
+        -------
+        list
+            A (key, trade log, start) tuple for every trade log that was not
+            replayed, with the start of its new equity points. The key is
+            None for trade logs that are never cached. Simulate the trade
+            logs, or copies of them, and pass the tuples to store.
+        """
+
+        bars = data if isinstance(data, BarArrays) \
+            else BarArrays.from_frame(data)
+        fingerprint = _fingerprint(bars)
+
+        pending = []
+        for log in trade_logs:
+            if (log.trade_data.stats is not None
+                    or log.trade_data.ledger is not None):
+                pending.append((None, log, 0))
+                continue
+
+            key = self._key(log, fingerprint)
+            if self._replay(key, log):
+                self.hits += 1
+                if len(bars):
+                    log.last_open_time = int(bars.open_time[-1])
+            else:
+                self.misses += 1
+                pending.append((key, log, len(log.trade_data.equity_curve)))
+
+        return pending
+
+    def store(self, pending: list) -> None:
+        """Writes the results of simulated trade logs to the cache.
+
+        Parameters
+        ----------
+        pending : list
+            The (key, trade log, start) tuples returned by lookup, with the
+            trade logs simulated.
+        """
+
+        stored = False
+        for key, log, start in pending:
+            if key is not None:
+                self._store(key, log, start)
+                stored = True
+        if stored:
+            self._evict()
+
+    def invalidate(self, strategy: type = None) -> None:
+        """Removes the results of a strategy class, or all results.
+
+        Parameters
+        ----------
+        strategy : type
+            The strategy class whose results are removed. All results are
+            removed if not given.
+        """
+
+        prefix = '' if strategy is None else strategy.__name__ + '-'
+        for entry in self._entries():
+            if entry.name.startswith(prefix):
+                os.remove(entry.path)
+
+    def _key(self, trade_log: TradeLog, fingerprint: str) -> str:
+        """Returns the file name of the result of a simulation."""
+
+        strategy = type(trade_log.strategy)
+        trade_data = trade_log.trade_data
+        state = (strategy.__module__, strategy.__qualname__,
+                 getattr(strategy, 'version', 0),
+                 trade_log.strategy.settings(), astuple(trade_log.params),
+                 trade_data.exchange_fees,
+                 tuple(getattr(trade_data, name) for name in _STATE_FIELDS),
+                 float(trade_data.equity_curve[-1]), trade_log.asset.ticker,
+                 trade_log.asset.decimals, trade_log.asset.snapshot())
+        digest = hashlib.sha256((fingerprint + repr(state)).encode())
+
+        return strategy.__name__ + '-' + digest.hexdigest() + '.pkl'
+
+    def _replay(self, key: str, trade_log: TradeLog) -> bool:
+        """Applies a cached result to a trade log, if there is one."""
+
+        path = os.path.join(self.cache_dir, key)
+        try:
+            with open(path, 'rb') as f:
+                curve, state, asset_state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False
+
+        trade_data = trade_log.trade_data
+        trade_data.extend_equity(curve)
+        for name, value in zip(_STATE_FIELDS, state):
+            setattr(trade_data, name, value)
+        trade_log.asset.restore(asset_state)
+        os.utime(path)
+
+        return True
+
+    def _store(self, key: str, trade_log: TradeLog, start: int) -> None:
+        """Writes the result of a simulation to the cache."""
+
+        trade_data = trade_log.trade_data
+        result = (trade_data.equity_curve[start:].copy(),
+                  tuple(getattr(trade_data, name) for name in _STATE_FIELDS),
+                  trade_log.asset.snapshot())
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, key)
+        # Write next to the target and rename, so concurrent runs never
+        # read a partially written result.
+        tmp = path + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def _evict(self) -> None:
+        """Removes the least recently used results above the size limit."""
+
+        entries = sorted(self._entries(),
+                         key=lambda entry: entry.stat().st_mtime_ns)
+        size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if size <= self.max_bytes:
+                break
+            size -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def _entries(self) -> list:
+        """Returns the directory entries of all results."""
+
+        if not os.path.isdir(self.cache_dir):
+            return []
+
+        with os.scandir(self.cache_dir) as entries:
+            return [entry for entry in entries
+                    if entry.name.endswith('.pkl')]
+
+
+def _fingerprint(bars: BarArrays) -> str:
+    """Returns a hash of the candles to be simulated."""
+
+    digest = hashlib.sha256()
+    for column in (bars.open_time, bars.open, bars.high, bars.low,
+                   bars.close, bars.volume):
+        digest.update(np.ascontiguousarray(column).tobytes())
+
+    return digest.hexdigest()
@@ -9,8 +9,15 @@ Strategy:
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
+import os
+import pickle
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
 
-from src.Assets import Asset, Params, TradeData
+import numpy as np
+
+from src.Assets import Asset, LaneData, Params, TradeData
+from src.Bars import Bar, BarArrays
+from src.MarketStructure import StructureArrays
 
 import pandas as pd
 
@@ -18,11 +25,26 @@ import pandas as pd
 class Strategy(ABC):
     """Implements generic functions of trades that are common amongst all
     particular trading strategies such as buying and selling.
+
+    Increase the version of a strategy whenever its trade logic changes, so
+    the results of earlier versions are no longer replayed by a
+    SimulationCache.
     """
 
+    version = 0
+
     def __init__(self):
         pass
 
+    def settings(self) -> tuple:
+        """Returns the settings of the strategy that change its results.
+
+        Trade logs are only simulated together by simulate_grid, and only
+        share cached results, if their strategies have equal settings.
+        """
+
+        return ()
+
     @abstractmethod
     def next_candle_setup(self, asset: Asset,
                           trade_data: TradeData, row: pd.Series) -> None:
@@ -37,6 +59,52 @@ class Strategy(ABC):
 
         pass
 
+    def next_bar_setup(self, asset: Asset, trade_data: TradeData,
+                       bar: Bar) -> None:
+        """Checks for valid trade set ups on a lightweight Bar.
+
+        This is the fast path used by TradeLog.simulate. The default
+        implementation converts the bar into a pd.Series and hands it to
+        next_candle_setup, so strategies only implementing the pd.Series
+        interface keep working. Override it to avoid the conversion.
+        """
+
+        self.next_candle_setup(asset, trade_data, bar.to_series())
+
+    def next_bar_trade(self, asset: Asset, params: Params,
+                       trade_data: TradeData, bar: Bar) -> None:
+        """Simulate executing trades on a lightweight Bar.
+
+        This is the fast path used by TradeLog.simulate. The default
+        implementation converts the bar into a pd.Series and hands it to
+        next_candle_trade, so strategies only implementing the pd.Series
+        interface keep working. Override it to avoid the conversion.
+        """
+
+        self.next_candle_trade(asset, params, trade_data, bar.to_series())
+
+    def next_bar_setup_lanes(self, asset: Asset, lanes: LaneData,
+                             bar: Bar) -> None:
+        """Checks for valid trade set ups for all lanes at once.
+
+        Strategies override this, together with next_bar_trade_lanes, to
+        support TradeLog.simulate_grid.
+        """
+
+        raise NotImplementedError(f'{type(self).__name__} does not support '
+                                  'simulating parameter grids in lanes.')
+
+    def next_bar_trade_lanes(self, asset: Asset, lanes: LaneData,
+                             bar: Bar) -> None:
+        """Simulate executing trades for all lanes at once.
+
+        Strategies override this, together with next_bar_setup_lanes, to
+        support TradeLog.simulate_grid.
+        """
+
+        raise NotImplementedError(f'{type(self).__name__} does not support '
+                                  'simulating parameter grids in lanes.')
+
     def _long(self, price: float, risk: float, asset: Asset, params: Params,
               trade_data: TradeData) -> None:
         """Enters a long trade.
@@ -58,8 +126,13 @@ class Strategy(ABC):
         trade_size = min(params.leverage*trade_data.equity,
                          (params.risk/risk) * trade_data.equity)
         coins = round(trade_size/price, asset.decimals)
+        if trade_data.account is not None:
+            coins = trade_data.account.cap(coins, price, asset.decimals)
         trade_data.position += coins
         trade_data.equity -= (1.+trade_data.exchange_fees) * coins*price
+        if trade_data.ledger is not None:
+            trade_data.ledger.open(trade_data.ledger.bar, 1, price, coins,
+                                   trade_data.exchange_fees * coins*price)
 
     def _short(self, price: float, risk: float, asset: Asset, params: Params,
                trade_data: TradeData) -> None:
@@ -82,8 +155,13 @@ class Strategy(ABC):
         trade_size = min(params.leverage*trade_data.equity,
                          (params.risk/risk) * trade_data.equity)
         coins = round(trade_size/price, asset.decimals)
+        if trade_data.account is not None:
+            coins = trade_data.account.cap(coins, price, asset.decimals)
         trade_data.position -= coins
         trade_data.equity += (1.-trade_data.exchange_fees) * coins*price
+        if trade_data.ledger is not None:
+            trade_data.ledger.open(trade_data.ledger.bar, -1, price, coins,
+                                   trade_data.exchange_fees * coins*price)
 
     def _close_long_trade(self, price: float, trade_data: TradeData) -> None:
         """Closes an open long or short positoin.
@@ -99,6 +177,9 @@ class Strategy(ABC):
         cash = trade_data.position*price
         trade_data.equity += (1.-trade_data.exchange_fees) * cash
         trade_data.position = 0
+        if trade_data.ledger is not None:
+            trade_data.ledger.close(trade_data.ledger.bar, price,
+                                    trade_data.exchange_fees)
 
     def _close_short_trade(self, price: float, trade_data: TradeData) -> None:
         """Closes an open long or short positoin.
@@ -114,6 +195,119 @@ class Strategy(ABC):
         cash = trade_data.position*price
         trade_data.equity += (1.-trade_data.exchange_fees) * cash
         trade_data.position = 0
+        if trade_data.ledger is not None:
+            trade_data.ledger.close(trade_data.ledger.bar, price,
+                                    trade_data.exchange_fees)
+
+    def _long_lanes(self, lanes_in: np.ndarray, price: float,
+                    risk: np.ndarray, asset: Asset, lanes: LaneData) -> None:
+        """Enters a long trade in several lanes.
+
+        Parameters
+        ----------
+        lanes_in : np.ndarray
+            The indices of the lanes entering the trade.
+        price : float
+            The price at which to buy the asset.
+        risk : np.ndarray
+            The risk per trade of every entering lane.
+        asset : Asset
+            The asset to be traded.
+        lanes : LaneData
+            The data log of all lanes of the current backtest.
+        """
+
+        equity = lanes.equity[lanes_in]
+        trade_size = np.minimum(lanes.leverage[lanes_in]*equity,
+                                (lanes.risk[lanes_in]/risk) * equity)
+        coins = np.round(trade_size/price, asset.decimals)
+        lanes.position[lanes_in] += coins
+        lanes.equity[lanes_in] -= \
+            (1.+lanes.exchange_fees[lanes_in]) * coins*price
+        if lanes.ledgers is not None:
+            self._open_lanes(lanes_in, 1, price, coins, lanes)
+
+    def _short_lanes(self, lanes_in: np.ndarray, price: float,
+                     risk: np.ndarray, asset: Asset, lanes: LaneData) -> None:
+        """Enters a short trade in several lanes.
+
+        Parameters
+        ----------
+        lanes_in : np.ndarray
+            The indices of the lanes entering the trade.
+        price : float
+            The price at which to sell the asset.
+        risk : np.ndarray
+            The risk per trade of every entering lane.
+        asset : Asset
+            The asset to be traded.
+        lanes : LaneData
+            The data log of all lanes of the current backtest.
+        """
+
+        equity = lanes.equity[lanes_in]
+        trade_size = np.minimum(lanes.leverage[lanes_in]*equity,
+                                (lanes.risk[lanes_in]/risk) * equity)
+        coins = np.round(trade_size/price, asset.decimals)
+        lanes.position[lanes_in] -= coins
+        lanes.equity[lanes_in] += \
+            (1.-lanes.exchange_fees[lanes_in]) * coins*price
+        if lanes.ledgers is not None:
+            self._open_lanes(lanes_in, -1, price, coins, lanes)
+
+    def _close_trade_lanes(self, lanes_out: np.ndarray, price: float,
+                           lanes: LaneData) -> None:
+        """Closes open long or short positions in several lanes.
+
+        Parameters
+        ----------
+        lanes_out : np.ndarray
+            The indices of the lanes closing their position.
+        price : float
+            The price at which to close the positions.
+        lanes : LaneData
+            The data log of all lanes of the current backtest.
+        """
+
+        cash = lanes.position[lanes_out]*price
+        lanes.equity[lanes_out] += \
+            (1.-lanes.exchange_fees[lanes_out]) * cash
+        lanes.position[lanes_out] = 0
+        if lanes.ledgers is not None:
+            prices = np.broadcast_to(price, lanes_out.shape)
+            for lane, lane_price in zip(lanes_out.tolist(), prices.tolist()):
+                ledger = lanes.ledgers[lane]
+                if ledger is not None:
+                    ledger.close(lanes.bar(lane), lane_price,
+                                 float(lanes.exchange_fees[lane]))
+
+    def _open_lanes(self, lanes_in: np.ndarray, side: int, price: float,
+                    coins: np.ndarray, lanes: LaneData) -> None:
+        """Records the entries of several lanes in their ledgers.
+
+        Parameters
+        ----------
+        lanes_in : np.ndarray
+            The indices of the lanes entering the trade.
+        side : int
+            1 for long trades, -1 for short trades.
+        price : float or np.ndarray
+            The entry price of every lane.
+        coins : np.ndarray
+            The number of coins traded by every lane.
+        lanes : LaneData
+            The data log of all lanes of the current backtest.
+        """
+
+        prices = np.broadcast_to(price, lanes_in.shape)
+        for lane, lane_price, lane_coins in zip(lanes_in.tolist(),
+                                                prices.tolist(),
+                                                coins.tolist()):
+            ledger = lanes.ledgers[lane]
+            if ledger is not None:
+                fees = float(lanes.exchange_fees[lane]) * lane_coins*lane_price
+                ledger.open(lanes.bar(lane), side, lane_price, lane_coins,
+                            fees)
 
 
 @dataclass
@@ -132,25 +326,245 @@ class TradeLog:
         The parameters of the strategy.
     trade_data : TradeData
         The data log of the current backtest.
+    last_open_time : int
+        The opening time of the last simulated candle.
+
+    Methods
+    -------
+    simulate(data: pd.DataFrame, columnar: bool = True,
+             structure: StructureArrays = None) -> None:
+        Applies the strategy to a whole dataset.
+    simulate_grid(trade_logs: list, data: pd.DataFrame,
+                  structure: StructureArrays = None) -> None:
+        Applies the strategy of many trade logs in a single pass.
+    push(bar: Bar) -> bool:
+        Applies the strategy to one new candle.
+    consume(bars: Iterable[Bar]) -> Iterator[float]:
+        Applies the strategy to candles as they arrive.
+    consume_async(source: AsyncIterable[Bar]) -> AsyncIterator[float]:
+        Applies the strategy to candles arriving from an async source.
+    save(path: str) -> None:
+        Writes the trade log to a file to resume it later.
+    load(path: str) -> TradeLog:
+        Reads a trade log written by save.
     """
 
     strategy: Strategy
     asset: Asset
     params: Params
     trade_data: TradeData
+    last_open_time: int = None
 
 
-    def simulate(self, data: pd.DataFrame) -> None:
+    def simulate(self, data: pd.DataFrame, columnar: bool = True,
+                 structure: StructureArrays = None) -> None:
         """Goes through a given set of historical data and applies the trading
         strategy to this data.
 
         Parameters
         ----------
-        data : pd.DataFrame
+        data : pd.DataFrame or BarArrays
+            The historical data to be simulated.
+        columnar : bool
+            If True the OHLCV columns are pulled into NumPy arrays once and
+            the strategy is fed lightweight Bar objects through
+            next_bar_setup and next_bar_trade. If False every row is handed
+            to next_candle_setup and next_candle_trade as a pd.Series.
+        structure : StructureArrays
+            The market structure of data precomputed by MarketStructure.batch.
+            If given, the market structure of the asset is replayed from it,
+            starting from the state before the first candle, instead of being
+            computed candle by candle.
+        """
+
+        self.trade_data.reserve(len(data))
+
+        if structure is not None:
+            self.asset.ms.attach(structure)
+            try:
+                self.simulate(data, columnar)
+            finally:
+                self.asset.ms.detach()
+            return
+
+        if not columnar:
+            for index, row in data.iterrows():
+                self.strategy.next_candle_trade(self.asset, self.params,
+                                                self.trade_data, row)
+                self.strategy.next_candle_setup(self.asset, self.trade_data,
+                                                row)
+                self.last_open_time = int(row['open time'])
+            return
+
+        if not isinstance(data, BarArrays):
+            data = BarArrays.from_frame(data)
+
+        next_bar_trade = self.strategy.next_bar_trade
+        next_bar_setup = self.strategy.next_bar_setup
+        asset, params, trade_data = self.asset, self.params, self.trade_data
+
+        for bar in data:
+            next_bar_trade(asset, params, trade_data, bar)
+            next_bar_setup(asset, trade_data, bar)
+        if len(data):
+            self.last_open_time = int(data.open_time[-1])
+
+    @staticmethod
+    def simulate_grid(trade_logs: list, data: pd.DataFrame,
+                      structure: StructureArrays = None) -> None:
+        """Simulates many trade logs in a single pass over the data.
+
+        The trade logs have to share the strategy, the traded asset and the
+        state of its market structure, and may only differ in their
+        parameters and trade data. The market structure is advanced once per
+        candle, and the strategy advances the trade data of all parameter
+        sets at once through next_bar_trade_lanes and next_bar_setup_lanes.
+        Afterwards every trade log is in the same state as if it had been
+        simulated on its own.
+
+        Parameters
+        ----------
+        trade_logs : list
+            The trade logs to be simulated.
+        data : pd.DataFrame or BarArrays
             The historical data to be simulated.
+        structure : StructureArrays
+            The market structure of data precomputed by MarketStructure.batch.
+        """
+
+        first = trade_logs[0]
+        for log in trade_logs[1:]:
+            if (type(log.strategy) is not type(first.strategy)
+                    or log.strategy.settings() != first.strategy.settings()
+                    or log.asset.ticker != first.asset.ticker
+                    or log.asset.decimals != first.asset.decimals
+                    or log.asset.snapshot() != first.asset.snapshot()):
+                raise ValueError('Trade logs simulated as a grid have to '
+                                 'share strategy, asset and market '
+                                 'structure.')
+
+        if not isinstance(data, BarArrays):
+            data = BarArrays.from_frame(data)
+
+        asset = first.asset.copy()
+        lanes = LaneData.from_trade_data([log.trade_data
+                                          for log in trade_logs],
+                                         [log.params for log in trade_logs],
+                                         len(data))
+        next_bar_trade = first.strategy.next_bar_trade_lanes
+        next_bar_setup = first.strategy.next_bar_setup_lanes
+
+        if structure is not None:
+            asset.ms.attach(structure)
+        for bar in data:
+            next_bar_trade(asset, lanes, bar)
+            next_bar_setup(asset, lanes, bar)
+        asset.ms.detach()
+
+        lanes.write_back([log.trade_data for log in trade_logs])
+        for log in trade_logs:
+            log.asset.restore(asset.snapshot())
+            if len(data):
+                log.last_open_time = int(data.open_time[-1])
+
+    def push(self, bar: Bar) -> bool:
+        """Applies the trading strategy to one new candle.
+
+        This does the same work per candle as simulate, without building a
+        data frame, so a trade log can follow live candles after being
+        backtested. Candles not newer than the last simulated candle are
+        ignored, so a resumed trade log can be fed from the start of a
+        source.
+
+        Parameters
+        ----------
+        bar : Bar
+            The next incoming price data candle.
+
+        Returns
+        -------
+        bool
+            True if the candle was simulated, False if it was ignored.
+        """
+
+        if (self.last_open_time is not None
+                and bar.open_time <= self.last_open_time):
+            return False
+
+        self.strategy.next_bar_trade(self.asset, self.params,
+                                     self.trade_data, bar)
+        self.strategy.next_bar_setup(self.asset, self.trade_data, bar)
+        self.last_open_time = bar.open_time
+
+        return True
+
+    def consume(self, bars: Iterable[Bar]) -> Iterator[float]:
+        """Applies the trading strategy to candles as they arrive.
+
+        Parameters
+        ----------
+        bars : Iterable[Bar]
+            The incoming price data candles.
+
+        Yields
+        ------
+        float
+            The equity marked to market after every simulated candle.
+        """
+
+        for bar in bars:
+            if self.push(bar):
+                yield self.trade_data.mark_to_market
+
+    async def consume_async(
+            self, source: AsyncIterable[Bar]) -> AsyncIterator[float]:
+        """Applies the trading strategy to candles from an async source.
+
+        Parameters
+        ----------
+        source : AsyncIterable[Bar]
+            The incoming price data candles.
+
+        Yields
+        ------
+        float
+            The equity marked to market after every simulated candle.
+        """
+
+        async for bar in source:
+            if self.push(bar):
+                yield self.trade_data.mark_to_market
+
+    def save(self, path: str) -> None:
+        """Writes the trade log to a file to resume it later.
+
+        Parameters
+        ----------
+        path : str
+            The file to write.
+        """
+
+        # Write next to the target and rename, so a crash never leaves a
+        # partially written state behind.
+        tmp = path + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path: str) -> 'TradeLog':
+        """Reads a trade log written by save.
+
+        Parameters
+        ----------
+        path : str
+            The file to read.
+
+        Returns
+        -------
+        TradeLog
+            The trade log in the state it was saved in.
         """
 
-        for index, row in data.iterrows():
-            self.strategy.next_candle_trade(self.asset, self.params,
-                                            self.trade_data, row)
-            self.strategy.next_candle_setup(self.asset, self.trade_data, row)
+        with open(path, 'rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,332 @@
+"""Do walk-forward optimization of a strategy on historical data.
+
+Classes
+----------
+Window:
+    Represent the candle ranges of one training and testing step.
+WindowResult:
+    Hold the optimal strategy of one window and its equity curves.
+WalkForward:
+    Train on every window and test on the candles following it.
+
+Functions
+----------
+stitch_equity:
+    Chain the equity curves of consecutive test windows into one curve.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import copy
+from dataclasses import astuple, dataclass
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from src.Backtest import Backtest, _argmax_first, _rewards
+from src.Bars import BarArrays
+from src.MarketStructure import StructureArrays
+from src.SimulationCache import _STATE_FIELDS, _fingerprint
+from src.Strategy import TradeLog
+
+
+class Window(NamedTuple):
+    """Represent the candle ranges of one training and testing step.
+
+    ...
+
+    Attributes
+    ----------
+    train_start : int
+        The index of the first training candle.
+    train_end : int
+        The index after the last training candle and of the first test
+        candle.
+    test_end : int
+        The index after the last test candle.
+    """
+
+    train_start: int
+    train_end: int
+    test_end: int
+
+
+@dataclass
+class WindowResult:
+    """Hold the optimal strategy of one window and its equity curves.
+
+    ...
+
+    Attributes
+    ----------
+    window : Window
+        The candle ranges of the window.
+    optimal_trade : TradeLog
+        The strategy that performed best on the training candles, after
+        testing.
+    equity_train : np.array
+        The equity curve of the optimal strategy on the training candles.
+    equity_test : np.array
+        The equity curve of the optimal strategy on the test candles.
+    """
+
+    window: Window
+    optimal_trade: TradeLog
+    equity_train: np.array
+    equity_test: np.array
+
+
+class WalkForward():
+    """Trains on a window of candles and tests on the candles following it.
+
+    The windows move forward by the number of test candles. Rolling windows
+    keep a fixed number of training candles, anchored windows always start
+    at the first candle.
+
+    The market structure is computed once for the whole dataset and every
+    window replays its part of it. Anchored windows simulate the parameter
+    grid once over the whole dataset, and every window only extends the
+    simulation of the previous one by its new candles. Rolling windows start
+    with fresh trade data, so they are trained independently and in
+    parallel. The optimum of every training window is cached, so running
+    again with other test settings only simulates the test candles.
+
+    ...
+
+    Attributes
+    ----------
+    train_size : int
+        The number of training candles of rolling windows, and of the first
+        anchored window.
+    test_size : int
+        The number of test candles of every window.
+    anchored : bool
+        If True every window is trained from the first candle.
+    workers : int
+        The number of worker processes training rolling windows.
+    vectorized : bool
+        If True the parameter grid is simulated with TradeLog.simulate_grid.
+
+    Methods
+    -------
+    windows(n: int) -> list:
+        Returns the windows covering n candles.
+    run(trade_logs: list, data: pd.DataFrame, return_metric: callable,
+        reward_metric: callable, structure: StructureArrays = None) -> list:
+        Trains and tests all windows on the data.
+    clear_cache() -> None:
+        Forgets the optimal strategies of all training windows.
+    """
+
+    def __init__(self, train_size: int, test_size: int,
+                 anchored: bool = False, workers: int = 1,
+                 vectorized: bool = True):
+        self.train_size = train_size
+        self.test_size = test_size
+        self.anchored = anchored
+        self.workers = workers
+        self.vectorized = vectorized
+        self._trained = {}
+
+    def windows(self, n: int) -> list:
+        """Returns the windows covering n candles.
+
+        The last window is shortened if its test candles exceed the data.
+
+        Parameters
+        ----------
+        n : int
+            The number of candles of the data.
+
+        Returns
+        -------
+        list
+            The windows in chronological order.
+        """
+
+        windows = []
+        for train_end in range(self.train_size, n, self.test_size):
+            train_start = 0 if self.anchored else train_end - self.train_size
+            windows.append(Window(train_start, train_end,
+                                  min(train_end + self.test_size, n)))
+
+        return windows
+
+    def run(self, trade_logs: list, data: pd.DataFrame,
+            return_metric: callable, reward_metric: callable,
+            structure: StructureArrays = None) -> list:
+        """Trains and tests all windows on the data.
+
+        Parameters
+        ----------
+        trade_logs : list
+            The candidates for the optimal strategy, starting at the first
+            candle of data. They are copied for every window and are not
+            modified.
+        data : pd.DataFrame
+            The historical data to be simulated.
+        return_metric : callable
+            The function to compute the returns of a trade.
+        reward_metric : callable
+            The metric to be used to evaluate the performance of a trade.
+        structure : StructureArrays
+            The market structure of data precomputed by MarketStructure.batch.
+            It is computed from the first candidate if not given.
+
+        Returns
+        -------
+        list
+            One WindowResult per window in chronological order.
+        """
+
+        bars = data if isinstance(data, BarArrays) \
+            else BarArrays.from_frame(data)
+        if structure is None:
+            structure = trade_logs[0].asset.ms.batch(bars)
+
+        windows = self.windows(len(bars))
+        keys = [self._key(trade_logs, bars, window, return_metric,
+                          reward_metric) for window in windows]
+        missing = [(window, key) for window, key in zip(windows, keys)
+                   if key not in self._trained]
+
+        if self.anchored:
+            trained = self._train_anchored(trade_logs, bars, structure,
+                                           return_metric, reward_metric,
+                                           [window for window, _ in missing])
+        else:
+            trained = self._train_rolling(trade_logs, bars, structure,
+                                          return_metric, reward_metric,
+                                          [window for window, _ in missing])
+
+        for (_, key), optimal_trade in zip(missing, trained):
+            self._trained[key] = optimal_trade
+
+        results = []
+        for window, key in zip(windows, keys):
+            optimal_trade = copy.deepcopy(self._trained[key])
+            equity_train = optimal_trade.trade_data.equity_curve.copy()
+            optimal_trade.trade_data.equity_curve = \
+                np.array([optimal_trade.trade_data.mark_to_market])
+
+            test = slice(window.train_end, window.test_end)
+            optimal_trade.simulate(bars[test], structure=structure[test])
+
+            results.append(WindowResult(window, optimal_trade, equity_train,
+                                        optimal_trade.trade_data.equity_curve))
+
+        return results
+
+    def clear_cache(self) -> None:
+        """Forgets the optimal strategies of all training windows."""
+
+        self._trained.clear()
+
+    def _train_rolling(self, trade_logs: list, bars: BarArrays,
+                       structure: StructureArrays, return_metric: callable,
+                       reward_metric: callable, windows: list) -> list:
+        """Trains fresh copies of the candidates on every window."""
+
+        args = [(trade_logs, bars[window.train_start:window.train_end],
+                 structure[window.train_start:window.train_end],
+                 return_metric, reward_metric, self.vectorized)
+                for window in windows]
+
+        if self.workers > 1 and len(windows) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                return list(executor.map(_train_window, *zip(*args)))
+
+        return [_train_window(*arg) for arg in args]
+
+    def _train_anchored(self, trade_logs: list, bars: BarArrays,
+                        structure: StructureArrays, return_metric: callable,
+                        reward_metric: callable, windows: list) -> list:
+        """Extends one simulation of the candidates from window to window."""
+
+        trade_logs = copy.deepcopy(trade_logs)
+        trained = []
+        start = 0
+        for window in windows:
+            chunk = slice(start, window.train_end)
+            if self.vectorized:
+                TradeLog.simulate_grid(trade_logs, bars[chunk],
+                                       structure[chunk])
+            else:
+                for log in trade_logs:
+                    log.simulate(bars[chunk], structure=structure[chunk])
+            start = window.train_end
+
+            rewards = _rewards([log.trade_data for log in trade_logs],
+                               return_metric, reward_metric)
+            trained.append(copy.deepcopy(trade_logs[_argmax_first(rewards)]))
+
+        return trained
+
+    def _key(self, trade_logs: list, bars: BarArrays, window: Window,
+             return_metric: callable, reward_metric: callable) -> tuple:
+        """Identifies the training candles, candidates and metrics of a
+        window.
+
+        The training candles are identified by their hash, and every
+        candidate by the same material SimulationCache keys its results by:
+        the class, version and settings of its strategy, its parameters, the
+        exchange fees, the state of its trade data and the state of its
+        market structure.
+        """
+
+        first = trade_logs[0]
+        candidates = tuple(
+            (type(log.strategy).__module__, type(log.strategy).__qualname__,
+             getattr(log.strategy, 'version', 0), log.strategy.settings(),
+             astuple(log.params), log.trade_data.exchange_fees,
+             tuple(getattr(log.trade_data, name) for name in _STATE_FIELDS),
+             float(log.trade_data.equity_curve[-1]), log.asset.snapshot())
+            for log in trade_logs)
+
+        return (self.anchored, self.vectorized, first.asset.ticker,
+                first.asset.decimals, candidates,
+                _qualname(return_metric), _qualname(reward_metric),
+                _fingerprint(bars[window.train_start:window.train_end]))
+
+
+def _qualname(func: callable) -> str:
+    """Returns the module and qualified name of a function."""
+
+    return (getattr(func, '__module__', None) or '') + '.' \
+        + getattr(func, '__qualname__', repr(func))
+
+
+def stitch_equity(results: list, equity: float = 100.) -> np.array:
+    """Chain the equity curves of consecutive test windows into one curve.
+
+    Every test curve contributes its returns, so the stitched curve is the
+    equity of trading each window's optimum on its out-of-sample candles.
+
+    Parameters
+    ----------
+    results : list
+        The WindowResults of WalkForward.run.
+    equity : float
+        The first point of the stitched curve.
+
+    Returns
+    -------
+    np.array
+        The stitched out-of-sample equity curve.
+    """
+
+    curves = [np.array([equity])]
+    for result in results:
+        curve = result.equity_test
+        curves.append(curves[-1][-1] * curve[1:] / curve[0])
+
+    return np.concatenate(curves)
+
+
+def _train_window(trade_logs: list, bars: BarArrays,
+                  structure: StructureArrays, return_metric: callable,
+                  reward_metric: callable, vectorized: bool) -> TradeLog:
+    """Trains fresh copies of the candidates on the candles of a window."""
+
+    return Backtest().train(copy.deepcopy(trade_logs), bars, return_metric,
+                            reward_metric, structure, vectorized=vectorized)
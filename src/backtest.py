@@ -15,9 +15,15 @@ from src.Assets import Asset, Params, TradeData
 from src.Backtest import Backtest
 from src.strategies.ContinuationTrade import ContinuationTrade
 from src.MarketStructure import MarketStructure
+from src.Portfolio import Portfolio
+from src.SimulationCache import SimulationCache
+import src.utils.datasets as datasets
+from src.utils.fills import IntrabarFills
 import src.utils.metrics as metrics
 import src.utils.plotting as plotting
-from src.Strategy import  TradeLog
+from src.utils.profiling import Profiler
+from src.Strategy import Strategy, TradeLog
+from src.WalkForward import WalkForward, stitch_equity
 
 
 class Tickers(Enum):
@@ -49,6 +55,8 @@ class Strategies(Enum):
     """Strategies available for backtesting."""
 
     CONTINUATION_TRADE = (ContinuationTrade(), 'Continuation Trade')
+    CONTINUATION_TRADE_INTRABAR = (ContinuationTrade(
+        IntrabarFills('pessimistic')), 'Continuation Trade Intrabar')
 
 
 # Fees for the exchange
@@ -67,16 +75,48 @@ leverage_samples = [1, 3, 5, 10]
 risk_reward = [2.0, 3.0]
 # Timeframe to be used for the backtest
 timeframe = Timeframes.ONE_HOUR.value
+# Number of worker processes simulating the parameter grid in parallel
+workers = os.cpu_count()
+# Simulate the whole parameter grid in a single pass over the data
+vectorized = True
+# Replay simulation results cached on disk by earlier runs
+cache_results = True
+# Directory to write a profile of the simulations to (profile.json and
+# profile.prof), None to not profile
+profile_dir = None
+# Walk-forward (train candles, test candles), None for a single split
+walk_forward = None
+# Train every walk-forward window from the first candle
+anchored = False
+# Highest gross exposure relative to equity when trading all Tickers with
+# run_portfolio
+max_leverage = 3.
+# Adaptive search of the parameter grid, e.g. TPESearch(max_evals=100),
+# None to simulate every candidate
+search = None
 
 
-if __name__ == '__main__':
+def make_trade_logs(df: pd.DataFrame, ticker: tuple, strategy: Strategy,
+                    timeframe: str) -> list:
+    """Build the parameter grid of candidates starting at the first candle.
 
-    bt = Backtest()
-    trade_logs = []
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The historical data to be simulated.
+    ticker : tuple
+        The name and decimals of the asset, as in Tickers.
+    strategy : Strategy
+        The strategy to be backtested.
+    timeframe : str
+        The timeframe of the historical data.
 
-    df = pd.read_csv('./database/datasets/binance_futures/' +
-                     ticker[0] + '/' +
-                     timeframe + '.csv')
+    Returns
+    -------
+    list
+        One trade log per combination of risk, leverage and risk reward
+        samples.
+    """
 
     first_price = df.iloc[0]
     date = first_price['open time']
@@ -86,22 +126,68 @@ if __name__ == '__main__':
                          (first_price.low, date))
     asset = Asset(ticker[0], ticker[1], ms)
 
-    for idxr, risk in enumerate(risk_samples):
-        for idxl, leverage in enumerate(leverage_samples):
-            for idxrr, rr in enumerate(risk_reward):
+    trade_logs = []
+    for risk in risk_samples:
+        for leverage in leverage_samples:
+            for rr in risk_reward:
                 trade_logs.append(TradeLog(strategy,
-                                           asset,
+                                           asset.copy(),
                                            Params(risk, rr, leverage,
                                                   timeframe),
                                            TradeData(exchange_fees)))
 
+    return trade_logs
+
+
+def run_backtest(df: pd.DataFrame, ticker: tuple, strategy: Strategy,
+                 timeframe: str, workers: int = workers,
+                 vectorized: bool = vectorized,
+                 cache: SimulationCache = None,
+                 profiler: Profiler = None) -> tuple:
+    """Optimize the parameters on the training split and test the optimum.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The historical data to be simulated.
+    ticker : tuple
+        The name and decimals of the asset, as in Tickers.
+    strategy : Strategy
+        The strategy to be backtested.
+    timeframe : str
+        The timeframe of the historical data.
+    workers : int
+        The number of worker processes simulating the parameter grid.
+    vectorized : bool
+        Simulate the whole parameter grid in a single pass over the data.
+    cache : SimulationCache
+        The cache replaying the results of earlier simulations, if any.
+    profiler : Profiler
+        The profiler counting the phases of all simulations, if any.
+
+    Returns
+    -------
+    TradeLog
+        The strategy that performed best on training data, after testing.
+    np.array
+        The equity curve of the training phase.
+    np.array
+        The equity curve of the testing phase.
+    """
+
+    bt = Backtest(cache, profiler)
+    trade_logs = make_trade_logs(df, ticker, strategy, timeframe)
+
     train_idx = round(len(df) * train_test_split)
     df_train = df.iloc[:train_idx]
     df_test = df.iloc[train_idx:]
 
+    structure = trade_logs[0].asset.ms.batch(df_train)
+
     optimal_trade = bt.train(trade_logs, df_train,
                              metrics.calculate_returns,
-                             metrics.calculate_sharpe)
+                             metrics.calculate_sharpe,
+                             structure, workers, vectorized, search=search)
 
     equity_train = optimal_trade.trade_data.equity_curve
     optimal_trade.trade_data.equity_curve = \
@@ -110,5 +196,75 @@ if __name__ == '__main__':
     optimal_trade = bt.test(optimal_trade, df_test)
     equity_test = optimal_trade.trade_data.equity_curve
 
+    return optimal_trade, equity_train, equity_test
+
+
+def run_portfolio(tickers: list, strategy: Strategy, timeframe: str,
+                  params: Params,
+                  max_leverage: float = max_leverage) -> Portfolio:
+    """Trade several assets with one set of parameters and a shared account.
+
+    Parameters
+    ----------
+    tickers : list
+        The names and decimals of the assets, as in Tickers.
+    strategy : Strategy
+        The strategy traded on every asset.
+    timeframe : str
+        The timeframe of the historical data.
+    params : Params
+        The parameters of the strategy.
+    max_leverage : float
+        The highest gross exposure of the account relative to its equity.
+
+    Returns
+    -------
+    Portfolio
+        The simulated portfolio.
+    """
+
+    trade_logs, data = [], []
+    for name, decimals in tickers:
+        bars = datasets.load_bars(name, timeframe)
+        high = (bars.high[0], bars.open_time[0])
+        low = (bars.low[0], bars.open_time[0])
+        asset = Asset(name, decimals, MarketStructure(high, low, high, low))
+        trade_logs.append(TradeLog(strategy, asset, params,
+                                   TradeData(exchange_fees)))
+        data.append(bars)
+
+    portfolio = Portfolio(trade_logs, max_leverage=max_leverage)
+    portfolio.simulate(data)
+
+    return portfolio
+
+
+if __name__ == '__main__':
+
+    df = datasets.load_frame(ticker[0], timeframe)
+
+    if walk_forward is not None:
+        wf = WalkForward(*walk_forward, anchored=anchored, workers=workers,
+                         vectorized=vectorized)
+        results = wf.run(make_trade_logs(df, ticker, strategy, timeframe),
+                         df, metrics.calculate_returns,
+                         metrics.calculate_sharpe)
+
+        for result in results:
+            print(result.window, result.optimal_trade.params)
+        metrics.print_stats(stitch_equity(results))
+        sys.exit()
+
+    cache = SimulationCache() if cache_results else None
+    profiler = Profiler(cprofile=True) if profile_dir is not None else None
+    optimal_trade, equity_train, equity_test = run_backtest(
+        df, ticker, strategy, timeframe, cache=cache, profiler=profiler)
+    if cache is not None:
+        print(f'Simulation cache: {cache.hits} hits, {cache.misses} misses')
+    if profiler is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+        profiler.save_json(os.path.join(profile_dir, 'profile.json'))
+        profiler.dump_stats(os.path.join(profile_dir, 'profile.prof'))
+
     plotting.plot_backtest(optimal_trade, test_name, equity_train,
                            equity_test)
@@ -0,0 +1,218 @@
+"""Run the backtest for many tickers, timeframes and strategies at once.
+
+Every combination of ticker and timeframe is one job. A job loads its
+dataset once and backtests all strategies on it. Jobs are submitted to a
+process pool largest dataset first, so the longest jobs do not become
+stragglers at the end of the batch. The results of all jobs are collected
+in one table. Run from the repository root, e.g.
+
+    python src/batch.py --tickers BTCBUSD ETHBUSD --timeframes 1h 4h
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+import sys
+import time
+from typing import NamedTuple
+
+currentdir = os.path.dirname(os.path.realpath(__file__))
+parentdir = os.path.dirname(currentdir)
+sys.path.append(parentdir)
+
+import pandas as pd
+
+from src.backtest import Strategies, Tickers, Timeframes, run_backtest
+import src.utils.datasets as datasets
+import src.utils.metrics as metrics
+
+
+# File the consolidated results table is written to
+results_path = './src/backtest_reports/batch_results.csv'
+
+
+class Job(NamedTuple):
+    """Represent the backtests of all strategies on one dataset.
+
+    ...
+
+    Attributes
+    ----------
+    ticker : tuple
+        The name and decimals of the asset, as in Tickers.
+    timeframe : str
+        The timeframe of the historical data.
+    strategies : tuple
+        The (strategy, name) pairs to be backtested, as in Strategies.
+    size : int
+        The size of the CSV file in bytes, used to schedule the job.
+    """
+
+    ticker: tuple
+    timeframe: str
+    strategies: tuple
+    size: int
+
+
+def make_jobs(tickers: list, timeframes: list, strategies: list,
+              datasets_dir: str = datasets.DATASETS_DIR) -> list:
+    """Build one job per available dataset, largest dataset first.
+
+    Combinations of ticker and timeframe without a CSV file are skipped.
+
+    Parameters
+    ----------
+    tickers : list
+        The tickers to be backtested, as in Tickers.
+    timeframes : list
+        The timeframes to be backtested, as in Timeframes.
+    strategies : list
+        The (strategy, name) pairs to be backtested, as in Strategies.
+    datasets_dir : str
+        The directory holding one subdirectory of CSV files per ticker.
+
+    Returns
+    -------
+    list
+        The jobs sorted by decreasing dataset size.
+    """
+
+    jobs = []
+    for ticker in tickers:
+        for timeframe in timeframes:
+            path = datasets.csv_path(ticker[0], timeframe, datasets_dir)
+            if os.path.exists(path):
+                jobs.append(Job(ticker, timeframe, tuple(strategies),
+                                os.path.getsize(path)))
+
+    return sorted(jobs, key=lambda job: job.size, reverse=True)
+
+
+def run_job(job: Job, datasets_dir: str = datasets.DATASETS_DIR,
+            cache_dir: str = datasets.CACHE_DIR) -> list:
+    """Backtest all strategies of a job on its dataset.
+
+    The dataset is loaded once and shared by all strategies. The parameter
+    grid is simulated in this process, since the job already runs in a
+    worker of the batch.
+
+    Parameters
+    ----------
+    job : Job
+        The job to be run.
+    datasets_dir : str
+        The directory holding one subdirectory of CSV files per ticker.
+    cache_dir : str
+        The directory holding the cached columns.
+
+    Returns
+    -------
+    list
+        One row of the results table per strategy.
+    """
+
+    start = time.perf_counter()
+    df = datasets.load_frame(job.ticker[0], job.timeframe, datasets_dir,
+                             cache_dir)
+    load_time = time.perf_counter() - start
+
+    rows = []
+    for strategy, name in job.strategies:
+        start = time.perf_counter()
+        optimal_trade, equity_train, equity_test = run_backtest(
+            df, job.ticker, strategy, job.timeframe, workers=1,
+            vectorized=True)
+        wall_time = time.perf_counter() - start
+
+        stats = metrics.get_stats(equity_test)
+        rows.append({'ticker': job.ticker[0], 'timeframe': job.timeframe,
+                     'strategy': name, 'bars': len(df),
+                     'risk': optimal_trade.params.risk,
+                     'reward_risk': optimal_trade.params.reward_risk,
+                     'leverage': optimal_trade.params.leverage,
+                     'train_total_return':
+                         equity_train[-1] / equity_train[0] - 1,
+                     'test_total_return':
+                         equity_test[-1] / equity_test[0] - 1,
+                     'test_max_dd': stats['max_dd'],
+                     'test_sharpe': stats['sharpe'],
+                     'load_time': load_time, 'wall_time': wall_time,
+                     'bars_per_sec': len(df) / wall_time})
+
+    return rows
+
+
+def run_batch(tickers: list, timeframes: list, strategies: list,
+              workers: int = os.cpu_count(),
+              datasets_dir: str = datasets.DATASETS_DIR,
+              cache_dir: str = datasets.CACHE_DIR) -> pd.DataFrame:
+    """Run the backtests of all combinations on a process pool.
+
+    Parameters
+    ----------
+    tickers : list
+        The tickers to be backtested, as in Tickers.
+    timeframes : list
+        The timeframes to be backtested, as in Timeframes.
+    strategies : list
+        The (strategy, name) pairs to be backtested, as in Strategies.
+    workers : int
+        The number of worker processes running jobs in parallel.
+    datasets_dir : str
+        The directory holding one subdirectory of CSV files per ticker.
+    cache_dir : str
+        The directory holding the cached columns.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per ticker, timeframe and strategy, sorted in that order.
+    """
+
+    jobs = make_jobs(tickers, timeframes, strategies, datasets_dir)
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # The pool starts jobs in submission order, so the largest datasets
+        # are picked up first.
+        futures = [executor.submit(run_job, job, datasets_dir, cache_dir)
+                   for job in jobs]
+        for future in as_completed(futures):
+            rows.extend(future.result())
+
+    results = pd.DataFrame(rows)
+    if rows:
+        results = results.sort_values(['ticker', 'timeframe', 'strategy'],
+                                      ignore_index=True)
+
+    return results
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickers', nargs='+',
+                        default=[ticker.name for ticker in Tickers],
+                        choices=[ticker.name for ticker in Tickers])
+    parser.add_argument('--timeframes', nargs='+',
+                        default=[timeframe.value for timeframe in Timeframes],
+                        choices=[timeframe.value for timeframe in Timeframes])
+    parser.add_argument('--strategies', nargs='+',
+                        default=[strategy.name for strategy in Strategies],
+                        choices=[strategy.name for strategy in Strategies])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default=results_path)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_batch([Tickers[name].value for name in args.tickers],
+                        args.timeframes,
+                        [Strategies[name].value for name in args.strategies],
+                        args.workers)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    results.to_csv(args.output, index=False)
+
+    print(results.to_string(index=False))
+    print(f'{len(results)} backtests in '
+          f'{time.perf_counter() - start:.1f}s written to {args.output}')
@@ -5,21 +5,34 @@ Classes
 ContinuationTrade:
     Implement the buy and sell logic of a continuation trade.
 """
-import logging
 
 import numpy as np
 import pandas as pd
 
-from src.Assets import Asset, Params, TradeData
+from src.Assets import Asset, LaneData, Params, TradeData
+from src.Bars import Bar
 from src.Strategy import Strategy
+from src.utils.fills import IntrabarFills, limit_price, stop_price
+import src.utils.tracing as tracing
 
 
 class ContinuationTrade(Strategy):
     """Implements the logical rules for a trend reversal trade triggered by an
     initial market structure break.
 
+    By default entries and exits are filled at the close of a candle. With
+    intrabar fills, entries fill as soon as the candle reaches the entry,
+    and positions close at their stop loss or target as soon as the candle
+    reaches them. On the candle of an entry only the stop loss is checked,
+    since the path of the price after the fill is unknown.
+
     ...
 
+    Attributes
+    ----------
+    fills : IntrabarFills
+        If set, orders are filled inside the candle.
+
     Methods
     -------
     next_candle_setup(row: pd.Series) -> None:
@@ -28,10 +41,24 @@ class ContinuationTrade(Strategy):
     next_candle_trade(row: pd.Series) -> None:
         Checks for valid trade set ups with new live data and execute live
         trades.
+    next_bar_setup(bar: Bar) -> None:
+        Same as next_candle_setup for a lightweight Bar.
+    next_bar_trade(bar: Bar) -> None:
+        Same as next_candle_trade for a lightweight Bar.
+    next_bar_setup_lanes(bar: Bar) -> None:
+        Same as next_bar_setup for all lanes of a parameter grid at once.
+    next_bar_trade_lanes(bar: Bar) -> None:
+        Same as next_bar_trade for all lanes of a parameter grid at once.
     """
 
-    def __init__(self):
+    def __init__(self, fills: IntrabarFills = None):
         super().__init__()
+        self.fills = fills
+
+    def settings(self) -> tuple:
+        """Returns the settings of the strategy that change its results."""
+
+        return () if self.fills is None else self.fills.settings()
 
     def next_candle_setup(self, asset: Asset, trade_data: TradeData,
                           row: pd.Series) -> None:
@@ -47,22 +74,37 @@ class ContinuationTrade(Strategy):
             Row of live data.
         """
 
-        trend, msb, continuation, stay_in_range = asset.ms.next_candle(row)
+        self.next_bar_setup(asset, trade_data, Bar.from_series(row))
+
+    def next_bar_setup(self, asset: Asset, trade_data: TradeData,
+                       bar: Bar) -> None:
+        """Activates trade triggers and sets stop losses.
+
+        Parameters
+        ----------
+        asset : Asset
+            The asset to be traded.
+        trade_data : TradeData
+            The data log of the current backtest.
+        bar : Bar
+            Candle of live data.
+        """
+
+        trend, msb, continuation, stay_in_range = asset.ms.next_bar(bar)
 
         if continuation and trend:
-            trade_data.entry = 0.66*asset.ms.prev_low[0] \
-                + 0.33*asset.ms.prev_high[0]
-            trade_data.stop_loss = asset.ms.prev_low[0]
+            trade_data.entry = 0.66*asset.ms.prev_low_price \
+                + 0.33*asset.ms.prev_high_price
+            trade_data.stop_loss = asset.ms.prev_low_price
             trade_data.long_trigger = True
         elif continuation and (not trend):
-            trade_data.entry = 0.66*asset.ms.prev_high[0] \
-                + 0.33*asset.ms.prev_low[0]
-            trade_data.stop_loss = asset.ms.prev_high[0]
+            trade_data.entry = 0.66*asset.ms.prev_high_price \
+                + 0.33*asset.ms.prev_low_price
+            trade_data.stop_loss = asset.ms.prev_high_price
             trade_data.short_trigger = True
 
-        trade_data.close = row['close']
-        trade_data.equity_curve = np.append(trade_data.equity_curve,
-                                            trade_data.mark_to_market)
+        trade_data.close = bar.close
+        trade_data.append_equity(trade_data.mark_to_market)
 
     def next_candle_trade(self, asset: Asset, params: Params,
                           trade_data: TradeData, row: pd.Series) -> None:
@@ -80,68 +122,625 @@ class ContinuationTrade(Strategy):
             Row of live data.
         """
 
-        # Entry Long
+        self.next_bar_trade(asset, params, trade_data, Bar.from_series(row))
+
+    def next_bar_trade(self, asset: Asset, params: Params,
+                       trade_data: TradeData, bar: Bar) -> None:
+        """Enters trade after triggered and follows through until trade exit.
+
+        Parameters
+        ----------
+        asset : Asset
+            The asset to be traded.
+        params : Params
+            The parameters for the strategy.
+        trade_data : TradeData
+            The data log of the current backtest.
+        bar : Bar
+            Candle of live data.
+        """
+
+        if self.fills is not None:
+            self._next_bar_trade_intrabar(asset, params, trade_data, bar)
+            return
+
         if trade_data.long_trigger:
-            price = row['close']
-            if price <= asset.ms.prev_low[0]:
-                trade_data.long_trigger = False
-            elif price >= asset.ms.prev_high[0] and not asset.ms.continuation:
-                trade_data.long_trigger = False
+            self._enter_long(asset, params, trade_data, bar.close)
+        if trade_data.long_position:
+            self._exit(trade_data, bar, True)
+
+        if trade_data.short_trigger:
+            self._enter_short(asset, params, trade_data, bar.close)
+        if trade_data.short_position:
+            self._exit(trade_data, bar, False)
+
+    def next_bar_setup_lanes(self, asset: Asset, lanes: LaneData,
+                             bar: Bar) -> None:
+        """Activates trade triggers and sets stop losses in all lanes.
+
+        Parameters
+        ----------
+        asset : Asset
+            The asset to be traded.
+        lanes : LaneData
+            The data log of all lanes of the current backtest.
+        bar : Bar
+            Candle of live data.
+        """
+
+        trend, msb, continuation, stay_in_range = asset.ms.next_bar(bar)
+
+        if continuation and trend:
+            lanes.entry[:] = 0.66*asset.ms.prev_low_price \
+                + 0.33*asset.ms.prev_high_price
+            lanes.stop_loss[:] = asset.ms.prev_low_price
+            lanes.long_trigger[:] = True
+        elif continuation and (not trend):
+            lanes.entry[:] = 0.66*asset.ms.prev_high_price \
+                + 0.33*asset.ms.prev_low_price
+            lanes.stop_loss[:] = asset.ms.prev_high_price
+            lanes.short_trigger[:] = True
+
+        lanes.close[:] = bar.close
+        lanes.append_equity(lanes.mark_to_market)
+
+    def next_bar_trade_lanes(self, asset: Asset, lanes: LaneData,
+                             bar: Bar) -> None:
+        """Enters trades after triggered and follows through until trade exit
+        in all lanes.
+
+        The market structure is the same in every lane, so only the
+        reward/risk filter and the position sizing differ between lanes.
+
+        Parameters
+        ----------
+        asset : Asset
+            The asset to be traded.
+        lanes : LaneData
+            The data log of all lanes of the current backtest.
+        bar : Bar
+            Candle of live data.
+        """
+
+        if self.fills is not None:
+            self._next_bar_trade_lanes_intrabar(asset, lanes, bar)
+            return
+
+        price = bar.close
+        prev_high = asset.ms.prev_high_price
+        prev_low = asset.ms.prev_low_price
+
+        # Entry Long
+        if lanes.long_trigger.any():
+            if price <= prev_low:
+                lanes.long_trigger[:] = False
+            elif price >= prev_high and not asset.ms.continuation:
+                lanes.long_trigger[:] = False
             else:
-                if price <= trade_data.entry:
-                    target = asset.ms.prev_high[0]
-                    risk = price - trade_data.stop_loss
-                    reward_risk = (target - price)/risk
-                    if reward_risk >= params.reward_risk:
-                        trade_data.target = target
-                        self._long(price, risk/price, asset, params,
-                                   trade_data)
-                        trade_data.num_trades += 1
-                        trade_data.long_position = True
-                        trade_data.long_trigger = False
+                self._enter_lanes(asset, lanes, price, True)
         # Exit Long
+        if lanes.long_position.any():
+            self._exit_lanes(lanes, lanes.long_position, bar, True)
+
+        # Entry Short
+        if lanes.short_trigger.any():
+            if price >= prev_high:
+                lanes.short_trigger[:] = False
+            elif price <= prev_low and not asset.ms.continuation:
+                lanes.short_trigger[:] = False
+            else:
+                self._enter_lanes(asset, lanes, price, False)
+
+        # Exit Short
+        if lanes.short_position.any():
+            self._exit_lanes(lanes, lanes.short_position, bar, False)
+
+    def _next_bar_trade_intrabar(self, asset: Asset, params: Params,
+                                 trade_data: TradeData, bar: Bar) -> None:
+        """Same as next_bar_trade with orders filled inside the candle.
+
+        Parameters
+        ----------
+        asset : Asset
+            The asset to be traded.
+        params : Params
+            The parameters for the strategy.
+        trade_data : TradeData
+            The data log of the current backtest.
+        bar : Bar
+            Candle of live data.
+        """
+
+        entered = False
+        if trade_data.long_trigger:
+            entered = self._enter_long_intrabar(asset, params, trade_data, bar)
         if trade_data.long_position:
-            price = row['close']
-            if price > trade_data.target:
-                self._close_long_trade(price, trade_data)
-                logging.info('Take Profit on Long Position')
-                trade_data.long_position = False
-                trade_data.wins += 1
-                trade_data.win_rate = trade_data.wins/trade_data.num_trades
-            if price < trade_data.stop_loss:
-                self._close_long_trade(price, trade_data)
-                logging.info('Stop Loss Hit on Long Position')
-                trade_data.long_position = False
+            self._exit_intrabar(trade_data, bar, entered, True)
+
+        entered = False
+        if trade_data.short_trigger:
+            entered = self._enter_short_intrabar(asset, params, trade_data,
+                                                 bar)
+        if trade_data.short_position:
+            self._exit_intrabar(trade_data, bar, entered, False)
+
+    def _next_bar_trade_lanes_intrabar(self, asset: Asset, lanes: LaneData,
+                                       bar: Bar) -> None:
+        """Same as next_bar_trade_lanes with orders filled inside the candle.
+
+        Parameters
+        ----------
+        asset : Asset
+            The asset to be traded.
+        lanes : LaneData
+            The data log of all lanes of the current backtest.
+        bar : Bar
+            Candle of live data.
+        """
+
+        prev_high = asset.ms.prev_high_price
+        prev_low = asset.ms.prev_low_price
+
+        # Entry Long
+        entered = np.zeros(0, dtype=np.int64)
+        if lanes.long_trigger.any():
+            entered = self._enter_lanes_intrabar(asset, lanes, bar, True)
+            if bar.close <= prev_low:
+                lanes.long_trigger[:] = False
+            elif bar.close >= prev_high and not asset.ms.continuation:
+                lanes.long_trigger[:] = False
+        # Exit Long
+        if lanes.long_position.any():
+            self._exit_lanes_intrabar(lanes, lanes.long_position, entered,
+                                      bar, True)
 
         # Entry Short
+        entered = np.zeros(0, dtype=np.int64)
+        if lanes.short_trigger.any():
+            entered = self._enter_lanes_intrabar(asset, lanes, bar, False)
+            if bar.close >= prev_high:
+                lanes.short_trigger[:] = False
+            elif bar.close <= prev_low and not asset.ms.continuation:
+                lanes.short_trigger[:] = False
+        # Exit Short
+        if lanes.short_position.any():
+            self._exit_lanes_intrabar(lanes, lanes.short_position, entered,
+                                      bar, False)
+
+    def _enter_long(self, asset: Asset, params: Params,
+                    trade_data: TradeData, price: float) -> None:
+        """Enters a triggered long trade at the close of the candle.
+
+        Parameters
+        ----------
+        asset : Asset
+            The asset to be traded.
+        params : Params
+            The parameters for the strategy.
+        trade_data : TradeData
+            The data log of the current backtest.
+        price : float
+            The closing price of the candle.
+        """
+
+        if price <= asset.ms.prev_low_price:
+            trade_data.long_trigger = False
+        elif (price >= asset.ms.prev_high_price
+              and not asset.ms.continuation):
+            trade_data.long_trigger = False
+        elif price <= trade_data.entry:
+            target = asset.ms.prev_high_price
+            risk = price - trade_data.stop_loss
+            reward_risk = (target - price)/risk
+            if reward_risk >= params.reward_risk:
+                trade_data.target = target
+                self._long(price, risk/price, asset, params, trade_data)
+                trade_data.num_trades += 1
+                trade_data.long_position = True
+                trade_data.long_trigger = False
+
+    def _enter_short(self, asset: Asset, params: Params,
+                     trade_data: TradeData, price: float) -> None:
+        """Enters a triggered short trade at the close of the candle.
+
+        Parameters
+        ----------
+        asset : Asset
+            The asset to be traded.
+        params : Params
+            The parameters for the strategy.
+        trade_data : TradeData
+            The data log of the current backtest.
+        price : float
+            The closing price of the candle.
+        """
+
+        if price >= asset.ms.prev_high_price:
+            trade_data.short_trigger = False
+        elif (price <= asset.ms.prev_low_price
+              and not asset.ms.continuation):
+            trade_data.short_trigger = False
+        elif price >= trade_data.entry:
+            risk = trade_data.stop_loss - price
+            reward_risk = (price - asset.ms.prev_low_price)/risk
+            if reward_risk >= params.reward_risk:
+                trade_data.target = asset.ms.prev_low_price
+                self._short(price, risk/price, asset, params, trade_data)
+                trade_data.num_trades += 1
+                trade_data.short_position = True
+                trade_data.short_trigger = False
+
+    def _exit(self, trade_data: TradeData, bar: Bar, long: bool) -> None:
+        """Closes a position at the close of a candle beyond its stop loss
+        or target.
+
+        Parameters
+        ----------
+        trade_data : TradeData
+            The data log of the current backtest.
+        bar : Bar
+            Candle of live data.
+        long : bool
+            True for long positions, False for short positions.
+        """
+
+        price = bar.close
+        if price > trade_data.target if long else price < trade_data.target:
+            self._take_profit(price, trade_data, bar, long)
+        if (price < trade_data.stop_loss if long
+                else price > trade_data.stop_loss):
+            self._stop_loss(price, trade_data, bar, long)
+
+    def _enter_long_intrabar(self, asset: Asset, params: Params,
+                             trade_data: TradeData, bar: Bar) -> bool:
+        """Enters a triggered long trade when the candle reaches the entry.
+
+        Parameters
+        ----------
+        asset : Asset
+            The asset to be traded.
+        params : Params
+            The parameters for the strategy.
+        trade_data : TradeData
+            The data log of the current backtest.
+        bar : Bar
+            Candle of live data.
+
+        Returns
+        -------
+        bool
+            True if the trade was entered on this candle.
+        """
+
+        prev_high = asset.ms.prev_high_price
+        entered = False
+        if bar.low <= trade_data.entry:
+            price = limit_price(bar.open, trade_data.entry, True)
+            risk = price - trade_data.stop_loss
+            if risk > 0 and (prev_high - price)/risk >= params.reward_risk:
+                trade_data.target = prev_high
+                self._long(price, risk/price, asset, params, trade_data)
+                trade_data.num_trades += 1
+                trade_data.long_position = True
+                trade_data.long_trigger = False
+                entered = True
+        if trade_data.long_trigger:
+            if bar.close <= asset.ms.prev_low_price:
+                trade_data.long_trigger = False
+            elif bar.close >= prev_high and not asset.ms.continuation:
+                trade_data.long_trigger = False
+
+        return entered
+
+    def _enter_short_intrabar(self, asset: Asset, params: Params,
+                              trade_data: TradeData, bar: Bar) -> bool:
+        """Enters a triggered short trade when the candle reaches the entry.
+
+        Parameters
+        ----------
+        asset : Asset
+            The asset to be traded.
+        params : Params
+            The parameters for the strategy.
+        trade_data : TradeData
+            The data log of the current backtest.
+        bar : Bar
+            Candle of live data.
+
+        Returns
+        -------
+        bool
+            True if the trade was entered on this candle.
+        """
+
+        prev_low = asset.ms.prev_low_price
+        entered = False
+        if bar.high >= trade_data.entry:
+            price = limit_price(bar.open, trade_data.entry, False)
+            risk = trade_data.stop_loss - price
+            if risk > 0 and (price - prev_low)/risk >= params.reward_risk:
+                trade_data.target = prev_low
+                self._short(price, risk/price, asset, params, trade_data)
+                trade_data.num_trades += 1
+                trade_data.short_position = True
+                trade_data.short_trigger = False
+                entered = True
         if trade_data.short_trigger:
-            price = row['close']
-            if price >= asset.ms.prev_high[0]:
+            if bar.close >= asset.ms.prev_high_price:
                 trade_data.short_trigger = False
-            elif price <= asset.ms.prev_low[0] and not asset.ms.continuation:
+            elif bar.close <= prev_low and not asset.ms.continuation:
                 trade_data.short_trigger = False
-            else:
-                if price >= trade_data.entry:
-                    risk = trade_data.stop_loss - price
-                    reward_risk = (price - asset.ms.prev_low[0])/risk
-                    if reward_risk >= params.reward_risk:
-                        trade_data.target = asset.ms.prev_low[0]
-                        self._short(price, risk/price, asset, params,
-                                    trade_data)
-                        trade_data.num_trades += 1
-                        trade_data.short_position = True
-                        trade_data.short_trigger = False
 
-        # Exit Short
-        if trade_data.short_position:
-            price = row['close']
-            if price < trade_data.target:
-                self._close_short_trade(price, trade_data)
-                logging.info('Take Profit on Short Position')
-                trade_data.short_position = False
-                trade_data.wins += 1
-                trade_data.win_rate = trade_data.wins/trade_data.num_trades
-            if price > trade_data.stop_loss:
-                self._close_short_trade(price, trade_data)
-                logging.info('Stop Loss Hit on Short Position')
-                trade_data.short_position = False
+        return entered
+
+    def _exit_intrabar(self, trade_data: TradeData, bar: Bar, entered: bool,
+                       long: bool) -> None:
+        """Closes a position reaching its stop loss or target inside a
+        candle.
+
+        Parameters
+        ----------
+        trade_data : TradeData
+            The data log of the current backtest.
+        bar : Bar
+            Candle of live data.
+        entered : bool
+            True if the position was entered on this candle, so only its
+            stop loss can still be reached.
+        long : bool
+            True for long positions, False for short positions.
+        """
+
+        if entered:
+            stop_hit = bar.low <= trade_data.stop_loss if long \
+                else bar.high >= trade_data.stop_loss
+            target_hit = False
+        else:
+            stop_hit, target_hit = self.fills.exits(
+                bar, trade_data.stop_loss, trade_data.target, long)
+        if target_hit:
+            self._take_profit(limit_price(bar.open, trade_data.target,
+                                          not long), trade_data, bar, long)
+        elif stop_hit:
+            self._stop_loss(stop_price(bar.open, trade_data.stop_loss, long),
+                            trade_data, bar, long)
+
+    def _take_profit(self, price: float, trade_data: TradeData, bar: Bar,
+                     long: bool) -> None:
+        """Closes a position at its target and counts the win."""
+
+        if long:
+            self._close_long_trade(price, trade_data)
+            code = tracing.TAKE_PROFIT_LONG
+        else:
+            self._close_short_trade(price, trade_data)
+            code = tracing.TAKE_PROFIT_SHORT
+        tracer = tracing.tracer
+        if tracer is not None:
+            tracer.record(bar.open_time, code)
+        if long:
+            trade_data.long_position = False
+        else:
+            trade_data.short_position = False
+        trade_data.wins += 1
+        trade_data.win_rate = trade_data.wins/trade_data.num_trades
+
+    def _stop_loss(self, price: float, trade_data: TradeData, bar: Bar,
+                   long: bool) -> None:
+        """Closes a position at its stop loss."""
+
+        if long:
+            self._close_long_trade(price, trade_data)
+            code = tracing.STOP_LOSS_LONG
+        else:
+            self._close_short_trade(price, trade_data)
+            code = tracing.STOP_LOSS_SHORT
+        tracer = tracing.tracer
+        if tracer is not None:
+            tracer.record(bar.open_time, code)
+        if long:
+            trade_data.long_position = False
+        else:
+            trade_data.short_position = False
+
+    def _enter_lanes(self, asset: Asset, lanes: LaneData, price: float,
+                     long: bool) -> None:
+        """Enters the triggered trades of the lanes whose entry the candle
+        closes beyond.
+
+        Parameters
+        ----------
+        asset : Asset
+            The asset to be traded.
+        lanes : LaneData
+            The data log of all lanes of the current backtest.
+        price : float
+            The closing price of the candle.
+        long : bool
+            True for long trades, False for short trades.
+        """
+
+        if long:
+            lanes_in = np.flatnonzero(lanes.long_trigger
+                                      & (price <= lanes.entry))
+        else:
+            lanes_in = np.flatnonzero(lanes.short_trigger
+                                      & (price >= lanes.entry))
+        if not lanes_in.size:
+            return
+
+        if long:
+            target = asset.ms.prev_high_price
+            risk = price - lanes.stop_loss[lanes_in]
+        else:
+            target = asset.ms.prev_low_price
+            risk = lanes.stop_loss[lanes_in] - price
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reward_risk = (target - price)/risk if long \
+                else (price - target)/risk
+        accept = reward_risk >= lanes.reward_risk[lanes_in]
+        lanes_in, risk = lanes_in[accept], risk[accept]
+
+        lanes.target[lanes_in] = target
+        if long:
+            self._long_lanes(lanes_in, price, risk/price, asset, lanes)
+            lanes.long_position[lanes_in] = True
+            lanes.long_trigger[lanes_in] = False
+        else:
+            self._short_lanes(lanes_in, price, risk/price, asset, lanes)
+            lanes.short_position[lanes_in] = True
+            lanes.short_trigger[lanes_in] = False
+        lanes.num_trades[lanes_in] += 1
+
+    def _exit_lanes(self, lanes: LaneData, position: np.ndarray, bar: Bar,
+                    long: bool) -> None:
+        """Closes the positions of the lanes closing beyond their stop loss
+        or target.
+
+        Parameters
+        ----------
+        lanes : LaneData
+            The data log of all lanes of the current backtest.
+        position : np.ndarray
+            The long_position or short_position flags of the lanes.
+        bar : Bar
+            Candle of live data.
+        long : bool
+            True for long positions, False for short positions.
+        """
+
+        price = bar.close
+        if long:
+            take_profit = np.flatnonzero(position & (price > lanes.target))
+            stop_loss = np.flatnonzero(position & (price < lanes.stop_loss))
+        else:
+            take_profit = np.flatnonzero(position & (price < lanes.target))
+            stop_loss = np.flatnonzero(position & (price > lanes.stop_loss))
+        self._close_trade_lanes(take_profit, price, lanes)
+        position[take_profit] = False
+        lanes.wins[take_profit] += 1
+        lanes.win_rate[take_profit] = \
+            lanes.wins[take_profit]/lanes.num_trades[take_profit]
+        self._close_trade_lanes(stop_loss, price, lanes)
+        position[stop_loss] = False
+        _trace_lanes(bar, take_profit, stop_loss, long)
+
+    def _enter_lanes_intrabar(self, asset: Asset, lanes: LaneData, bar: Bar,
+                              long: bool) -> np.ndarray:
+        """Enters the triggered trades of the lanes whose entry the candle
+        reaches.
+
+        Parameters
+        ----------
+        asset : Asset
+            The asset to be traded.
+        lanes : LaneData
+            The data log of all lanes of the current backtest.
+        bar : Bar
+            Candle of live data.
+        long : bool
+            True for long trades, False for short trades.
+
+        Returns
+        -------
+        np.ndarray
+            The indices of the lanes that entered on this candle.
+        """
+
+        if long:
+            lanes_in = np.flatnonzero(lanes.long_trigger
+                                      & (bar.low <= lanes.entry))
+        else:
+            lanes_in = np.flatnonzero(lanes.short_trigger
+                                      & (bar.high >= lanes.entry))
+        if not lanes_in.size:
+            return np.zeros(0, dtype=np.int64)
+
+        price = limit_price(bar.open, lanes.entry[lanes_in], long)
+        if long:
+            target = asset.ms.prev_high_price
+            risk = price - lanes.stop_loss[lanes_in]
+        else:
+            target = asset.ms.prev_low_price
+            risk = lanes.stop_loss[lanes_in] - price
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reward_risk = (target - price)/risk if long \
+                else (price - target)/risk
+        accept = (risk > 0) & (reward_risk >= lanes.reward_risk[lanes_in])
+        entered, price, risk = lanes_in[accept], price[accept], risk[accept]
+
+        lanes.target[entered] = target
+        if long:
+            self._long_lanes(entered, price, risk/price, asset, lanes)
+            lanes.long_position[entered] = True
+            lanes.long_trigger[entered] = False
+        else:
+            self._short_lanes(entered, price, risk/price, asset, lanes)
+            lanes.short_position[entered] = True
+            lanes.short_trigger[entered] = False
+        lanes.num_trades[entered] += 1
+
+        return entered
+
+    def _exit_lanes_intrabar(self, lanes: LaneData, position: np.ndarray,
+                             entered: np.ndarray, bar: Bar,
+                             long: bool) -> None:
+        """Closes the positions of the lanes reaching stop loss or target.
+
+        Parameters
+        ----------
+        lanes : LaneData
+            The data log of all lanes of the current backtest.
+        position : np.ndarray
+            The long_position or short_position flags of the lanes.
+        entered : np.ndarray
+            The indices of the lanes that entered on this candle.
+        bar : Bar
+            Candle of live data.
+        long : bool
+            True for long positions, False for short positions.
+        """
+
+        lanes_open = np.flatnonzero(position)
+        stop, target = lanes.stop_loss[lanes_open], lanes.target[lanes_open]
+        stop_hit, target_hit = self.fills.exits(bar, stop, target, long)
+
+        just_entered = np.isin(lanes_open, entered)
+        if just_entered.any():
+            stop_hit = np.where(just_entered,
+                                bar.low <= stop if long else bar.high >= stop,
+                                stop_hit)
+            target_hit = target_hit & ~just_entered
+
+        take_profit = lanes_open[target_hit]
+        self._close_trade_lanes(
+            take_profit, limit_price(bar.open, target[target_hit], not long),
+            lanes)
+        position[take_profit] = False
+        lanes.wins[take_profit] += 1
+        lanes.win_rate[take_profit] = \
+            lanes.wins[take_profit]/lanes.num_trades[take_profit]
+
+        stop_loss = lanes_open[stop_hit & ~target_hit]
+        self._close_trade_lanes(
+            stop_loss, stop_price(bar.open, stop[stop_hit & ~target_hit],
+                                  long), lanes)
+        position[stop_loss] = False
+        _trace_lanes(bar, take_profit, stop_loss, long)
+
+
+def _trace_lanes(bar: Bar, take_profit: np.ndarray, stop_loss: np.ndarray,
+                 long: bool) -> None:
+    """Records one exit event per lane closed on a candle while tracing."""
+
+    tracer = tracing.tracer
+    if tracer is None:
+        return
+
+    take_profit_code, stop_loss_code = \
+        (tracing.TAKE_PROFIT_LONG, tracing.STOP_LOSS_LONG) if long \
+        else (tracing.TAKE_PROFIT_SHORT, tracing.STOP_LOSS_SHORT)
+    for _ in range(take_profit.size):
+        tracer.record(bar.open_time, take_profit_code)
+    for _ in range(stop_loss.size):
+        tracer.record(bar.open_time, stop_loss_code)
@@ -0,0 +1,362 @@
+"""Collect functions to bootstrap equity paths from the returns of a strategy.
+
+Paths are drawn from the returns with the stationary bootstrap of Politis
+and Romano, which keeps the dependence between consecutive returns by
+copying blocks of random length, or with blocks of a fixed length. A block
+size of 1 draws every return independently.
+
+The paths are generated in chunks from one seed, so any number of paths
+fits in bounded memory and the result does not depend on the chunk order or
+the number of worker processes. Percentiles are estimated while streaming
+from a histogram of every step, whose range is set by the first chunk.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+import src.utils.metrics as metrics
+
+
+# Metrics of BATCH_METRICS computed from equity curves instead of returns
+_EQUITY_METRICS = (metrics.calculate_max_drawdown, metrics.calculate_musch)
+
+
+@dataclass
+class Bands:
+    """Hold the percentiles of bootstrapped equity paths.
+
+    ...
+
+    Attributes
+    ----------
+    q : np.array
+        The percentiles, between 0 and 100.
+    values : np.array
+        One row per percentile with the equity at every step, starting with
+        the initial equity.
+    p_values : np.array
+        The fraction of paths at or below the observed equity at every
+        step, None if nothing was observed.
+    n_paths : int
+        The number of bootstrapped paths.
+    """
+
+    q: np.array
+    values: np.array
+    p_values: np.array
+    n_paths: int
+
+    def __getitem__(self, q: float) -> np.array:
+        """Returns the equity of a percentile at every step."""
+
+        return self.values[list(self.q).index(q)]
+
+
+def block_indices(rng: np.random.Generator, n: int, length: int,
+                  n_paths: int, block_size: float = 1.,
+                  stationary: bool = True) -> np.array:
+    """Draws the indices of the resampled returns.
+
+    Parameters
+    ----------
+    rng : np.random.Generator
+        The random number generator.
+    n : int
+        The number of returns resampled.
+    length : int
+        The number of returns of every path.
+    n_paths : int
+        The number of paths.
+    block_size : float
+        The mean block length of the stationary bootstrap, or the block
+        length of the fixed block bootstrap.
+    stationary : bool
+        If True blocks have random lengths, otherwise fixed ones.
+
+    Returns
+    -------
+    np.array
+        One row per step and one column per path. Blocks wrap around at the
+        end of the returns.
+    """
+
+    if block_size <= 1:
+        return rng.integers(n, size=(length, n_paths))
+
+    steps = np.arange(length)[:, None]
+    if stationary:
+        new = rng.random((length, n_paths), dtype=np.float32) \
+            < 1. / block_size
+        new[0] = True
+    else:
+        new = np.broadcast_to(steps % int(block_size) == 0,
+                              (length, n_paths))
+
+    # Every block continues from a random return, so the index is that
+    # return minus the step of the block start, plus the current step.
+    base = np.zeros((length, n_paths), dtype=np.int64)
+    rows, _ = np.nonzero(new)
+    base[new] = rng.integers(n, size=rows.size) - rows
+    block_start = np.maximum.accumulate(np.where(new, steps, 0), axis=0)
+    idx = np.take_along_axis(base, block_start, axis=0)
+    idx += steps
+    if length > n:
+        idx %= n
+    else:
+        idx[idx >= n] -= n
+
+    return idx
+
+
+def sample_paths(returns: np.array, horizon: int, n_paths: int,
+                 start: float = 1., block_size: float = 1.,
+                 stationary: bool = True, seed=None) -> np.array:
+    """Bootstraps equity paths from returns.
+
+    Parameters
+    ----------
+    returns : np.array
+        The returns resampled.
+    horizon : int
+        The number of returns of every path.
+    n_paths : int
+        The number of paths.
+    start : float
+        The initial equity of every path.
+    block_size : float
+        The (mean) block length, see block_indices.
+    stationary : bool
+        If True blocks have random lengths, otherwise fixed ones.
+    seed : int or np.random.SeedSequence
+        The seed of the random number generator.
+
+    Returns
+    -------
+    np.array
+        One row per step, starting with the initial equity, and one column
+        per path.
+    """
+
+    returns = np.asarray(returns, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    idx = block_indices(rng, returns.size, horizon, n_paths, block_size,
+                        stationary)
+
+    paths = np.empty((horizon+1, n_paths))
+    paths[0] = start
+    np.cumprod(1. + returns[idx], axis=0, out=paths[1:])
+    paths[1:] *= start
+
+    return paths
+
+
+def bootstrap_bands(returns: np.array, horizon: int, start: float = 1.,
+                    q: tuple = (5, 50, 95), n_paths: int = 10_000,
+                    block_size: float = 1., stationary: bool = True,
+                    observed: np.array = None, seed: int = None,
+                    chunk_size: int = 1_000, bins: int = 1_024,
+                    workers: int = 1) -> Bands:
+    """Estimates percentiles of bootstrapped equity paths at every step.
+
+    If all paths fit in one chunk, the percentiles are computed exactly
+    from the paths. Otherwise the first chunk of paths sets the histogram
+    range of every step to twice the range of its paths. Later paths outside
+    the range are counted in the outermost bins, so only percentiles beyond
+    the first chunk's extremes lose precision. Within the range, a
+    percentile is off by about one bin width at most. The histograms take
+    8*bins bytes per step on top of the chunks of paths.
+
+    Parameters
+    ----------
+    returns : np.array
+        The returns resampled, e.g. of the training phase.
+    horizon : int
+        The number of returns of every path.
+    start : float
+        The initial equity of every path.
+    q : tuple
+        The percentiles to be estimated, between 0 and 100.
+    n_paths : int
+        The number of paths.
+    block_size : float
+        The (mean) block length, see block_indices.
+    stationary : bool
+        If True blocks have random lengths, otherwise fixed ones.
+    observed : np.array
+        An equity curve of horizon+1 points, e.g. of the testing phase, whose
+        p-values are computed.
+    seed : int
+        The seed of the random number generator.
+    chunk_size : int
+        The number of paths generated at once.
+    bins : int
+        The number of histogram bins of every step.
+    workers : int
+        The number of worker processes generating chunks.
+
+    Returns
+    -------
+    Bands
+        The percentiles and p-values.
+    """
+
+    sizes = [min(chunk_size, n_paths - first)
+             for first in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    pilot = sample_paths(returns, horizon, sizes[0], start, block_size,
+                         stationary, seeds[0])
+    q = np.asarray(q, dtype=np.float64)
+    if len(sizes) == 1:
+        below = None if observed is None \
+            else (pilot <= np.asarray(observed)[:, None]).sum(axis=1)
+        return Bands(q, np.percentile(pilot, q, axis=1),
+                     None if observed is None else below / n_paths, n_paths)
+
+    low, high = pilot.min(axis=1), pilot.max(axis=1)
+    span = high - low
+    edges = (low - span/2, span*2/bins)
+
+    args = (returns, horizon, start, block_size, stationary, edges, bins,
+            observed)
+    counts, below = _histogram(pilot, edges, bins, observed)
+    if workers > 1 and len(sizes) > 2:
+        # Every worker sums the histograms of a share of the chunks, so only
+        # one histogram per worker is sent back.
+        shares = np.array_split(np.arange(1, len(sizes)),
+                                min(workers, len(sizes)-1))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                _chunk_histogram, [args]*len(shares),
+                [[sizes[i] for i in share] for share in shares],
+                [[seeds[i] for i in share] for share in shares]))
+    else:
+        results = [_chunk_histogram(args, sizes[1:], seeds[1:])]
+    for chunk_counts, chunk_below in results:
+        counts += chunk_counts
+        below += chunk_below
+
+    return Bands(q, _percentiles(counts, edges, q, n_paths),
+                 None if observed is None else below / n_paths, n_paths)
+
+
+def metric_p_value(returns: np.array, reward_metric: callable,
+                   threshold: float = 0., n_paths: int = 10_000,
+                   block_size: float = 1., stationary: bool = True,
+                   seed: int = None, chunk_size: int = 1_000) -> float:
+    """Estimates how often resampled returns score at or below a threshold.
+
+    A small p-value means the reward of the returns is unlikely to be at or
+    below the threshold by the luck of their order and selection, so it can
+    be used to reject candidates whose reward is not significant.
+
+    Parameters
+    ----------
+    returns : np.array
+        The returns of a strategy.
+    reward_metric : callable
+        One of the metrics of metrics.BATCH_METRICS.
+    threshold : float
+        The reward compared against.
+    n_paths : int
+        The number of resampled return series.
+    block_size : float
+        The (mean) block length, see block_indices.
+    stationary : bool
+        If True blocks have random lengths, otherwise fixed ones.
+    seed : int
+        The seed of the random number generator.
+    chunk_size : int
+        The number of series resampled at once.
+
+    Returns
+    -------
+    float
+        The fraction of resampled series with a reward at or below the
+        threshold.
+    """
+
+    metric_2d = metrics.BATCH_METRICS[reward_metric]
+    returns = np.asarray(returns, dtype=np.float64)
+    sizes = [min(chunk_size, n_paths - first)
+             for first in range(0, n_paths, chunk_size)]
+
+    count = 0
+    for size, chunk_seed in zip(sizes,
+                                np.random.SeedSequence(seed).spawn(
+                                    len(sizes))):
+        if reward_metric in _EQUITY_METRICS:
+            sample = sample_paths(returns, returns.size, size, 1.,
+                                  block_size, stationary, chunk_seed).T
+        else:
+            idx = block_indices(np.random.default_rng(chunk_seed),
+                                returns.size, returns.size, size,
+                                block_size, stationary)
+            sample = returns[idx].T
+        count += int((metric_2d(sample) <= threshold).sum())
+
+    return count / n_paths
+
+
+def _chunk_histogram(args: tuple, sizes: list, seeds: list) -> tuple:
+    """Generates chunks of paths and returns their summed histogram counts."""
+
+    returns, horizon, start, block_size, stationary, edges, bins, \
+        observed = args
+    counts = np.zeros((horizon+1, bins), dtype=np.int64)
+    below = np.zeros(horizon+1, dtype=np.int64)
+    for size, seed in zip(sizes, seeds):
+        paths = sample_paths(returns, horizon, size, start, block_size,
+                             stationary, seed)
+        chunk_counts, chunk_below = _histogram(paths, edges, bins, observed)
+        counts += chunk_counts
+        below += chunk_below
+
+    return counts, below
+
+
+def _histogram(paths: np.array, edges: tuple, bins: int,
+               observed: np.array) -> tuple:
+    """Counts the paths per step and bin, and at or below the observed."""
+
+    low, width = edges
+    steps = paths.shape[0]
+    # Steps without spread, like the first one, fall into their first bin.
+    scale = np.divide(1., width, out=np.zeros_like(width), where=width > 0)
+    scaled = (paths - low[:, None]) * scale[:, None]
+    np.clip(scaled, 0, bins-1, out=scaled)
+    index = scaled.astype(np.int64)
+    index += np.arange(steps)[:, None] * bins
+    counts = np.bincount(index.ravel(), minlength=steps*bins)
+
+    below = np.zeros(steps, dtype=np.int64)
+    if observed is not None:
+        below = (paths <= np.asarray(observed)[:, None]).sum(axis=1)
+
+    return counts.reshape(steps, bins), below
+
+
+def _percentiles(counts: np.array, edges: tuple, q: np.array,
+                 n_paths: int) -> np.array:
+    """Interpolates percentiles inside the histogram bins of every step.
+
+    The counts are cumulated in place, so no copy of the histograms is
+    made.
+    """
+
+    low, width = edges
+    cumulative = np.cumsum(counts, axis=1, out=counts)
+    # The rank of every percentile, as the linear method of np.percentile
+    rank = q / 100 * (n_paths - 1)
+
+    # The bin of every step and percentile, and the paths up to and before
+    # it. Every rank is below the number of paths, so the bin exists.
+    bin_ = np.stack([(cumulative <= r).sum(axis=1) for r in rank], axis=1)
+    upto = np.take_along_axis(cumulative, bin_, axis=1)
+    before = np.where(bin_ > 0, np.take_along_axis(
+        cumulative, np.maximum(bin_ - 1, 0), axis=1), 0)
+    inside = np.minimum((rank - before + 0.5) / (upto - before), 1.)
+
+    return (low[:, None] + (bin_ + inside) * width[:, None]).T
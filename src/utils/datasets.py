@@ -0,0 +1,367 @@
+"""Collect functions to load the historical price datasets.
+
+The CSV files are parsed once and cached as one .npy file per needed
+column. Later loads memory-map the cached columns instead of parsing text.
+A cache entry is rebuilt whenever the modification time or the size of its
+CSV file changes.
+
+Coarser timeframes can be built from the finest dataset of a ticker
+instead of being parsed from their own CSV files. The resampled columns
+are cached together with the offsets of the child candles of every coarse
+candle, so a strategy can drill down from a coarse candle into the finer
+ones without searching.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from src.Bars import BarArrays
+from src.utils.fills import Drilldown
+
+
+DATASETS_DIR = './database/datasets/binance_futures'
+CACHE_DIR = './database/cache/binance_futures'
+
+# Columns kept from the CSV files and their dtypes in the cache
+COLUMNS = {'open time': np.int64, 'open': np.float64, 'high': np.float64,
+           'low': np.float64, 'close': np.float64, 'volume': np.float64}
+
+# Length of the candles of every timeframe in milliseconds, finest first
+TIMEFRAME_MS = {'5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+                '1h': 3_600_000, '4h': 14_400_000, '1d': 86_400_000}
+
+
+def csv_path(ticker: str, timeframe: str,
+             datasets_dir: str = DATASETS_DIR) -> str:
+    """Return the path of the CSV file of a dataset.
+
+    Parameters
+    ----------
+    ticker : str
+        The ticker of the asset.
+    timeframe : str
+        The timeframe of the historical data.
+    datasets_dir : str
+        The directory holding one subdirectory of CSV files per ticker.
+
+    Returns
+    -------
+    str
+        The path of the CSV file.
+    """
+
+    return os.path.join(datasets_dir, ticker, timeframe + '.csv')
+
+
+def load_bars(ticker: str, timeframe: str, datasets_dir: str = DATASETS_DIR,
+              cache_dir: str = CACHE_DIR) -> BarArrays:
+    """Load a dataset as memory-mapped columns, building the cache if needed.
+
+    Parameters
+    ----------
+    ticker : str
+        The ticker of the asset.
+    timeframe : str
+        The timeframe of the historical data.
+    datasets_dir : str
+        The directory holding one subdirectory of CSV files per ticker.
+    cache_dir : str
+        The directory holding the cached columns.
+
+    Returns
+    -------
+    BarArrays
+        The read-only OHLCV columns of the dataset. If there is no CSV file
+        of the timeframe, they are resampled from the finest dataset of the
+        ticker.
+    """
+
+    source = csv_path(ticker, timeframe, datasets_dir)
+    if not os.path.exists(source) and timeframe in TIMEFRAME_MS:
+        base = base_timeframe(ticker, datasets_dir)
+        if base is not None and TIMEFRAME_MS[base] < TIMEFRAME_MS[timeframe]:
+            return load_resampled(ticker, timeframe, base, datasets_dir,
+                                  cache_dir)
+
+    target = os.path.join(cache_dir, ticker, timeframe)
+
+    if not _is_fresh(source, target):
+        _build_cache(source, target)
+
+    columns = [np.load(os.path.join(target, _file_name(column)),
+                       mmap_mode='r')
+               for column in COLUMNS]
+
+    return BarArrays(*columns)
+
+
+def load_frame(ticker: str, timeframe: str, datasets_dir: str = DATASETS_DIR,
+               cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """Load a dataset as a data frame of the columns used by the backtests.
+
+    Parameters
+    ----------
+    ticker : str
+        The ticker of the asset.
+    timeframe : str
+        The timeframe of the historical data.
+    datasets_dir : str
+        The directory holding one subdirectory of CSV files per ticker.
+    cache_dir : str
+        The directory holding the cached columns.
+
+    Returns
+    -------
+    pd.DataFrame
+        The open time, open, high, low, close and volume columns.
+    """
+
+    bars = load_bars(ticker, timeframe, datasets_dir, cache_dir)
+
+    return pd.DataFrame({'open time': bars.open_time, 'open': bars.open,
+                         'high': bars.high, 'low': bars.low,
+                         'close': bars.close, 'volume': bars.volume})
+
+
+def base_timeframe(ticker: str,
+                   datasets_dir: str = DATASETS_DIR) -> str:
+    """Return the finest timeframe of a ticker that has a CSV file.
+
+    Parameters
+    ----------
+    ticker : str
+        The ticker of the asset.
+    datasets_dir : str
+        The directory holding one subdirectory of CSV files per ticker.
+
+    Returns
+    -------
+    str
+        The finest timeframe, None if the ticker has no dataset.
+    """
+
+    for timeframe in TIMEFRAME_MS:
+        if os.path.exists(csv_path(ticker, timeframe, datasets_dir)):
+            return timeframe
+
+    return None
+
+
+def resample(bars: BarArrays, timeframe: str) -> tuple:
+    """Build the candles of a coarser timeframe from finer candles.
+
+    Every fine candle belongs to the coarse candle its opening time falls
+    into, counted from the epoch like the exchange does. Rows repeating the
+    opening time of the previous row are kept in the offsets but their
+    volume is counted once.
+
+    Parameters
+    ----------
+    bars : BarArrays
+        The fine candles in chronological order.
+    timeframe : str
+        The coarser timeframe, one of TIMEFRAME_MS.
+
+    Returns
+    -------
+    BarArrays
+        The coarse candles.
+    np.ndarray
+        The rows of the fine candles of coarse candle i are
+        offsets[i]:offsets[i+1].
+    """
+
+    open_time = np.asarray(bars.open_time, dtype=np.int64)
+    if not open_time.size:
+        return bars[0:0], np.zeros(1, dtype=np.int64)
+
+    bucket = open_time - open_time % TIMEFRAME_MS[timeframe]
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], open_time.size] - 1
+    repeated = np.r_[False, open_time[1:] == open_time[:-1]]
+    volume = np.where(repeated, 0., bars.volume)
+
+    coarse = BarArrays(bucket[starts],
+                       np.asarray(bars.open, dtype=np.float64)[starts],
+                       np.maximum.reduceat(bars.high, starts),
+                       np.minimum.reduceat(bars.low, starts),
+                       np.asarray(bars.close, dtype=np.float64)[ends],
+                       np.add.reduceat(volume, starts))
+
+    return coarse, np.r_[starts, open_time.size]
+
+
+def load_resampled(ticker: str, timeframe: str, base: str = None,
+                   datasets_dir: str = DATASETS_DIR,
+                   cache_dir: str = CACHE_DIR) -> BarArrays:
+    """Load the candles of a timeframe resampled from a finer dataset.
+
+    Parameters
+    ----------
+    ticker : str
+        The ticker of the asset.
+    timeframe : str
+        The timeframe to be built.
+    base : str
+        The timeframe of the dataset resampled. The finest dataset of the
+        ticker if not given.
+    datasets_dir : str
+        The directory holding one subdirectory of CSV files per ticker.
+    cache_dir : str
+        The directory holding the cached columns.
+
+    Returns
+    -------
+    BarArrays
+        The read-only OHLCV columns of the resampled candles.
+    """
+
+    target = _resample_cache(ticker, timeframe, base, datasets_dir,
+                             cache_dir)
+    columns = [np.load(os.path.join(target, _file_name(column)),
+                       mmap_mode='r')
+               for column in COLUMNS]
+
+    return BarArrays(*columns)
+
+
+def load_drilldown(ticker: str, timeframe: str, base: str = None,
+                   datasets_dir: str = DATASETS_DIR,
+                   cache_dir: str = CACHE_DIR) -> Drilldown:
+    """Load the index from resampled candles to the candles they consist of.
+
+    Parameters
+    ----------
+    ticker : str
+        The ticker of the asset.
+    timeframe : str
+        The timeframe of the coarse candles.
+    base : str
+        The timeframe of the fine candles. The finest dataset of the ticker
+        if not given.
+    datasets_dir : str
+        The directory holding one subdirectory of CSV files per ticker.
+    cache_dir : str
+        The directory holding the cached columns.
+
+    Returns
+    -------
+    Drilldown
+        The coarse opening times, the offsets and the fine candles.
+    """
+
+    base = base or base_timeframe(ticker, datasets_dir)
+    target = _resample_cache(ticker, timeframe, base, datasets_dir,
+                             cache_dir)
+
+    return Drilldown(
+        np.load(os.path.join(target, _file_name('open time')),
+                mmap_mode='r'),
+        np.load(os.path.join(target, 'offsets.npy'), mmap_mode='r'),
+        load_bars(ticker, base, datasets_dir, cache_dir))
+
+
+def clear_cache(cache_dir: str = CACHE_DIR) -> None:
+    """Remove all cached columns.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory holding the cached columns.
+    """
+
+    if os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir)
+
+
+def _file_name(column: str) -> str:
+    """Return the cache file name of a column."""
+
+    return column.replace(' ', '_') + '.npy'
+
+
+def _source_stamp(source: str) -> dict:
+    """Return the modification time and size of a CSV file."""
+
+    stat = os.stat(source)
+
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def _resample_cache(ticker: str, timeframe: str, base: str,
+                    datasets_dir: str, cache_dir: str) -> str:
+    """Return the directory of resampled columns, building them if needed."""
+
+    base = base or base_timeframe(ticker, datasets_dir)
+    if base is None:
+        raise FileNotFoundError(f'There is no dataset of {ticker}.')
+    if TIMEFRAME_MS[base] >= TIMEFRAME_MS[timeframe]:
+        raise ValueError(f'Cannot resample {base} candles to {timeframe}.')
+
+    source = csv_path(ticker, base, datasets_dir)
+    target = os.path.join(cache_dir, ticker, timeframe + '-from-' + base)
+    if _is_fresh(source, target):
+        return target
+
+    stamp = _source_stamp(source)
+    coarse, offsets = resample(
+        load_bars(ticker, base, datasets_dir, cache_dir), timeframe)
+    os.makedirs(target, exist_ok=True)
+
+    arrays = {_file_name(column): array for column, array in zip(
+        COLUMNS, (coarse.open_time, coarse.open, coarse.high, coarse.low,
+                  coarse.close, coarse.volume))}
+    arrays['offsets.npy'] = offsets
+    for name, array in arrays.items():
+        _save(os.path.join(target, name), np.asarray(array))
+    _save_stamp(target, stamp)
+
+    return target
+
+
+def _save(path: str, array: np.ndarray) -> None:
+    """Write an array next to its path and rename it, so concurrent loads
+    never map a partially written file."""
+
+    tmp = path + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def _save_stamp(target: str, stamp: dict) -> None:
+    """Write the stamp of the source, marking the cache entry as complete."""
+
+    tmp = os.path.join(target, 'meta.json.' + str(os.getpid()) + '.tmp')
+    with open(tmp, 'w') as meta:
+        json.dump(stamp, meta)
+    os.replace(tmp, os.path.join(target, 'meta.json'))
+
+
+def _is_fresh(source: str, target: str) -> bool:
+    """Check if the cached columns were built from the current CSV file."""
+
+    try:
+        with open(os.path.join(target, 'meta.json')) as meta:
+            return json.load(meta) == _source_stamp(source)
+    except (OSError, ValueError):
+        return False
+
+
+def _build_cache(source: str, target: str) -> None:
+    """Parse a CSV file and write its needed columns to the cache."""
+
+    stamp = _source_stamp(source)
+    df = pd.read_csv(source, usecols=list(COLUMNS), dtype=COLUMNS)
+    os.makedirs(target, exist_ok=True)
+
+    for column, dtype in COLUMNS.items():
+        _save(os.path.join(target, _file_name(column)),
+              df[column].to_numpy(dtype=dtype))
+
+    # The stamp is written last, so an interrupted build is never fresh.
+    _save_stamp(target, stamp)
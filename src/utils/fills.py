@@ -0,0 +1,276 @@
+"""Collect functions to fill orders inside a candle instead of at its close.
+
+A candle only tells where the price opened, closed and how far it moved in
+between, not in which order. The path assumption decides which of the
+high and the low was reached first:
+
+    'ohlc'         open, high, low, close
+    'olhc'         open, low, high, close
+    'pessimistic'  the stop loss is always reached before the target
+
+The hit tests only use comparisons and bitwise operators, so they work on
+plain floats for a single trade log as well as on NumPy arrays with one
+lane per parameter set. Candles where both the stop loss and the target
+were reached can be resolved from a finer timeframe with a Drilldown.
+"""
+
+from dataclasses import dataclass, field
+import hashlib
+
+import numpy as np
+
+from src.Bars import Bar, BarArrays
+
+
+PATHS = ('ohlc', 'olhc', 'pessimistic')
+
+
+@dataclass
+class Drilldown:
+    """Hold the candles of a finer timeframe and where each coarse candle
+    starts and ends within them.
+
+    ...
+
+    Attributes
+    ----------
+    open_time : np.ndarray
+        The opening times of the coarse candles.
+    offsets : np.ndarray
+        The rows of the fine candles of coarse candle i are
+        offsets[i]:offsets[i+1].
+    fine : BarArrays
+        The candles of the finer timeframe.
+    """
+
+    open_time: np.ndarray
+    offsets: np.ndarray
+    fine: BarArrays
+    _fingerprint: str = field(default=None, init=False, repr=False,
+                              compare=False)
+
+    @classmethod
+    def from_bars(cls, coarse: BarArrays, fine: BarArrays) -> 'Drilldown':
+        """Indexes the fine candles by the coarse candle they belong to.
+
+        Parameters
+        ----------
+        coarse : BarArrays
+            The candles that are simulated.
+        fine : BarArrays
+            The candles of a finer timeframe covering the same time.
+
+        Returns
+        -------
+        Drilldown
+            The index from every coarse candle to its fine candles.
+        """
+
+        open_time = np.asarray(coarse.open_time, dtype=np.int64)
+        bounds = open_time
+        if open_time.size > 1:
+            # The last coarse candle ends one candle length after it opened.
+            bounds = np.append(open_time,
+                               2*open_time[-1] - open_time[-2])
+        offsets = np.searchsorted(fine.open_time, bounds)
+        if open_time.size == 1:
+            offsets = np.append(offsets, len(fine))
+
+        return cls(open_time, offsets, fine)
+
+    def children(self, open_time: int) -> BarArrays:
+        """Returns the fine candles of the coarse candle opening at a time.
+
+        Parameters
+        ----------
+        open_time : int
+            The opening time of the coarse candle.
+
+        Returns
+        -------
+        BarArrays
+            The fine candles, empty if there are none.
+        """
+
+        index = int(np.searchsorted(self.open_time, open_time))
+        if index == self.open_time.size or self.open_time[index] != open_time:
+            return self.fine[0:0]
+
+        return self.fine[self.offsets[index]:self.offsets[index+1]]
+
+    @property
+    def fingerprint(self) -> str:
+        """Returns a hash of the index and the fine candles."""
+
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for column in (self.open_time, self.offsets, self.fine.open_time,
+                           self.fine.high, self.fine.low):
+                digest.update(np.ascontiguousarray(column).tobytes())
+            self._fingerprint = digest.hexdigest()
+
+        return self._fingerprint
+
+
+@dataclass
+class IntrabarFills:
+    """Configure how a strategy fills orders inside a candle.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        The path assumption, one of PATHS.
+    drilldown : Drilldown
+        If set, candles that reached both the stop loss and the target are
+        resolved by going through their candles of a finer timeframe.
+    """
+
+    path: str = 'ohlc'
+    drilldown: Drilldown = None
+
+    def __post_init__(self):
+        if self.path not in PATHS:
+            raise ValueError(f'Unknown path assumption {self.path}, '
+                             f'expected one of {PATHS}.')
+
+    def settings(self) -> tuple:
+        """Returns what distinguishes the fills of this configuration."""
+
+        return (self.path, None if self.drilldown is None
+                else self.drilldown.fingerprint)
+
+    def exits(self, bar: Bar, stop, target, long: bool) -> tuple:
+        """Finds the positions closed by their stop loss or their target.
+
+        Parameters
+        ----------
+        bar : Bar
+            The candle the positions are open in.
+        stop : float or np.ndarray
+            The stop losses of the positions.
+        target : float or np.ndarray
+            The targets of the positions.
+        long : bool
+            True for long positions, False for short positions.
+
+        Returns
+        -------
+        bool or np.ndarray
+            Where the stop loss is hit first.
+        bool or np.ndarray
+            Where the target is hit first.
+        """
+
+        stop_hit, target_hit, ambiguous = hit_test(bar.high, bar.low, stop,
+                                                   target, long, self.path)
+
+        if self.drilldown is not None and np.any(ambiguous):
+            children = self.drilldown.children(bar.open_time)
+            if len(children):
+                return _drill(children, stop, target, long, self.path,
+                              stop_hit, target_hit, ambiguous)
+
+        return stop_hit, target_hit
+
+
+def hit_test(high, low, stop, target, long: bool, path: str) -> tuple:
+    """Tests which of stop loss and target a candle reaches first.
+
+    Parameters
+    ----------
+    high, low : float or np.ndarray
+        The highest and the lowest price of the candle.
+    stop, target : float or np.ndarray
+        The stop losses and targets of the positions.
+    long : bool
+        True for long positions, False for short positions.
+    path : str
+        The path assumption, one of PATHS.
+
+    Returns
+    -------
+    bool or np.ndarray
+        Where the stop loss is hit first.
+    bool or np.ndarray
+        Where the target is hit first.
+    bool or np.ndarray
+        Where both were reached, so the path assumption decided.
+    """
+
+    if long:
+        stop_touched, target_touched = low <= stop, high >= target
+        stop_first = path != 'ohlc'
+    else:
+        stop_touched, target_touched = high >= stop, low <= target
+        stop_first = path != 'olhc'
+
+    both = stop_touched & target_touched
+    if stop_first:
+        return stop_touched, target_touched ^ both, both
+
+    return stop_touched ^ both, target_touched, both
+
+
+def stop_price(open_, stop, long: bool):
+    """Returns the fill price of stop losses, the open if it gapped past.
+
+    Parameters
+    ----------
+    open_ : float
+        The opening price of the candle.
+    stop : float or np.ndarray
+        The stop losses.
+    long : bool
+        True for long positions, False for short positions.
+    """
+
+    return np.minimum(open_, stop) if long else np.maximum(open_, stop)
+
+
+def limit_price(open_, limit, buy: bool):
+    """Returns the fill price of limit orders, the open if it gapped past.
+
+    Parameters
+    ----------
+    open_ : float
+        The opening price of the candle.
+    limit : float or np.ndarray
+        The limit prices.
+    buy : bool
+        True for buy orders, False for sell orders.
+    """
+
+    return np.minimum(open_, limit) if buy else np.maximum(open_, limit)
+
+
+def _drill(children: BarArrays, stop, target, long: bool, path: str,
+           stop_hit, target_hit, ambiguous) -> tuple:
+    """Resolves ambiguous positions candle by candle on a finer timeframe."""
+
+    scalar = np.ndim(stop) == 0
+    stop, target = np.atleast_1d(stop), np.atleast_1d(target)
+    undecided = np.atleast_1d(ambiguous).copy()
+    stop_out = np.atleast_1d(stop_hit) & ~undecided
+    target_out = np.atleast_1d(target_hit) & ~undecided
+
+    for high, low in zip(children.high.tolist(), children.low.tolist()):
+        child_stop, child_target, _ = hit_test(high, low, stop, target,
+                                               long, path)
+        child_stop &= undecided
+        child_target &= undecided
+        stop_out |= child_stop
+        target_out |= child_target
+        undecided &= ~(child_stop | child_target)
+        if not undecided.any():
+            break
+
+    # Keep the path assumption where the finer candles never got there.
+    stop_out |= np.atleast_1d(stop_hit) & undecided
+    target_out |= np.atleast_1d(target_hit) & undecided
+
+    if scalar:
+        return bool(stop_out[0]), bool(target_out[0])
+
+    return stop_out, target_out
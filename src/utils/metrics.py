@@ -1,4 +1,12 @@
-"""Collect functions to calculate performance metrics from an equity curve."""
+"""Collect functions to calculate performance metrics from an equity curve.
+
+Besides the functions working on a whole equity curve, the functions ending
+in _2d compute the same metrics for every row of a matrix of equity curves
+in one call, and RunningStats accumulates them point by point while the
+curve is recorded.
+"""
+
+import math
 
 import numpy as np
 
@@ -36,12 +44,8 @@ def calculate_max_drawdown(equity_curve: np.array) -> np.array:
         Maximum draw down of the strategy.
     """
 
-    m_max = 0.
-    maxDD = 0.
-
-    for i in range(equity_curve.shape[0]):
-        m_max = max(m_max, equity_curve[i])
-        maxDD = min(maxDD, equity_curve[i]/m_max - 1)
+    m_max = np.maximum(np.maximum.accumulate(equity_curve), 0.)
+    maxDD = min(0., (equity_curve/m_max - 1).min())
 
     return round(maxDD, 3)
 
@@ -192,6 +196,166 @@ def get_stats(equity_curve: np.array) -> dict:
             'musch': musch}
 
 
+def calculate_returns_2d(equity_curves: np.array) -> np.array:
+    """Calculate returns from every row of a matrix of equity curves.
+
+    Parameters
+    ----------
+    equity_curves : np.array
+        The equity curves of the strategies, one per row.
+
+    Returns
+    -------
+    np.array
+        Returns of the strategies, one row per equity curve.
+    """
+
+    return np.diff(equity_curves, axis=1)/equity_curves[:, :-1]
+
+
+def calculate_max_drawdown_2d(equity_curves: np.array) -> np.array:
+    """Calculate the maximum draw down of every row of equity curves.
+
+    Parameters
+    ----------
+    equity_curves : np.array
+        The equity curves of the strategies, one per row.
+
+    Returns
+    -------
+    np.array
+        Maximum draw down of every strategy.
+    """
+
+    m_max = np.maximum(np.maximum.accumulate(equity_curves, axis=1), 0.)
+    maxDD = np.minimum((equity_curves/m_max - 1).min(axis=1), 0.)
+
+    return np.round(maxDD, 3)
+
+
+def calculate_coeff_of_var_2d(returns: np.array) -> np.array:
+    """Calculate the coefficient of variation of every row of returns.
+
+    Parameters
+    ----------
+    returns : np.array
+        Returns of the strategies, one row per strategy.
+
+    Returns
+    -------
+    np.array
+        Coefficient of variation of every strategy.
+    """
+
+    mean = returns.mean(axis=1)
+    std = returns.std(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(mean != 0, np.round(std / mean, 2), 0.)
+
+
+def calculate_sharpe_2d(returns: np.array) -> np.array:
+    """Calculate the Sharpe ratio of every row of returns.
+
+    Parameters
+    ----------
+    returns : np.array
+        Returns of the strategies, one row per strategy.
+
+    Returns
+    -------
+    np.array
+        Sharpe ratio of every strategy.
+    """
+
+    gap = 1./24
+    mean = returns.mean(axis=1)
+    std = returns.std(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(std != 0,
+                        np.round(mean / std * np.sqrt(365/gap), 2), 0.)
+
+
+def calculate_sortino_2d(returns: np.array) -> np.array:
+    """Calculate the Sortino ratio of every row of returns.
+
+    Parameters
+    ----------
+    returns : np.array
+        Returns of the strategies, one row per strategy.
+
+    Returns
+    -------
+    np.array
+        Sortino ratio of every strategy.
+    """
+
+    gap = 1./24
+    mean = returns.mean(axis=1)
+    downside = np.square(np.minimum(returns, 0.)).sum(axis=1)
+    downside_dev = np.sqrt(downside/returns.shape[1])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(downside_dev != 0,
+                        np.round(mean / downside_dev * np.sqrt(365/gap), 2),
+                        0.)
+
+
+def calculate_omega_2d(returns: np.array) -> np.array:
+    """Calculate the Omega ratio of every row of returns.
+
+    Parameters
+    ----------
+    returns : np.array
+        Returns of the strategies, one row per strategy.
+
+    Returns
+    -------
+    np.array
+        Omega ratio of every strategy.
+    """
+
+    positive_area = np.maximum(returns, 0.).sum(axis=1)
+    negative_area = -np.minimum(returns, 0.).sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(negative_area != 0,
+                        np.round(positive_area / negative_area, 2), 0.)
+
+
+def calculate_musch_2d(equity_curves: np.array) -> np.array:
+    """Calculate the Musch ratio of every row of equity curves.
+
+    Parameters
+    ----------
+    equity_curves : np.array
+        The equity curves of the strategies, one per row.
+
+    Returns
+    -------
+    np.array
+        Musch ratio of every strategy.
+    """
+
+    max_dd = calculate_max_drawdown_2d(equity_curves)
+    returns = np.maximum(0, (equity_curves[:, -1] / equity_curves[:, 0])-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((max_dd == -1) | (max_dd == 0), 0.,
+                        np.round(returns / ((1/((1+max_dd)**5)) - 1), 2))
+
+
+# Functions computing a metric for every row of a matrix in one call
+BATCH_METRICS = {calculate_returns: calculate_returns_2d,
+                 calculate_max_drawdown: calculate_max_drawdown_2d,
+                 calculate_coeff_of_var: calculate_coeff_of_var_2d,
+                 calculate_sharpe: calculate_sharpe_2d,
+                 calculate_sortino: calculate_sortino_2d,
+                 calculate_omega: calculate_omega_2d,
+                 calculate_musch: calculate_musch_2d}
+
+
 def print_stats(equity_curve: np.array) -> None:
     """Calculate and print important stats of the strategy.
 
@@ -211,3 +375,197 @@ def print_stats(equity_curve: np.array) -> None:
     print('Hourly Sortino:   {:.2f}'.format(stats['sortino']))
     print('Hourly Omega:     {:.2f} '.format(stats['omega']))
     print('Hourly Musch:     {:.2f} \n'.format(stats['musch']))
+
+
+class RunningStats:
+    """Accumulate the performance metrics of an equity curve point by point.
+
+    Every update takes constant time and memory: mean and variance of the
+    returns are kept with Welford's algorithm, next to the running peak and
+    maximum draw down, the downside sum of squares and the positive and
+    negative areas of the returns. The metrics match the functions of this
+    module evaluated on the whole curve up to floating point error.
+
+    ...
+
+    Attributes
+    ----------
+    count : int
+        The number of equity values seen.
+    first : float
+        The first equity value.
+    last : float
+        The last equity value.
+    peak : float
+        The highest equity value.
+    max_dd : float
+        The maximum draw down, not rounded.
+
+    Methods
+    -------
+    update(equity: float) -> None:
+        Adds the next equity value.
+    extend(equity_curve: np.array) -> None:
+        Adds several equity values at once.
+    get_stats() -> dict:
+        Returns the stats of get_stats apart from the returns.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.first = math.nan
+        self.last = math.nan
+        self.peak = 0.
+        self.max_dd = 0.
+        self._mean = 0.
+        self._m2 = 0.
+        self._downside = 0.
+        self._positive_area = 0.
+        self._negative_area = 0.
+
+    def update(self, equity: float) -> None:
+        """Adds the next equity value.
+
+        Parameters
+        ----------
+        equity : float
+            The next point of the equity curve.
+        """
+
+        if self.count == 0:
+            self.first = equity
+        else:
+            ret = (equity - self.last)/self.last if self.last else math.nan
+            n = self.count
+            delta = ret - self._mean
+            self._mean += delta / n
+            self._m2 += delta * (ret - self._mean)
+            if ret < 0:
+                self._downside += ret*ret
+                self._negative_area -= ret
+            elif ret > 0:
+                self._positive_area += ret
+
+        self.count += 1
+        self.last = equity
+        self.peak = max(self.peak, equity)
+        self.max_dd = min(self.max_dd, equity/self.peak - 1)
+
+    def extend(self, equity_curve: np.array) -> None:
+        """Adds several equity values at once.
+
+        The values are reduced with NumPy and merged into the running
+        moments, so this is much faster than calling update per value.
+
+        Parameters
+        ----------
+        equity_curve : np.array
+            The next points of the equity curve.
+        """
+
+        equity_curve = np.asarray(equity_curve, dtype=np.float64)
+        if self.count == 0 and equity_curve.size:
+            self.update(float(equity_curve[0]))
+            equity_curve = equity_curve[1:]
+        if not equity_curve.size:
+            return
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = calculate_returns(np.concatenate(([self.last],
+                                                        equity_curve)))
+        n_a, n_b = self.count - 1, returns.size
+        mean_b = returns.mean()
+        delta = mean_b - self._mean
+        self._mean += delta * n_b / (n_a + n_b)
+        self._m2 += np.square(returns - mean_b).sum() \
+            + delta**2 * n_a * n_b / (n_a + n_b)
+        self._downside += np.square(returns[returns < 0]).sum()
+        self._positive_area += returns[returns > 0].sum()
+        self._negative_area -= returns[returns < 0].sum()
+
+        peaks = np.maximum.accumulate(np.maximum(equity_curve, self.peak))
+        self.max_dd = min(self.max_dd, (equity_curve/peaks - 1).min())
+        self.peak = float(peaks[-1])
+        self.last = float(equity_curve[-1])
+        self.count += equity_curve.size
+
+    @property
+    def mean(self) -> float:
+        """The mean of the returns."""
+
+        return self._mean if self.count > 1 else math.nan
+
+    @property
+    def std(self) -> float:
+        """The standard deviation of the returns."""
+
+        return math.sqrt(self._m2 / (self.count-1)) if self.count > 1 \
+            else math.nan
+
+    def max_drawdown(self) -> float:
+        """Returns the maximum draw down as calculate_max_drawdown."""
+
+        return round(self.max_dd, 3)
+
+    def coeff_of_var(self) -> float:
+        """Returns the coefficient of variation as calculate_coeff_of_var."""
+
+        return round(self.std / self.mean, 2) if self.mean != 0 else 0
+
+    def sharpe(self) -> float:
+        """Returns the Sharpe ratio as calculate_sharpe."""
+
+        gap = 1./24
+        std = self.std
+
+        return round(self.mean / std * np.sqrt(365/gap), 2) if std != 0 \
+            else 0
+
+    def sortino(self) -> float:
+        """Returns the Sortino ratio as calculate_sortino."""
+
+        gap = 1./24
+        downside_dev = math.sqrt(self._downside / (self.count-1)) \
+            if self.count > 1 else math.nan
+
+        return round(self.mean / downside_dev * np.sqrt(365/gap), 2) \
+            if downside_dev != 0 else 0
+
+    def omega(self) -> float:
+        """Returns the Omega ratio as calculate_omega."""
+
+        return round(self._positive_area / self._negative_area, 2) \
+            if self._negative_area != 0 else 0
+
+    def musch(self) -> float:
+        """Returns the Musch ratio as calculate_musch."""
+
+        max_dd = self.max_drawdown()
+        returns = max(0, (self.last / self.first)-1)
+
+        return 0 if (max_dd == -1 or max_dd == 0)\
+            else round(returns / ((1/((1+max_dd)**5)) - 1), 2)
+
+    def get_stats(self) -> dict:
+        """Returns the stats of get_stats apart from the returns.
+
+        Returns
+        -------
+        dict
+            Dictionary containing the stats of the strategy.
+        """
+
+        return {'mean': self.mean, 'std': self.std,
+                'max_dd': self.max_drawdown(),
+                'coeff_of_var': self.coeff_of_var(),
+                'sharpe': self.sharpe(), 'sortino': self.sortino(),
+                'omega': self.omega(), 'musch': self.musch()}
+
+
+# RunningStats methods computing the same reward as the metric functions
+RUNNING_METRICS = {calculate_sharpe: RunningStats.sharpe,
+                   calculate_sortino: RunningStats.sortino,
+                   calculate_omega: RunningStats.omega,
+                   calculate_coeff_of_var: RunningStats.coeff_of_var,
+                   calculate_musch: RunningStats.musch,
+                   calculate_max_drawdown: RunningStats.max_drawdown}
@@ -5,14 +5,16 @@ import os
 import numpy as np
 import matplotlib.pyplot as plt
 
-import utils.metrics as metrics
-from Strategy import TradeLog
+from src.Strategy import TradeLog
+from src.utils.bootstrap import bootstrap_bands
+import src.utils.metrics as metrics
 
 
 def plot_backtest(trade_log: TradeLog,
                   strategy_name: str,
                   equity_train: np.array,
-                  equity_test: np.array) -> None:
+                  equity_test: np.array, n_paths: int = 250,
+                  block_size: float = 1., seed: int = None) -> None:
     """Plot the equity curve of backtest during ttraining and testing phase
        and a confidence interval of the bootstraped distribution of the
        optimal strategy during training to potentially invalidate the
@@ -28,6 +30,14 @@ def plot_backtest(trade_log: TradeLog,
         The equity curve of the training phase.
     equity_test : np.array
         The equity curve of the testing phase.
+    n_paths : int
+        The number of bootstrapped paths. The default is cheap enough for
+        long test phases, pass e.g. 10_000 for smoother bands.
+    block_size : float
+        The mean block length of the stationary bootstrap, 1 to draw every
+        return independently.
+    seed : int
+        The seed of the bootstrap.
     """
 
     x_train = len(equity_train)
@@ -46,12 +56,12 @@ def plot_backtest(trade_log: TradeLog,
     stats_test = metrics.get_stats(equity_test)
 
     # Bootstrap confidence interval
-    sample = np.random.choice(stats_train['returns'],
-                              size=(len(stats_test['returns'])+1, 250)) + 1
-    sample = np.cumprod(sample, axis=0) * equity_train[-1]
-    mean_percentile = np.percentile(sample, 50, axis=1)
-    upper_percentile = np.percentile(sample, 95, axis=1)
-    lower_percentile = np.percentile(sample, 5, axis=1)
+    bands = bootstrap_bands(stats_train['returns'], x_test-1,
+                            equity_train[-1], (5, 50, 95), n_paths,
+                            block_size, observed=equity_test, seed=seed)
+    mean_percentile = bands[50]
+    upper_percentile = bands[95]
+    lower_percentile = bands[5]
 
     axs[0].plot(np.concatenate((equity_train, equity_test)), color='b',
                 label='Equity Curve')
@@ -67,9 +77,11 @@ def plot_backtest(trade_log: TradeLog,
     table = axs[1].table(cellText=[[stats_test['sharpe']],
                                    [stats_test['sortino']],
                                    [stats_test['max_dd']],
-                                   [stats_test['musch']]],
+                                   [stats_test['musch']],
+                                   [round(bands.p_values[-1], 3)]],
                          rowLabels=['Sharpe', 'Sortino',
-                                    'Max. Drawdown', 'Musch'],
+                                    'Max. Drawdown', 'Musch',
+                                    'Bootstrap p-value'],
                          colLabels=['Metrics'], loc='best')
     table.auto_set_column_width(col=[0, 1])
 
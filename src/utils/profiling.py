@@ -0,0 +1,270 @@
+"""Measure where the time of simulations goes.
+
+A Profiler counts the calls and sums the time of every phase of a
+simulation while it is active. The phases are timed by wrapping the methods
+that implement them on their classes for as long as the profiler is
+active, and restoring them afterwards, so simulating without a profiler
+runs exactly the same code as before and costs nothing extra:
+
+    'trade'       Strategy.next_bar_trade and next_bar_trade_lanes
+    'setup'       Strategy.next_bar_setup and next_bar_setup_lanes
+    'structure'   MarketStructure.next_bar, called inside setup
+    'equity'      TradeData.append_equity and LaneData.append_equity, called
+                  inside setup
+    'conversion'  Bar.from_series and Bar.to_series, building rows
+    'tracing'     Tracer.record, recording events while tracing is enabled
+
+Phases called inside other phases are included in their time. Wrapping
+adds a fixed cost to every call, so compare phases with each other and
+with earlier profiles, not with the time of unprofiled simulations.
+Optionally the profiler also runs cProfile and tracks allocated memory
+with tracemalloc.
+"""
+
+from contextlib import contextmanager
+import cProfile
+import functools
+import json
+import pstats
+import time
+import tracemalloc
+
+from src.Assets import LaneData, TradeData
+from src.Bars import Bar
+from src.MarketStructure import MarketStructure
+from src.utils.tracing import Tracer
+
+
+# The methods timed for every phase, apart from the strategy methods
+_PHASE_METHODS = {'structure': [(MarketStructure, 'next_bar')],
+                  'equity': [(TradeData, 'append_equity'),
+                             (LaneData, 'append_equity')],
+                  'conversion': [(Bar, 'from_series'), (Bar, 'to_series')],
+                  'tracing': [(Tracer, 'record')]}
+
+# The strategy methods timed for every phase
+_STRATEGY_METHODS = {'trade': ['next_bar_trade', 'next_bar_trade_lanes'],
+                     'setup': ['next_bar_setup', 'next_bar_setup_lanes']}
+
+PHASES = ('trade', 'setup', 'structure', 'equity', 'conversion', 'tracing')
+
+
+class Profiler:
+    """Count the calls and time of every phase of simulations.
+
+    ...
+
+    Attributes
+    ----------
+    cprofile : bool
+        If True, cProfile runs while the profiler is active.
+    trace_memory : bool
+        If True, tracemalloc tracks the allocated memory while the profiler
+        is active.
+    calls : dict
+        The number of calls of every phase.
+    seconds : dict
+        The time spent in every phase.
+    bars : int
+        The number of candles simulated, counted once per trade log.
+    simulations : int
+        The number of trade logs simulated, counted once per dataset.
+    wall : float
+        The time the profiler was active.
+    peak_memory : int
+        The largest number of bytes allocated at once, 0 without
+        trace_memory.
+
+    Methods
+    -------
+    profile(strategies: list, bars: int, simulations: int) -> None:
+        Profiles the simulations run inside a with block.
+    merge(other: Profiler) -> None:
+        Adds the counts of another profiler.
+    summary() -> dict:
+        Returns the counts and rates of all phases.
+    save_json(path: str) -> None:
+        Writes the summary to a JSON file.
+    dump_stats(path: str) -> None:
+        Writes the cProfile results to a pstats file.
+    """
+
+    def __init__(self, cprofile: bool = False, trace_memory: bool = False):
+        self.cprofile = cprofile
+        self.trace_memory = trace_memory
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.seconds = dict.fromkeys(PHASES, 0.)
+        self.bars = 0
+        self.simulations = 0
+        self.wall = 0.
+        self.peak_memory = 0
+        self._profile = cProfile.Profile() if cprofile else None
+        # cProfile results merged from other profilers
+        self._merged = []
+        self._active = False
+
+    @contextmanager
+    def profile(self, strategies: list, bars: int = 0,
+                simulations: int = 1) -> None:
+        """Profiles the simulations run inside a with block.
+
+        Parameters
+        ----------
+        strategies : list
+            The strategies simulated in the block. The phase methods of
+            their classes are timed.
+        bars : int
+            The number of candles simulated per trade log.
+        simulations : int
+            The number of trade logs simulated.
+        """
+
+        if self._active:
+            # Nested blocks are part of the outer one.
+            yield
+            return
+
+        patches = []
+        for phase, methods in _PHASE_METHODS.items():
+            for owner, name in methods:
+                patches.append(self._wrap(owner, name, phase))
+        for cls in {type(strategy) for strategy in strategies}:
+            for phase, names in _STRATEGY_METHODS.items():
+                for name in names:
+                    patches.append(self._wrap(cls, name, phase))
+
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if self._profile is not None:
+            self._profile.enable()
+        self._active = True
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.wall += time.perf_counter() - started
+            self._active = False
+            if self._profile is not None:
+                self._profile.disable()
+            if tracing:
+                self.peak_memory = max(self.peak_memory,
+                                       tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            for owner, name, original in reversed(patches):
+                if original is None:
+                    delattr(owner, name)
+                else:
+                    setattr(owner, name, original)
+            self.bars += bars * simulations
+            self.simulations += simulations
+
+    def merge(self, other: 'Profiler') -> None:
+        """Adds the counts of another profiler, e.g. of a worker process.
+
+        Parameters
+        ----------
+        other : Profiler
+            The profiler whose counts are added.
+        """
+
+        for phase in PHASES:
+            self.calls[phase] += other.calls[phase]
+            self.seconds[phase] += other.seconds[phase]
+        self.bars += other.bars
+        self.simulations += other.simulations
+        self.wall += other.wall
+        self.peak_memory = max(self.peak_memory, other.peak_memory)
+        if other._profile is not None:
+            self._merged.append(other._profile)
+        self._merged.extend(other._merged)
+
+    def summary(self) -> dict:
+        """Returns the counts and rates of all phases.
+
+        Returns
+        -------
+        dict
+            The candles, simulations, wall time, candles per second, peak
+            memory and, for every phase, its calls, seconds, microseconds
+            per call and share of the wall time.
+        """
+
+        phases = {}
+        for phase in PHASES:
+            calls, seconds = self.calls[phase], self.seconds[phase]
+            phases[phase] = {
+                'calls': calls, 'seconds': seconds,
+                'us_per_call': 1e6 * seconds / calls if calls else 0.,
+                'share': seconds / self.wall if self.wall else 0.}
+
+        return {'bars': self.bars, 'simulations': self.simulations,
+                'wall_seconds': self.wall,
+                'bars_per_second': self.bars / self.wall if self.wall
+                else 0.,
+                'peak_memory_bytes': self.peak_memory, 'phases': phases}
+
+    def save_json(self, path: str) -> None:
+        """Writes the summary to a JSON file.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+        """
+
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def dump_stats(self, path: str) -> None:
+        """Writes the cProfile results to a pstats file.
+
+        The file can be read with pstats.Stats or tools like snakeviz.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+        """
+
+        profiles = [self._profile] if self._profile is not None else []
+        profiles += self._merged
+        if not profiles:
+            raise ValueError('The profiler was created without cprofile.')
+
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
+
+    def _wrap(self, owner: object, name: str, phase: str) -> tuple:
+        """Replaces a method by a timed wrapper.
+
+        Returns
+        -------
+        tuple
+            The owner, the name and the original attribute of its own
+            namespace, None if the method was inherited.
+        """
+
+        original = vars(owner).get(name)
+        func = getattr(owner, name)
+        calls, seconds = self.calls, self.seconds
+        perf_counter = time.perf_counter
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds[phase] += perf_counter() - start
+                calls[phase] += 1
+
+        # Bound class methods are wrapped as they are, plain functions are
+        # bound to the instance again by the class.
+        if isinstance(original, (classmethod, staticmethod)):
+            timed = staticmethod(timed)
+        setattr(owner, name, timed)
+
+        return owner, name, original
@@ -0,0 +1,132 @@
+"""Stream the historical price datasets as if they were live candles.
+
+A CsvReplay stands in for the exchange: it yields the candles of a dataset
+one after another, optionally paced like the real market sped up by a
+constant factor, and can be consumed by TradeLog.push, TradeLog.consume or
+TradeLog.consume_async exactly like a live feed.
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Iterator
+
+import numpy as np
+
+from src.Bars import Bar
+from src.Strategy import TradeLog
+import src.utils.datasets as datasets
+
+
+class CsvReplay:
+    """Replay the candles of a dataset as a live source.
+
+    ...
+
+    Attributes
+    ----------
+    ticker : str
+        The ticker of the asset.
+    timeframe : str
+        The timeframe of the historical data.
+    speed : float
+        How many times faster than the real market the candles are
+        released. With 0 they are released as fast as they are consumed.
+    start_after : int
+        Only candles opening after this time in milliseconds since epoch are
+        replayed, e.g. the last_open_time of a resumed trade log.
+    emitted : float
+        The time.perf_counter value when the last candle was released.
+
+    Methods
+    -------
+    __iter__() -> Iterator[Bar]:
+        Releases the candles, sleeping between them.
+    __aiter__() -> AsyncIterator[Bar]:
+        Releases the candles, awaiting between them.
+    """
+
+    def __init__(self, ticker: str, timeframe: str, speed: float = 0.,
+                 start_after: int = None,
+                 datasets_dir: str = datasets.DATASETS_DIR,
+                 cache_dir: str = datasets.CACHE_DIR):
+        self.ticker = ticker
+        self.timeframe = timeframe
+        self.speed = speed
+        self.start_after = start_after
+        self.emitted = None
+        self._bars = datasets.load_bars(ticker, timeframe, datasets_dir,
+                                        cache_dir)
+
+    def __len__(self) -> int:
+        return len(self._bars) - self._start()
+
+    def __iter__(self) -> Iterator[Bar]:
+        """Releases the candles, sleeping between them."""
+
+        for delay, bar in self._schedule():
+            if delay > 0:
+                time.sleep(delay)
+            self.emitted = time.perf_counter()
+            yield bar
+
+    async def __aiter__(self) -> AsyncIterator[Bar]:
+        """Releases the candles, awaiting between them."""
+
+        for delay, bar in self._schedule():
+            # Yield to the event loop even without pacing, so other tasks
+            # keep running while a fast replay is consumed.
+            await asyncio.sleep(max(delay, 0))
+            self.emitted = time.perf_counter()
+            yield bar
+
+    def _start(self) -> int:
+        """Returns the index of the first candle to be replayed."""
+
+        if self.start_after is None:
+            return 0
+
+        return int(np.searchsorted(self._bars.open_time, self.start_after,
+                                   side='right'))
+
+    def _schedule(self) -> Iterator[tuple]:
+        """Yields every candle with the seconds left until its release."""
+
+        bars = self._bars[self._start():]
+        if not len(bars):
+            return
+
+        first_open = int(bars.open_time[0])
+        started = time.perf_counter()
+        for bar in bars:
+            if not self.speed:
+                yield 0., bar
+                continue
+            due = started + (bar.open_time - first_open) / 1000 / self.speed
+            yield due - time.perf_counter(), bar
+
+
+def measure_latency(trade_log: TradeLog, source: CsvReplay) -> np.array:
+    """Feeds a trade log from a replay and times every candle.
+
+    Parameters
+    ----------
+    trade_log : TradeLog
+        The trade log following the candles.
+    source : CsvReplay
+        The source of the candles.
+
+    Returns
+    -------
+    np.array
+        The seconds from the release of every candle until the trade log
+        has processed it.
+    """
+
+    latencies = np.empty(len(source))
+    count = 0
+    for bar in source:
+        trade_log.push(bar)
+        latencies[count] = time.perf_counter() - source.emitted
+        count += 1
+
+    return latencies[:count]
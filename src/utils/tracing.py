@@ -0,0 +1,183 @@
+"""Trace the events of simulations into a ring buffer of integers.
+
+The market structure and the strategies report what happens on every
+candle, like a trend break or a stop loss, as an event code next to the
+opening time of the candle. Nothing is formatted while simulating: the
+codes are written into a fixed size ring buffer, and only turned into
+messages when the trace is inspected. A precomputed market structure
+records its events while it is replayed, and a grid simulation records
+one exit event for every lane it closes.
+
+Tracing is off by default. The hot path then only checks whether the
+module attribute tracer is None:
+
+    tracer = tracing.tracer
+    if tracer is not None:
+        tracer.record(bar.open_time, tracing.STAYING_IN_RANGE)
+
+Call enable to start tracing and disable to stop it.
+"""
+
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from src.Bars import BarArrays
+
+
+# Event codes, indices into MESSAGES
+UP_TREND_BROKEN = 0
+DOWN_TREND_BROKEN = 1
+CONTINUING_UP_TREND = 2
+CONTINUING_DOWN_TREND = 3
+STAYING_IN_RANGE = 4
+TAKE_PROFIT_LONG = 5
+STOP_LOSS_LONG = 6
+TAKE_PROFIT_SHORT = 7
+STOP_LOSS_SHORT = 8
+
+MESSAGES = ('Up Trend Broken', 'Down Trend Broken', 'Continuing Up Trend',
+            'Continuing Down Trend', 'Staying in Range',
+            'Take Profit on Long Position', 'Stop Loss Hit on Long Position',
+            'Take Profit on Short Position',
+            'Stop Loss Hit on Short Position')
+
+# The active tracer, None while tracing is off
+tracer = None
+
+
+class Tracer:
+    """Record events in a ring buffer of (open time, event code) integers.
+
+    Once the buffer is full, every new event overwrites the oldest one.
+
+    ...
+
+    Attributes
+    ----------
+    capacity : int
+        The number of events kept.
+    recorded : int
+        The number of events recorded since the last clear, including
+        overwritten ones.
+
+    Methods
+    -------
+    record(open_time: int, code: int) -> None:
+        Records one event.
+    events() -> np.ndarray:
+        Returns the kept events, oldest first.
+    decode(bars: BarArrays) -> pd.DataFrame:
+        Returns the kept events with their messages.
+    clear() -> None:
+        Removes all events.
+    """
+
+    __slots__ = ('capacity', 'recorded', '_times', '_codes')
+
+    def __init__(self, capacity: int = 1 << 16):
+        self.capacity = capacity
+        self._times = array('q', bytes(8*capacity))
+        self._codes = array('b', bytes(capacity))
+        self.recorded = 0
+
+    def __len__(self) -> int:
+        return min(self.recorded, self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """The number of events overwritten by newer ones."""
+
+        return max(0, self.recorded - self.capacity)
+
+    def record(self, open_time: int, code: int) -> None:
+        """Records one event.
+
+        Parameters
+        ----------
+        open_time : int
+            The opening time of the candle of the event.
+        code : int
+            The event code, one of the constants of this module.
+        """
+
+        idx = self.recorded % self.capacity
+        self._times[idx] = open_time
+        self._codes[idx] = code
+        self.recorded += 1
+
+    def events(self) -> np.ndarray:
+        """Returns the kept events, oldest first.
+
+        Returns
+        -------
+        np.ndarray
+            One row per event with its opening time and event code.
+        """
+
+        times = np.frombuffer(self._times, dtype=np.int64)
+        codes = np.frombuffer(self._codes, dtype=np.int8)
+        # Roll the oldest event to the front once the buffer wrapped.
+        order = np.roll(np.arange(len(self)),
+                        -(self.recorded % self.capacity)
+                        if self.dropped else 0)
+
+        return np.column_stack((times[order], codes[order]))
+
+    def decode(self, bars: BarArrays = None) -> pd.DataFrame:
+        """Returns the kept events with their messages.
+
+        Parameters
+        ----------
+        bars : BarArrays
+            The simulated candles. If given, every event is also located by
+            the index of its candle.
+
+        Returns
+        -------
+        pd.DataFrame
+            The opening time, event code and message of every event, and the
+            index of its candle if bars are given.
+        """
+
+        events = self.events()
+        frame = pd.DataFrame({'open time': events[:, 0],
+                              'code': events[:, 1]})
+        frame['event'] = np.array(MESSAGES, dtype=object)[events[:, 1]]
+        if bars is not None:
+            frame['bar'] = np.searchsorted(bars.open_time, events[:, 0])
+
+        return frame
+
+    def clear(self) -> None:
+        """Removes all events."""
+
+        self.recorded = 0
+
+
+def enable(capacity: int = 1 << 16) -> Tracer:
+    """Starts tracing into a new ring buffer.
+
+    Parameters
+    ----------
+    capacity : int
+        The number of events kept.
+
+    Returns
+    -------
+    Tracer
+        The active tracer.
+    """
+
+    global tracer
+    tracer = Tracer(capacity)
+
+    return tracer
+
+
+def disable() -> None:
+    """Stops tracing. The last tracer keeps its events."""
+
+    global tracer
+    tracer = None
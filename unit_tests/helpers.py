@@ -0,0 +1,55 @@
+"""Build the trade logs shared by the unit tests."""
+
+import numpy as np
+import pandas as pd
+
+from src.Assets import Asset, Params, TradeData
+from src.Bars import BarArrays
+from src.MarketStructure import MarketStructure
+from src.strategies.ContinuationTrade import ContinuationTrade
+from src.Strategy import TradeLog
+from src.utils.fills import IntrabarFills
+
+
+def make_trade_logs(data: pd.DataFrame, ticker: str = 'BTCBUSD',
+                    decimals: int = 3, timeframe: str = '4h',
+                    risks: list = np.linspace(0.01, 0.1, 3),
+                    leverages: list = (1, 5, 10),
+                    reward_risks: list = (2.0, 3.0),
+                    fills: IntrabarFills = None,
+                    record_trades: bool = False) -> list:
+    """Build a parameter grid of trade logs starting at the first candle of
+    data, a data frame or BarArrays.
+
+    The grid runs over the risks, then the leverages, then the reward/risk
+    ratios.
+    """
+
+    if not isinstance(data, BarArrays):
+        data = BarArrays.from_frame(data.iloc[:1])
+    high = (data.high[0], data.open_time[0])
+    low = (data.low[0], data.open_time[0])
+    asset = Asset(ticker, decimals, MarketStructure(high, low, high, low))
+
+    trade_logs = []
+    for risk in risks:
+        for leverage in leverages:
+            for rr in reward_risks:
+                trade_data = TradeData(0.0004)
+                if record_trades:
+                    trade_data.record_trades()
+                trade_logs.append(TradeLog(ContinuationTrade(fills),
+                                           asset.copy(),
+                                           Params(risk, rr, leverage,
+                                                  timeframe), trade_data))
+
+    return trade_logs
+
+
+def make_trade_log(data: pd.DataFrame, risk: float = 0.05,
+                   reward_risk: float = 2.0, leverage: float = 5,
+                   **kwargs) -> TradeLog:
+    """Build a single trade log like make_trade_logs."""
+
+    return make_trade_logs(data, risks=[risk], leverages=[leverage],
+                           reward_risks=[reward_risk], **kwargs)[0]
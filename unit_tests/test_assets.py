@@ -0,0 +1,54 @@
+import numpy as np
+
+from src.Assets import TradeData
+
+
+def test_trade_data_equity_curve_growth():
+    """Test if appending to the equity curve grows the buffer correctly."""
+
+    trade_data = TradeData(0.0)
+    values = np.arange(1000, dtype=float)
+
+    for value in values:
+        trade_data.append_equity(value)
+
+    assert trade_data.equity_curve.shape == (1001,)
+    assert trade_data.equity_curve[0] == 100.0
+    assert np.array_equal(trade_data.equity_curve[1:], values)
+    assert trade_data.mark_to_market == 999.0
+
+
+def test_trade_data_equity_curve_reserve():
+    """Test if reserving capacity keeps the recorded curve intact."""
+
+    trade_data = TradeData(0.0)
+    trade_data.append_equity(101.0)
+    trade_data.reserve(500)
+    curve = trade_data.equity_curve
+
+    for _ in range(500):
+        trade_data.append_equity(102.0)
+
+    assert np.shares_memory(curve, trade_data.equity_curve)
+    assert np.array_equal(trade_data.equity_curve[:2], [100.0, 101.0])
+
+
+def test_trade_data_equity_curve_setter():
+    """Test if assigning an equity curve replaces the recorded one."""
+
+    trade_data = TradeData(0.0)
+    trade_data.append_equity(101.0)
+    trade_data.equity_curve = np.array([105.0])
+    trade_data.append_equity(106.0)
+
+    assert np.array_equal(trade_data.equity_curve, [105.0, 106.0])
+    assert trade_data.mark_to_market == 106.0
+
+
+def test_trade_data_slots():
+    """Test if trade data keeps its attributes in slots."""
+
+    trade_data = TradeData(0.0004)
+
+    assert not hasattr(trade_data, '__dict__')
+    assert trade_data.equity == 100.0
@@ -0,0 +1,178 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from src.Backtest import Backtest, _simulate_reward
+from src.Bars import BarArrays
+from src.Pruning import DrawdownFloor, EquityFloor, SuccessiveHalving
+from src.Search import RandomSearch, SuccessiveHalvingSearch, TPESearch
+import src.utils.metrics as metrics
+from unit_tests.helpers import make_trade_logs
+
+
+def test_train_parallel():
+    """Test if parallel training finds the same optimum as sequential
+    training for any number of workers."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    bt = Backtest()
+
+    expected = bt.train(make_trade_logs(df), df, metrics.calculate_returns,
+                        metrics.calculate_sharpe)
+
+    for workers in [2, 3]:
+        optimal_trade = bt.train(make_trade_logs(df), df,
+                                 metrics.calculate_returns,
+                                 metrics.calculate_sharpe, workers=workers)
+
+        assert optimal_trade.params == expected.params
+        assert np.array_equal(optimal_trade.trade_data.equity_curve,
+                              expected.trade_data.equity_curve)
+        assert optimal_trade.asset.ms.snapshot() == \
+            expected.asset.ms.snapshot()
+
+
+def test_simulate_reward_shared_asset(monkeypatch):
+    """Test if candidates sharing one asset, and pickled together into one
+    chunk for a worker, are each simulated from the state of the asset
+    before training."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    monkeypatch.setattr('src.Backtest._worker_bars', BarArrays.from_frame(df))
+
+    expected = [_simulate_reward(log, log.asset.snapshot(),
+                                 metrics.calculate_returns,
+                                 metrics.calculate_sharpe, False)[0]
+                for log in make_trade_logs(df)]
+
+    trade_logs = make_trade_logs(df)
+    for log in trade_logs[1:]:
+        log.asset = trade_logs[0].asset
+    states = [log.asset.snapshot() for log in trade_logs]
+    chunk = pickle.loads(pickle.dumps(trade_logs))
+
+    rewards = [_simulate_reward(log, state, metrics.calculate_returns,
+                                metrics.calculate_sharpe, False)[0]
+               for log, state in zip(chunk, states)]
+
+    assert chunk[1].asset is chunk[0].asset
+    assert rewards == expected
+
+
+def test_train_vectorized():
+    """Test if vectorized training finds the same optimum as sequential
+    training."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    bt = Backtest()
+
+    expected = bt.train(make_trade_logs(df), df, metrics.calculate_returns,
+                        metrics.calculate_sharpe)
+    optimal_trade = bt.train(make_trade_logs(df), df,
+                             metrics.calculate_returns,
+                             metrics.calculate_sharpe, vectorized=True)
+
+    assert optimal_trade.params == expected.params
+    assert np.array_equal(optimal_trade.trade_data.equity_curve,
+                          expected.trade_data.equity_curve)
+
+
+def test_train_streaming():
+    """Test if training on running stats finds the same optimum as
+    training on whole equity curves."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    bt = Backtest()
+
+    expected = bt.train(make_trade_logs(df), df, metrics.calculate_returns,
+                        metrics.calculate_sharpe)
+
+    for vectorized in [False, True]:
+        optimal_trade = bt.train(make_trade_logs(df), df,
+                                 metrics.calculate_returns,
+                                 metrics.calculate_sharpe,
+                                 vectorized=vectorized, streaming=True)
+
+        assert optimal_trade.params == expected.params
+        assert np.array_equal(optimal_trade.trade_data.equity_curve,
+                              expected.trade_data.equity_curve)
+
+
+def test_train_pruning():
+    """Test if pruning keeps the optimum of exhaustive training and counts
+    the candles it skips."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    bt = Backtest()
+    structure = make_trade_logs(df)[0].asset.ms.batch(df)
+
+    expected = bt.train(make_trade_logs(df), df, metrics.calculate_returns,
+                        metrics.calculate_sharpe)
+
+    for pruning in [DrawdownFloor(-0.5, 500), EquityFloor(50., 500),
+                    SuccessiveHalving((0.25, 0.5), 0.5)]:
+        for vectorized in [False, True]:
+            optimal_trade = bt.train(make_trade_logs(df), df,
+                                     metrics.calculate_returns,
+                                     metrics.calculate_sharpe, structure,
+                                     vectorized=vectorized, pruning=pruning)
+
+            assert optimal_trade.params == expected.params
+            assert np.array_equal(optimal_trade.trade_data.equity_curve,
+                                  expected.trade_data.equity_curve)
+            assert pruning.evaluated + pruning.skipped == 18 * len(df)
+
+        if not isinstance(pruning, EquityFloor):
+            assert pruning.pruned > 0 and pruning.skipped > 0
+
+
+def test_train_search():
+    """Test if searches respect their budget, return a candidate simulated
+    on all data, and find the optimum when allowed to try everything."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    bt = Backtest()
+    structure = make_trade_logs(df)[0].asset.ms.batch(df)
+
+    expected = bt.train(make_trade_logs(df), df, metrics.calculate_returns,
+                        metrics.calculate_sharpe)
+
+    for search in [RandomSearch(batch_size=4), TPESearch(4, batch_size=4)]:
+        optimal_trade = bt.train(make_trade_logs(df), df,
+                                 metrics.calculate_returns,
+                                 metrics.calculate_sharpe, structure,
+                                 vectorized=True, search=search)
+        assert optimal_trade.params == expected.params
+        assert search.evaluated == 18
+
+    for search in [RandomSearch(max_evals=6, batch_size=4),
+                   TPESearch(4, max_evals=6, batch_size=4),
+                   SuccessiveHalvingSearch(max_evals=6, batch_size=4)]:
+        for vectorized, workers in [(False, 1), (False, 2), (True, 1)]:
+            optimal_trade = bt.train(make_trade_logs(df), df,
+                                     metrics.calculate_returns,
+                                     metrics.calculate_sharpe, structure,
+                                     workers=workers, vectorized=vectorized,
+                                     search=search)
+            assert search.evaluated <= 6 + 1e-9
+
+            fresh = next(log for log in make_trade_logs(df)
+                         if log.params == optimal_trade.params)
+            fresh.simulate(df)
+            assert np.array_equal(optimal_trade.trade_data.equity_curve,
+                                  fresh.trade_data.equity_curve)
+
+    # The budget covers fractional simulations and the final completion.
+    for search, max_evals in [
+            (SuccessiveHalvingSearch(18, max_evals=3), 3),
+            (RandomSearch(max_evals=2.5), 2.5)]:
+        bt.train(make_trade_logs(df), df, metrics.calculate_returns,
+                 metrics.calculate_sharpe, structure, search=search)
+        assert 1 <= search.evaluated <= max_evals + 1e-9
+
+    search = SuccessiveHalvingSearch(9, eta=3, min_fraction=1/3)
+    bt.train(make_trade_logs(df), df, metrics.calculate_returns,
+             metrics.calculate_sharpe, structure, search=search)
+    assert [fraction for _, fraction, _ in search.history] == \
+        [1/3]*9 + [1.]*3
@@ -0,0 +1,33 @@
+import numpy as np
+
+from src.backtest import Strategies, Tickers
+from src.batch import make_jobs, run_batch
+
+
+def test_make_jobs():
+    """Test if jobs are built for available datasets only, largest dataset
+    first."""
+
+    strategies = [Strategies.CONTINUATION_TRADE.value]
+    jobs = make_jobs([Tickers.BTCBUSD.value, Tickers.LINKBUSD.value],
+                     ['15m', '1h', '1d'], strategies)
+
+    assert [(job.ticker[0], job.timeframe) for job in jobs] == \
+        [('BTCBUSD', '1h'), ('LINKBUSD', '15m'), ('LINKBUSD', '1h'),
+         ('BTCBUSD', '1d'), ('LINKBUSD', '1d')]
+    assert all(job.strategies == tuple(strategies) for job in jobs)
+
+
+def test_run_batch(tmp_path):
+    """Test if the batch collects one row per backtest with its timing."""
+
+    results = run_batch([Tickers.BTCBUSD.value, Tickers.ETHBUSD.value],
+                        ['4h', '1d'], [Strategies.CONTINUATION_TRADE.value],
+                        workers=2, cache_dir=str(tmp_path))
+
+    assert list(zip(results.ticker, results.timeframe)) == \
+        [('BTCBUSD', '1d'), ('BTCBUSD', '4h'), ('ETHBUSD', '1d'),
+         ('ETHBUSD', '4h')]
+    assert (results.wall_time > 0).all()
+    assert np.allclose(results.bars_per_sec,
+                       results.bars / results.wall_time)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.bootstrap import (block_indices, bootstrap_bands,
+                                 metric_p_value, sample_paths)
+import src.utils.metrics as metrics
+
+
+def load_returns() -> np.array:
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+
+    return metrics.calculate_returns(df['close'].to_numpy())
+
+
+def test_block_indices():
+    """Test if blocks are runs of consecutive returns of the right length."""
+
+    rng = np.random.default_rng(0)
+
+    idx = block_indices(rng, 100, 12, 3, 4, stationary=False)
+    assert idx.shape == (12, 3)
+    for block in range(3):
+        rows = idx[4*block:4*block+4]
+        assert np.array_equal(np.diff(rows, axis=0) % 100, np.ones((3, 3)))
+
+    idx = block_indices(rng, 10**6, 10_000, 10, 20, stationary=True)
+    breaks = (np.diff(idx, axis=0) != 1).sum() + 10
+    assert abs(idx.size / breaks - 20) < 1
+    assert idx.min() >= 0 and idx.max() < 10**6
+
+
+def test_bootstrap_bands():
+    """Test if streamed percentiles match the percentiles of all paths, if
+    a single chunk gives them exactly, and if they do not depend on the
+    number of workers."""
+
+    returns = load_returns()
+    horizon, n_paths, bins = 300, 3000, 1024
+
+    for block_size, stationary in [(1, True), (10, True), (10, False)]:
+        bands = bootstrap_bands(returns, horizon, 100., (5, 50, 95),
+                                n_paths, block_size, stationary, seed=3,
+                                chunk_size=n_paths//3, bins=bins)
+
+        paths = np.hstack([
+            sample_paths(returns, horizon, n_paths//3, 100., block_size,
+                         stationary, seed)
+            for seed in np.random.SeedSequence(3).spawn(3)])
+        expected = np.percentile(paths, [5, 50, 95], axis=1)
+        width = 2 * (paths.max(axis=1) - paths.min(axis=1)) / bins
+
+        assert bands.values.shape == (3, horizon+1)
+        assert np.all(bands.values[:, 0] == 100.)
+        assert np.all(np.abs(bands.values - expected) <= 2*width + 1e-9)
+
+        exact = bootstrap_bands(returns, horizon, 100., (5, 50, 95),
+                                n_paths//3, block_size, stationary, seed=3,
+                                chunk_size=n_paths//3)
+        assert np.allclose(exact.values, np.percentile(
+            paths[:, :n_paths//3], [5, 50, 95], axis=1))
+
+    observed = np.full(horizon+1, 100.)
+    bands = bootstrap_bands(returns, horizon, 100., n_paths=2500,
+                            block_size=10, observed=observed, seed=1,
+                            chunk_size=1000)
+    parallel = bootstrap_bands(returns, horizon, 100., n_paths=2500,
+                               block_size=10, observed=observed, seed=1,
+                               chunk_size=1000, workers=2)
+    assert np.array_equal(bands.values, parallel.values)
+    assert np.array_equal(bands.p_values, parallel.p_values)
+    assert bands.p_values[0] == 1.
+    assert 0 < bands.p_values[-1] < 1
+    assert np.all(bands[5] <= bands[50]) and np.all(bands[50] <= bands[95])
+
+
+def test_metric_p_value():
+    """Test if p-values separate a profitable from a losing strategy."""
+
+    rng = np.random.default_rng(0)
+    winning = rng.normal(0.002, 0.01, 2000)
+    losing = rng.normal(-0.002, 0.01, 2000)
+
+    assert metric_p_value(winning, metrics.calculate_sharpe, seed=0,
+                          n_paths=2000) < 0.05
+    assert metric_p_value(losing, metrics.calculate_sharpe, seed=0,
+                          n_paths=2000) > 0.95
+    assert metric_p_value(winning, metrics.calculate_max_drawdown, -1.,
+                          seed=0, n_paths=500) == 0.
@@ -0,0 +1,89 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import src.utils.datasets as datasets
+
+
+def test_load_bars(tmp_path):
+    """Test if cached columns match the CSV file."""
+
+    df = pd.read_csv(datasets.csv_path('BTCBUSD', '4h'))
+
+    for _ in range(2):
+        bars = datasets.load_bars('BTCBUSD', '4h',
+                                  cache_dir=str(tmp_path))
+
+        assert isinstance(bars.close, np.memmap)
+        assert bars.open_time.dtype == np.int64
+        assert np.array_equal(bars.open_time, df['open time'])
+        assert np.array_equal(bars.close, df['close'])
+        assert np.array_equal(bars.volume, df['volume'])
+
+
+def test_load_bars_invalidation(tmp_path):
+    """Test if the cache is rebuilt once its CSV file changes."""
+
+    datasets_dir = tmp_path / 'datasets'
+    cache_dir = str(tmp_path / 'cache')
+    os.makedirs(datasets_dir / 'BTCBUSD')
+    source = datasets_dir / 'BTCBUSD' / '1d.csv'
+    shutil.copy(datasets.csv_path('BTCBUSD', '1d'), source)
+
+    bars = datasets.load_bars('BTCBUSD', '1d', str(datasets_dir), cache_dir)
+    length = len(bars)
+
+    df = pd.read_csv(source)
+    df.iloc[:100].to_csv(source, index=False)
+
+    bars = datasets.load_bars('BTCBUSD', '1d', str(datasets_dir), cache_dir)
+    assert length > 100
+    assert len(bars) == 100
+
+    frame = datasets.load_frame('BTCBUSD', '1d', str(datasets_dir),
+                                cache_dir)
+    assert frame['close'].equals(df['close'].iloc[:100])
+
+
+def test_resample(tmp_path):
+    """Test if candles resampled from 15m match the 1h CSV file wherever no
+    15m candle is missing, and if the index points at their children."""
+
+    datasets_dir = tmp_path / 'datasets'
+    cache_dir = str(tmp_path / 'cache')
+    os.makedirs(datasets_dir / 'LINKBUSD')
+    shutil.copy(datasets.csv_path('LINKBUSD', '15m'),
+                datasets_dir / 'LINKBUSD' / '15m.csv')
+
+    assert datasets.base_timeframe('LINKBUSD', str(datasets_dir)) == '15m'
+    # There is no 1h file, so it is resampled.
+    bars = datasets.load_bars('LINKBUSD', '1h', str(datasets_dir),
+                              cache_dir)
+    drilldown = datasets.load_drilldown('LINKBUSD', '1h',
+                                        datasets_dir=str(datasets_dir),
+                                        cache_dir=cache_dir)
+    assert isinstance(bars.close, np.memmap)
+    assert np.array_equal(drilldown.open_time, bars.open_time)
+    assert drilldown.offsets[-1] == len(drilldown.fine)
+
+    fine_time = np.asarray(drilldown.fine.open_time)
+    children = [np.unique(fine_time[start:end]).size
+                for start, end in zip(drilldown.offsets[:-1],
+                                      drilldown.offsets[1:])]
+    # The last candle was still open when the files were downloaded.
+    complete = np.asarray(bars.open_time)[:-1][np.array(children)[:-1] == 4]
+
+    df = pd.read_csv(datasets.csv_path('LINKBUSD', '1h'))
+    df = df[df['open time'].isin(complete)].drop_duplicates('open time')
+    index = np.searchsorted(bars.open_time, df['open time'])
+    assert len(df) > 4000
+    for column in ['open', 'high', 'low', 'close']:
+        assert np.array_equal(np.asarray(getattr(bars, column))[index],
+                              df[column])
+    assert np.allclose(np.asarray(bars.volume)[index], df['volume'])
+
+    child = drilldown.children(int(bars.open_time[10]))
+    assert child.high.max() == bars.high[10]
+    assert child.open[0] == bars.open[10]
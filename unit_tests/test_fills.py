@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.Bars import Bar, BarArrays
+from src.Strategy import TradeLog
+from src.utils.fills import Drilldown, IntrabarFills, hit_test
+from unit_tests.helpers import make_trade_logs
+
+
+GRID = {'risks': [0.01, 0.05], 'leverages': [1, 5],
+        'reward_risks': [1.0, 2.0, 3.0]}
+
+
+def test_hit_test():
+    """Test the path assumptions on a candle reaching both stop loss and
+    target, on floats and on lanes."""
+
+    # Long with stop 9 and target 11 in a candle from 8 to 12.
+    assert hit_test(12., 8., 9., 11., True, 'ohlc') == (False, True, True)
+    assert hit_test(12., 8., 9., 11., True, 'olhc') == (True, False, True)
+    assert hit_test(12., 8., 9., 11., True, 'pessimistic') \
+        == (True, False, True)
+    # Short with stop 11 and target 9.
+    assert hit_test(12., 8., 11., 9., False, 'ohlc') == (True, False, True)
+    assert hit_test(12., 8., 11., 9., False, 'olhc') == (False, True, True)
+    assert hit_test(12., 8., 11., 9., False, 'pessimistic') \
+        == (True, False, True)
+
+    stop = np.array([9., 7., 9., 7.])
+    target = np.array([11., 11., 13., 13.])
+    stop_hit, target_hit, both = hit_test(12., 8., stop, target, True,
+                                          'pessimistic')
+    assert stop_hit.tolist() == [True, False, True, False]
+    assert target_hit.tolist() == [False, True, False, False]
+    assert both.tolist() == [True, False, False, False]
+
+    with pytest.raises(ValueError):
+        IntrabarFills('hloc')
+
+
+def test_drilldown():
+    """Test if ambiguous candles are resolved by their finer candles."""
+
+    coarse = BarArrays.from_frame(pd.DataFrame({
+        'open time': [0, 4], 'open': [10., 10.], 'high': [12., 12.],
+        'low': [8., 8.], 'close': [10., 10.], 'volume': [1., 1.]}))
+    # The first coarse candle goes up to 12 before it falls to 8.
+    fine = BarArrays.from_frame(pd.DataFrame({
+        'open time': [0, 1, 2, 3, 4, 5, 6, 7],
+        'open': [10.]*8, 'high': [10.5, 12., 10., 10., 11., 11., 12., 10.],
+        'low': [9.5, 10., 8., 10., 8., 10., 10., 10.],
+        'close': [10.]*8, 'volume': [1.]*8}))
+    drilldown = Drilldown.from_bars(coarse, fine)
+
+    assert drilldown.offsets.tolist() == [0, 4, 8]
+    assert len(drilldown.children(4)) == 4
+    assert len(drilldown.children(5)) == 0
+
+    fills = IntrabarFills('pessimistic', drilldown)
+    first = Bar(0, 10., 12., 8., 10., 1.)
+    assert fills.exits(first, 9., 11., True) == (False, True)
+    # The second coarse candle falls to 8 first.
+    second = Bar(4, 10., 12., 8., 10., 1.)
+    assert fills.exits(second, 9., 11., True) == (True, False)
+
+    stop_hit, target_hit = fills.exits(first, np.array([9., 9.5]),
+                                       np.array([11., 13.]), True)
+    assert stop_hit.tolist() == [False, True]
+    assert target_hit.tolist() == [True, False]
+
+
+def test_simulate_grid_intrabar():
+    """Test if lanes match single trade logs with intrabar fills, and if
+    the default fills at the close are unchanged."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/LINKBUSD/1h.csv')
+    fine = BarArrays.from_frame(pd.read_csv(
+        './database/datasets/binance_futures/LINKBUSD/15m.csv'))
+    drilldown = Drilldown.from_bars(BarArrays.from_frame(df), fine)
+
+    for fills in [IntrabarFills('ohlc'), IntrabarFills('pessimistic'),
+                  IntrabarFills('pessimistic', drilldown)]:
+        expected = make_trade_logs(df, 'LINKBUSD', timeframe='1h', fills=fills,
+                                   **GRID)
+        for log in expected:
+            log.simulate(df)
+
+        grid = make_trade_logs(df, 'LINKBUSD', timeframe='1h', fills=fills,
+                               **GRID)
+        TradeLog.simulate_grid(grid, df)
+
+        for log, expected_log in zip(grid, expected):
+            data, expected_data = log.trade_data, expected_log.trade_data
+            assert data.num_trades == expected_data.num_trades
+            assert data.wins == expected_data.wins
+            assert np.array_equal(data.equity_curve,
+                                  expected_data.equity_curve)
+        assert sum(log.trade_data.num_trades for log in grid) > 0
+
+    close = make_trade_logs(df, 'LINKBUSD', timeframe='1h', **GRID)
+    TradeLog.simulate_grid(close, df)
+
+    assert close[0].strategy.settings() == ()
+    assert not np.array_equal(close[0].trade_data.equity_curve,
+                              expected[0].trade_data.equity_curve)
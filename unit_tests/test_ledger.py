@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+from src.Bars import BarArrays
+from src.Ledger import Ledger
+from src.Strategy import TradeLog
+from unit_tests.helpers import make_trade_logs
+
+
+GRID = {'risks': [0.01, 0.05], 'leverages': [1],
+        'reward_risks': [1.0, 2.0, 3.0]}
+
+
+def test_ledger():
+    """Test if the ledger grows, computes its analytics on hand-made trades
+    and survives a round trip through a file."""
+
+    bars = BarArrays.from_frame(pd.DataFrame({
+        'open time': np.arange(6), 'open': [10.]*6,
+        'high': [11., 12., 10.5, 10., 13., 10.],
+        'low': [9., 9.5, 8., 9., 9.5, 10.],
+        'close': [10.]*6, 'volume': [1.]*6}))
+
+    ledger = Ledger(capacity=1)
+    ledger.open(0, 1, 10., 2., 0.)
+    ledger.close(2, 11., 0.)
+    ledger.open(3, -1, 10., 1., 0.)
+    ledger.close(4, 9., 0.)
+    ledger.open(5, 1, 10., 1., 0.)
+
+    assert len(ledger) == 3
+    assert ledger.trades['exit_bar'].tolist() == [2, 4, -1]
+    assert ledger.pnl().tolist() == [2., 1.]
+    assert ledger.holding_time().tolist() == [2, 1]
+    assert ledger.expectancy() == 1.5
+
+    adverse, favourable = ledger.excursions(bars)
+    assert np.allclose(adverse, [-0.2, -0.3])
+    assert np.allclose(favourable, [0.2, 0.1])
+
+    assert ledger.summary()['trades'] == 2
+    assert len(ledger.to_frame()) == 3
+
+
+def test_ledger_save_load(tmp_path):
+    """Test if a loaded ledger keeps its trades and open positions."""
+
+    ledger = Ledger()
+    for bar in range(41):
+        ledger.open(bar, 1, 10. + bar, 1., 0.01)
+        if bar % 2:
+            ledger.close(bar, 12., 0.0004)
+
+    path = tmp_path / 'ledger.npy'
+    ledger.save(path)
+    loaded = Ledger.load(path)
+    loaded.close(41, 15., 0.)
+
+    assert np.array_equal(loaded.trades[:-1], ledger.trades[:-1])
+    assert loaded.trades['exit_bar'][-1] == 41
+    assert Ledger.load(path).trades['exit_bar'][-1] == -1
+
+
+def test_simulate_grid_ledger():
+    """Test if lanes record the same trades as single trade logs, and if the
+    profits of the trades add up to the change in equity."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/LINKBUSD/1h.csv')
+
+    expected = make_trade_logs(df, 'LINKBUSD', timeframe='1h',
+                               record_trades=True, **GRID)
+    for log in expected:
+        log.simulate(df)
+
+    grid = make_trade_logs(df, 'LINKBUSD', timeframe='1h',
+                               record_trades=True, **GRID)
+    TradeLog.simulate_grid(grid, df)
+
+    for log, expected_log in zip(grid, expected):
+        ledger = log.trade_data.ledger
+        expected_ledger = expected_log.trade_data.ledger
+        assert ledger.to_frame().equals(expected_ledger.to_frame())
+        assert ledger.bar == expected_ledger.bar == len(df)
+
+        data = log.trade_data
+        assert len(ledger.closed()) == data.num_trades
+        if not data.position:
+            assert np.isclose(ledger.pnl().sum(), data.equity - 100.)
+
+    assert sum(len(log.trade_data.ledger) for log in grid) > 0
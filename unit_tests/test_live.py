@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.Strategy import TradeLog
+from src.utils.replay import CsvReplay, measure_latency
+from unit_tests.helpers import make_trade_log
+
+
+def test_push(tmp_path):
+    """Test if pushing candles one by one, with a save and resume in
+    between, matches simulating the whole dataset."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    expected = make_trade_log(df)
+    expected.simulate(df)
+
+    trade_log = make_trade_log(df)
+    trade_log.simulate(df.iloc[:2000])
+    trade_log.save(str(tmp_path / 'state.pkl'))
+    resumed = TradeLog.load(str(tmp_path / 'state.pkl'))
+
+    # Candles seen before saving are skipped.
+    source = CsvReplay('BTCBUSD', '4h', cache_dir=str(tmp_path))
+    equity = list(resumed.consume(source))
+
+    assert len(equity) == len(df) - 2000
+    assert resumed.last_open_time == df['open time'].iloc[-1]
+    assert np.array_equal(resumed.trade_data.equity_curve,
+                          expected.trade_data.equity_curve)
+    assert resumed.asset.snapshot() == expected.asset.snapshot()
+
+
+def test_replay(tmp_path):
+    """Test if the replay resumes after a candle and paces the candles."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/1d.csv')
+    start_after = int(df['open time'].iloc[-11])
+
+    # One day per millisecond, so ten candles take about 9 ms.
+    source = CsvReplay('BTCBUSD', '1d', speed=86400*1000,
+                       start_after=start_after, cache_dir=str(tmp_path))
+    assert len(source) == 10
+
+    start = time.perf_counter()
+    latencies = measure_latency(make_trade_log(df), source)
+
+    assert time.perf_counter() - start >= 0.009
+    assert latencies.shape == (10,)
+    assert (latencies >= 0).all()
+
+    async def consume() -> list:
+        trade_log = make_trade_log(df)
+        return [equity async for equity in trade_log.consume_async(source)]
+
+    assert len(asyncio.run(consume())) == 10
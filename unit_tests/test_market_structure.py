@@ -1,5 +1,6 @@
 import pandas as pd
 
+from src.Assets import Asset
 from src.MarketStructure import MarketStructure
 
 
@@ -123,3 +124,147 @@ def test_ms():
     assert ms.prev_low[0] == 55478.9
     assert ms.provisional_high[0] == 57642.1
     assert ms.provisional_low[0] == 55945.5
+
+
+def test_ms_batch():
+    """Test if the batch market structure matches next_candle on the
+    bundled datasets."""
+
+    datasets = [(ticker, timeframe)
+                for ticker in ['BTCBUSD', 'ETHBUSD', 'SOLBUSD', 'BNBBUSD',
+                               'DOGEBUSD', 'LINKBUSD', 'LTCBUSD', 'MATICBUSD',
+                               'XRPBUSD']
+                for timeframe in ['1d', '4h']] + [('BTCBUSD', '1h')]
+
+    for ticker, timeframe in datasets:
+        df = pd.read_csv('./database/datasets/binance_futures/'
+                         + ticker + '/' + timeframe + '.csv')
+        first = df.iloc[0]
+        date = first['open time']
+        ms = MarketStructure((first.high, date), (first.low, date),
+                             (first.high, date), (first.low, date))
+
+        structure = ms.batch(df)
+
+        assert len(structure) == len(df)
+
+        for idx, (_, row) in enumerate(df.iterrows()):
+            trend, msb, continuation, stay_in_range = ms.next_candle(row)
+
+            assert structure.state_at(idx)[0] == trend
+            assert structure.trend[idx] == ms.trend
+            assert structure.msb[idx] == msb
+            assert structure.continuation[idx] == continuation
+            assert structure.stay_in_range[idx] == stay_in_range
+            assert structure.prev_high[idx] == ms.prev_high[0]
+            assert structure.prev_high_time[idx] == ms.prev_high[1]
+            assert structure.prev_low[idx] == ms.prev_low[0]
+            assert structure.prev_low_time[idx] == ms.prev_low[1]
+            assert structure.provisional_high[idx] == ms.provisional_high[0]
+            assert (structure.provisional_high_time[idx]
+                    == ms.provisional_high[1])
+            assert structure.provisional_low[idx] == ms.provisional_low[0]
+            assert (structure.provisional_low_time[idx]
+                    == ms.provisional_low[1])
+
+
+def test_ms_attach():
+    """Test if replaying precomputed market structure matches computing it
+    candle by candle from any starting candle."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    first = df.iloc[0]
+    date = first['open time']
+    ms = MarketStructure((first.high, date), (first.low, date),
+                         (first.high, date), (first.low, date))
+    structure = ms.batch(df)
+
+    replayed = MarketStructure((1, 1), (1, 1), (1, 1), (1, 1))
+    replayed.attach(structure, 1000)
+
+    for idx, (_, row) in enumerate(df.iterrows()):
+        expected = ms.next_candle(row)
+        if idx >= 1000:
+            assert replayed.next_candle(row) == expected
+            assert replayed.prev_high == ms.prev_high
+            assert replayed.provisional_low == ms.provisional_low
+
+
+def test_ms_slice():
+    """Test if a slice of precomputed market structure replays like the
+    whole structure attached at the start of the slice."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    first = df.iloc[0]
+    date = first['open time']
+    ms = MarketStructure((first.high, date), (first.low, date),
+                         (first.high, date), (first.low, date))
+    structure = ms.batch(df)
+    part = structure[1000:2000]
+
+    assert len(part) == 1000
+    assert part.initial == structure.state_at(1000)
+    assert part.state_at(1000) == structure.state_at(2000)
+
+    whole = MarketStructure((1, 1), (1, 1), (1, 1), (1, 1))
+    whole.attach(structure, 1000)
+    sliced = MarketStructure((1, 1), (1, 1), (1, 1), (1, 1))
+    sliced.attach(part)
+
+    for _, row in df.iloc[1000:2000].iterrows():
+        assert sliced.next_candle(row) == whole.next_candle(row)
+    assert sliced.snapshot() == whole.snapshot()
+
+
+def test_ms_snapshot_restore():
+    """Test if market structure snapshots restore and copy the state
+    independently of later candles."""
+
+    ms = MarketStructure((58434.0, '2021-02-21 19:00:00+00:00'),
+                         (57465.0, '2021-02-21 18:00:00+00:00'),
+                         (58434.0, '2021-02-21 19:00:00+00:00'),
+                         (57465.0, '2021-02-21 18:00:00+00:00'))
+    initial = ms.snapshot()
+    copy = ms.copy()
+    asset = Asset('BTCBUSD', 3, ms)
+    asset_copy = asset.copy()
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/1h.csv')
+    df = df[(df['open time'] >= 1613934000000)
+            & (df['open time'] <= 1614081600000)]
+
+    for idx, row in df.iterrows():
+        ms.next_candle(row)
+
+    assert ms.snapshot() != initial
+    assert copy.snapshot() == initial
+    assert asset_copy.snapshot() == initial
+
+    final = asset.snapshot()
+    asset.restore(initial)
+    assert ms.snapshot() == initial
+
+    for idx, row in df.iterrows():
+        copy.next_candle(row)
+
+    assert copy.snapshot() == final
+
+
+def test_ms_levels():
+    """Test if the level tuples are computed from the separate price and
+    time slots."""
+
+    ms = MarketStructure((58434.0, 1613934000000), (57465.0, 1613930400000),
+                         (58434.0, 1613934000000), (57465.0, 1613930400000))
+
+    assert not hasattr(ms, '__dict__')
+    assert ms.prev_high == (58434.0, 1613934000000)
+    assert ms.provisional_low_price == 57465.0
+
+    ms.provisional_high = (58500.0, 1613937600000)
+    assert ms.provisional_high_price == 58500.0
+    assert ms.provisional_high_time == 1613937600000
+
+    state = ms.snapshot()
+    assert state.provisional_high == ms.provisional_high
+    assert state.prev_low == ms.prev_low
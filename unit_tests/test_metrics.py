@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from src.Assets import Asset, Params, TradeData
+from src.MarketStructure import MarketStructure
+from src.strategies.ContinuationTrade import ContinuationTrade
+from src.Strategy import TradeLog
+import src.utils.metrics as metrics
+
+
+def simulated_curves() -> list:
+    """Simulate a few parameter sets on BTCBUSD 4h data."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    first = df.iloc[0]
+    date = first['open time']
+    asset = Asset('BTCBUSD', 3,
+                  MarketStructure((first.high, date), (first.low, date),
+                                  (first.high, date), (first.low, date)))
+
+    curves = []
+    for risk, leverage in [(0.01, 1), (0.05, 5), (0.1, 10)]:
+        log = TradeLog(ContinuationTrade(), asset.copy(),
+                       Params(risk, 2.0, leverage, '4h'), TradeData(0.0004))
+        log.simulate(df)
+        curves.append(log.trade_data.equity_curve.copy())
+
+    return curves
+
+
+def assert_stats_match(running: dict, expected: dict) -> None:
+    """Compare running stats with the stats of the whole curve."""
+
+    assert np.isclose(running['mean'], expected['mean'], rtol=1e-9)
+    assert np.isclose(running['std'], expected['std'], rtol=1e-9)
+    for key in ['max_dd', 'coeff_of_var', 'sharpe', 'sortino', 'omega',
+                'musch']:
+        assert np.isclose(running[key], expected[key], atol=0.011)
+
+
+def test_running_stats():
+    """Test if running stats match the stats of the whole equity curve."""
+
+    for curve in simulated_curves():
+        stats = metrics.RunningStats()
+        for equity in curve:
+            stats.update(equity)
+
+        assert stats.count == len(curve)
+        assert_stats_match(stats.get_stats(), metrics.get_stats(curve))
+
+
+def test_running_stats_extend():
+    """Test if adding chunks of an equity curve matches single updates."""
+
+    for curve in simulated_curves():
+        stats = metrics.RunningStats()
+        for chunk in np.array_split(curve, 7):
+            stats.extend(chunk)
+
+        assert_stats_match(stats.get_stats(), metrics.get_stats(curve))
+
+
+def test_trade_data_track_stats():
+    """Test if trade data without an equity curve still tracks its stats."""
+
+    curve = simulated_curves()[1]
+    trade_data = TradeData(0.0)
+    trade_data.track_stats(keep_curve=False)
+
+    for equity in curve[1:]:
+        trade_data.append_equity(equity)
+
+    assert len(trade_data.equity_curve) == 1
+    assert trade_data.mark_to_market == curve[-1]
+    assert_stats_match(trade_data.stats.get_stats(),
+                       metrics.get_stats(curve))
+
+
+def test_max_drawdown():
+    """Test if the maximum draw down matches an explicit running maximum."""
+
+    for curve in simulated_curves():
+        m_max = 0.
+        maxDD = 0.
+        for equity in curve:
+            m_max = max(m_max, equity)
+            maxDD = min(maxDD, equity/m_max - 1)
+
+        assert metrics.calculate_max_drawdown(curve) == round(maxDD, 3)
+
+
+def test_metrics_2d():
+    """Test if the row-wise metrics match the metrics of every row."""
+
+    curves = np.stack(simulated_curves())
+    returns = metrics.calculate_returns_2d(curves)
+
+    for row, curve in enumerate(curves):
+        assert np.array_equal(returns[row], metrics.calculate_returns(curve))
+
+    for metric in [metrics.calculate_coeff_of_var, metrics.calculate_sharpe,
+                   metrics.calculate_sortino, metrics.calculate_omega]:
+        batch = metrics.BATCH_METRICS[metric](returns)
+        assert np.allclose(batch, [metric(row) for row in returns],
+                           atol=0.011)
+
+    for metric in [metrics.calculate_max_drawdown, metrics.calculate_musch]:
+        batch = metrics.BATCH_METRICS[metric](curves)
+        assert np.allclose(batch, [metric(curve) for curve in curves],
+                           atol=0.011)
@@ -0,0 +1,42 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from src.PaperTrading import ReplayServer
+from src.utils.replay import CsvReplay
+from unit_tests.helpers import make_trade_logs
+
+
+def test_replay_server(tmp_path):
+    """Test if every subscriber ends up where simulating its dataset gets
+    it, with bounded queues."""
+
+    frames = {ticker: pd.read_csv('./database/datasets/binance_futures/'
+                                  + ticker + '/4h.csv')
+              for ticker in ['BTCBUSD', 'ETHBUSD']}
+    server = ReplayServer({ticker: CsvReplay(ticker, '4h',
+                                             cache_dir=str(tmp_path))
+                           for ticker in frames})
+
+    trade_logs = {ticker: make_trade_logs(df)[:3]
+                  for ticker, df in frames.items()}
+    for ticker, logs in trade_logs.items():
+        for log in logs:
+            server.subscribe(ticker, log, maxsize=8)
+
+    asyncio.run(server.run())
+    report = server.report()
+
+    for ticker, df in frames.items():
+        for log, expected in zip(trade_logs[ticker],
+                                 make_trade_logs(df)[:3]):
+            expected.simulate(df)
+            assert np.array_equal(log.trade_data.equity_curve,
+                                  expected.trade_data.equity_curve)
+
+    assert len(report) == 6
+    assert (report.bars == [len(frames[source])
+                            for source in report.source]).all()
+    assert (report.p50_us <= report.p99_us).all()
+    assert (report.max_depth <= 8).all()
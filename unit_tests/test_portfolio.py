@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from src.Assets import MarginAccount
+from src.Bars import BarArrays
+from src.Portfolio import Portfolio, merge_index
+from unit_tests.helpers import make_trade_log
+
+
+def load(ticker: str) -> BarArrays:
+    return BarArrays.from_frame(pd.read_csv(
+        f'./database/datasets/binance_futures/{ticker}/1h.csv'))
+
+
+def test_merge_index():
+    """Test if events are ordered by time, and by dataset on equal times."""
+
+    legs, rows, times = merge_index([np.array([1, 3, 5]), np.array([2, 3]),
+                                     np.array([], dtype=np.int64)])
+
+    assert legs.tolist() == [0, 1, 0, 1, 0]
+    assert rows.tolist() == [0, 0, 1, 1, 2]
+    assert times.tolist() == [1, 2, 3, 3, 5]
+
+
+def test_margin_account():
+    """Test if entries are cut down to the headroom of the account."""
+
+    account = MarginAccount.with_legs(2, 100., max_leverage=2.)
+    account.mark(0, 1., 120.)
+    account.cash -= 120.
+
+    assert account.equity == 100.
+    assert account.headroom() == 80.
+    assert account.leg_equity(0) == -20.
+    assert account.cap(0.5, 100., 2) == 0.5
+    assert account.cap(1., 100., 0) == 0.
+    assert account.cap(1., 100., 3) == 0.8
+
+    account.mark(1, -2., 10.)
+    assert account.value == 100.
+    assert account.exposure == 140.
+
+
+def test_portfolio():
+    """Test if a single asset trades like on its own, and if several assets
+    share one account within its leverage cap."""
+
+    link = load('LINKBUSD')
+    expected = make_trade_log(link, ticker='LINKBUSD', decimals=1,
+                              timeframe='1h')
+    expected.simulate(link)
+
+    portfolio = Portfolio([make_trade_log(link, ticker='LINKBUSD',
+                                          decimals=1, timeframe='1h')],
+                          max_leverage=10.)
+    portfolio.simulate([link])
+    data = portfolio.trade_logs[0].trade_data
+
+    assert data.num_trades == expected.trade_data.num_trades
+    assert np.isclose(portfolio.equity_curve[-1],
+                      expected.trade_data.equity
+                      + expected.trade_data.position * link.close[-1])
+    assert len(portfolio.equity_curve) == len(np.unique(link.open_time)) + 1
+
+    tickers = [('BTCBUSD', 3), ('LINKBUSD', 1), ('XRPBUSD', 1)]
+    bars = [load(ticker) for ticker, _ in tickers]
+    trade_logs = []
+    for (ticker, decimals), ticker_bars in zip(tickers, bars):
+        trade_logs.append(make_trade_log(ticker_bars, ticker=ticker,
+                                         decimals=decimals, timeframe='1h'))
+        trade_logs[-1].trade_data.record_trades()
+    portfolio = Portfolio(trade_logs, max_leverage=1.)
+    portfolio.simulate(bars)
+
+    times = np.unique(np.concatenate([b.open_time for b in bars]))
+    assert np.array_equal(portfolio.open_time, times)
+    assert sum(log.trade_data.num_trades for log in trade_logs) > 0
+
+    # Every entry fits into the equity of the account at the last close,
+    # up to the price moves of the candle it is entered on.
+    for log, ticker_bars in zip(trade_logs, bars):
+        trades = log.trade_data.ledger.trades
+        entry_times = ticker_bars.open_time[trades['entry_bar']]
+        point = np.searchsorted(portfolio.open_time, entry_times)
+        assert np.all(trades['size'] * trades['entry_price']
+                      <= 1.1 * portfolio.equity_curve[point])
@@ -0,0 +1,61 @@
+import json
+import pstats
+
+import pandas as pd
+
+from src.Assets import TradeData
+from src.Backtest import Backtest
+from src.MarketStructure import MarketStructure
+from src.strategies.ContinuationTrade import ContinuationTrade
+from src.utils.profiling import Profiler
+import src.utils.metrics as metrics
+from unit_tests.helpers import make_trade_logs
+
+
+def test_profiler(tmp_path):
+    """Test if training counts every phase of every candidate, the same in
+    worker processes, and restores the timed methods afterwards."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    originals = (MarketStructure.next_bar, TradeData.append_equity,
+                 ContinuationTrade.next_bar_trade)
+    n = len(make_trade_logs(df))
+
+    profiler = Profiler(cprofile=True, trace_memory=True)
+    optimal_trade = Backtest(profiler=profiler).train(
+        make_trade_logs(df), df, metrics.calculate_returns,
+        metrics.calculate_sharpe)
+
+    assert profiler.bars == n * len(df)
+    assert profiler.simulations == n
+    for phase in ['trade', 'setup', 'structure', 'equity']:
+        assert profiler.calls[phase] == n * len(df)
+    assert profiler.seconds['setup'] >= profiler.seconds['structure'] > 0
+    assert profiler.peak_memory > 0
+    assert (MarketStructure.next_bar, TradeData.append_equity,
+            ContinuationTrade.next_bar_trade) == originals
+
+    profiler.save_json(tmp_path / 'profile.json')
+    with open(tmp_path / 'profile.json') as f:
+        assert json.load(f)['phases']['trade']['calls'] == n * len(df)
+    profiler.dump_stats(tmp_path / 'profile.prof')
+    assert pstats.Stats(str(tmp_path / 'profile.prof')).total_calls > 0
+
+    parallel = Profiler()
+    parallel_trade = Backtest(profiler=parallel).train(
+        make_trade_logs(df), df, metrics.calculate_returns,
+        metrics.calculate_sharpe, workers=2)
+
+    assert parallel_trade.params == optimal_trade.params
+    # The workers simulate every candidate, and the best one is simulated
+    # once more to record its equity curve.
+    assert parallel.simulations == n + 1
+    assert parallel.calls['trade'] == (n+1) * len(df)
+
+    vectorized = Profiler()
+    Backtest(profiler=vectorized).train(
+        make_trade_logs(df), df, metrics.calculate_returns,
+        metrics.calculate_sharpe, vectorized=True)
+
+    assert vectorized.bars == n * len(df)
+    assert vectorized.calls['trade'] == len(df)
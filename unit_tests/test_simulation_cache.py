@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.Backtest import Backtest
+from src.SimulationCache import SimulationCache
+from src.strategies.ContinuationTrade import ContinuationTrade
+import src.utils.metrics as metrics
+from unit_tests.helpers import make_trade_logs
+
+
+def train_and_test(bt: Backtest, df: pd.DataFrame, vectorized: bool,
+                   workers: int = 1):
+    """Train on the first 75% of df and test on the rest."""
+
+    train_idx = round(len(df) * 0.75)
+    optimal_trade = bt.train(make_trade_logs(df), df.iloc[:train_idx],
+                             metrics.calculate_returns,
+                             metrics.calculate_sharpe, workers=workers,
+                             vectorized=vectorized)
+    optimal_trade.trade_data.equity_curve = \
+        np.array([optimal_trade.trade_data.mark_to_market])
+
+    return bt.test(optimal_trade, df.iloc[train_idx:])
+
+
+def test_simulation_cache(tmp_path):
+    """Test if replaying cached results leaves the trade logs exactly as
+    simulating them, also when training in worker processes."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    expected = train_and_test(Backtest(), df, vectorized=False)
+
+    for vectorized, workers in [(False, 1), (True, 1), (False, 2)]:
+        cache = SimulationCache(str(tmp_path / f'{vectorized}-{workers}'))
+        bt = Backtest(cache)
+
+        for run in range(2):
+            optimal_trade = train_and_test(bt, df, vectorized, workers)
+
+            assert optimal_trade.params == expected.params
+            assert optimal_trade.trade_data == expected.trade_data
+            assert np.array_equal(optimal_trade.trade_data.equity_curve,
+                                  expected.trade_data.equity_curve)
+            assert optimal_trade.asset.snapshot() == expected.asset.snapshot()
+
+        assert (cache.hits, cache.misses) == (19, 19)
+
+
+def test_simulation_cache_eviction(tmp_path):
+    """Test if the cache stays below its size limit and can be
+    invalidated."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    cache = SimulationCache(str(tmp_path), max_bytes=10**5)
+    bt = Backtest(cache)
+
+    bt.train(make_trade_logs(df), df, metrics.calculate_returns,
+             metrics.calculate_sharpe, vectorized=True)
+
+    files = os.listdir(tmp_path)
+    assert 0 < len(files) < 18
+    assert sum(os.path.getsize(tmp_path / file) for file in files) <= 10**5
+
+    cache.invalidate(ContinuationTrade)
+    assert os.listdir(tmp_path) == []
@@ -1,6 +1,10 @@
+import numpy as np
+import pandas as pd
+
 from src.Assets import Asset, Params, TradeData
 from src.strategies.ContinuationTrade import ContinuationTrade
 from src.MarketStructure import MarketStructure
+from src.Strategy import TradeLog
 
 
 def test_strategy_long():
@@ -75,3 +79,98 @@ def test_strategy_close_short():
 
     assert trade_data.position == 0
     assert trade_data.equity == 100
+
+
+def test_simulate_columnar():
+    """Test if the columnar bar loop reproduces the pd.Series loop."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    first = df.iloc[0]
+
+    trade_logs = []
+    for _ in range(2):
+        ms = MarketStructure((first.high, first['open time']),
+                             (first.low, first['open time']),
+                             (first.high, first['open time']),
+                             (first.low, first['open time']))
+        trade_logs.append(TradeLog(ContinuationTrade(),
+                                   Asset('BTCBUSD', 3, ms),
+                                   Params(0.05, 2.0, 5, '4h'),
+                                   TradeData(0.0004)))
+
+    trade_logs[0].simulate(df, columnar=False)
+    trade_logs[1].simulate(df)
+
+    legacy, columnar = trade_logs[0].trade_data, trade_logs[1].trade_data
+
+    assert legacy.num_trades > 0
+    assert legacy.num_trades == columnar.num_trades
+    assert legacy.wins == columnar.wins
+    assert legacy.equity == columnar.equity
+    assert np.array_equal(legacy.equity_curve, columnar.equity_curve)
+
+
+def test_simulate_precomputed_structure():
+    """Test if simulating on precomputed market structure matches
+    computing it candle by candle."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    first = df.iloc[0]
+    date = first['open time']
+    ms = MarketStructure((first.high, date), (first.low, date),
+                         (first.high, date), (first.low, date))
+    structure = ms.batch(df)
+
+    trade_logs = [TradeLog(ContinuationTrade(),
+                           Asset('BTCBUSD', 3, ms.copy()),
+                           Params(0.05, 2.0, 5, '4h'),
+                           TradeData(0.0004))
+                  for _ in range(2)]
+
+    trade_logs[0].simulate(df)
+    trade_logs[1].simulate(df, structure=structure)
+
+    assert np.array_equal(trade_logs[0].trade_data.equity_curve,
+                          trade_logs[1].trade_data.equity_curve)
+    assert trade_logs[0].asset.ms.prev_high == trade_logs[1].asset.ms.prev_high
+
+
+def test_simulate_grid():
+    """Test if simulating a parameter grid in lanes matches simulating every
+    trade log on its own."""
+
+    for timeframe in ['4h', '1h']:
+        df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/'
+                         + timeframe + '.csv')
+        first = df.iloc[0]
+        date = first['open time']
+        asset = Asset('BTCBUSD', 3,
+                      MarketStructure((first.high, date), (first.low, date),
+                                      (first.high, date), (first.low, date)))
+
+        def make_trade_logs():
+            return [TradeLog(ContinuationTrade(), asset.copy(),
+                             Params(risk, rr, leverage, timeframe),
+                             TradeData(0.0004))
+                    for risk in np.linspace(0.01, 0.1, 5)
+                    for leverage in [1, 3, 5, 10]
+                    for rr in [2.0, 3.0]]
+
+        expected = make_trade_logs()
+        for log in expected:
+            log.simulate(df)
+
+        grid = make_trade_logs()
+        TradeLog.simulate_grid(grid, df)
+
+        for log, expected_log in zip(grid, expected):
+            data, expected_data = log.trade_data, expected_log.trade_data
+
+            assert data.num_trades == expected_data.num_trades
+            assert data.wins == expected_data.wins
+            assert data.long_position == expected_data.long_position
+            assert data.short_position == expected_data.short_position
+            assert data.equity == expected_data.equity
+            assert np.array_equal(data.equity_curve,
+                                  expected_data.equity_curve)
+            assert log.asset.ms.snapshot() == expected_log.asset.ms.snapshot()
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+from src.Bars import BarArrays
+from src.Strategy import TradeLog
+from src.utils.fills import IntrabarFills
+import src.utils.tracing as tracing
+from src.utils.tracing import Tracer
+from unit_tests.helpers import make_trade_logs
+
+
+def test_tracer():
+    """Test if the ring buffer keeps the newest events in order and counts
+    the overwritten ones."""
+
+    tracer = Tracer(4)
+    for idx in range(3):
+        tracer.record(10 + idx, tracing.STAYING_IN_RANGE)
+
+    assert len(tracer) == 3 and tracer.dropped == 0
+    assert tracer.events().tolist() == [[10, 4], [11, 4], [12, 4]]
+
+    for idx in range(3, 6):
+        tracer.record(10 + idx, tracing.UP_TREND_BROKEN)
+
+    assert len(tracer) == 4 and tracer.dropped == 2
+    assert tracer.events()[:, 0].tolist() == [12, 13, 14, 15]
+    assert tracer.decode()['event'].tolist() == \
+        ['Staying in Range'] + ['Up Trend Broken']*3
+
+    tracer.clear()
+    assert len(tracer) == 0 and tracer.events().shape == (0, 2)
+
+
+def test_tracing_simulation():
+    """Test if simulations record one structure event per candle and every
+    exit while tracing, and trade the same with tracing on and off."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    bars = BarArrays.from_frame(df)
+
+    untraced = make_trade_logs(df)[0]
+    untraced.simulate(df)
+
+    tracer = tracing.enable(1 << 16)
+    try:
+        traced = make_trade_logs(df)[0]
+        traced.simulate(df)
+    finally:
+        tracing.disable()
+
+    assert tracing.tracer is None
+    assert np.array_equal(traced.trade_data.equity_curve,
+                          untraced.trade_data.equity_curve)
+
+    events = tracer.decode(bars)
+    structure = events[events['code'] <= tracing.STAYING_IN_RANGE]
+    assert structure['bar'].tolist() == list(range(len(df)))
+    assert (events['open time'] == bars.open_time[events['bar']]).all()
+
+    exits = events['code'] > tracing.STAYING_IN_RANGE
+    take_profits = events['code'].isin([tracing.TAKE_PROFIT_LONG,
+                                        tracing.TAKE_PROFIT_SHORT])
+    trade_data = traced.trade_data
+    assert take_profits.sum() == trade_data.wins
+    assert trade_data.num_trades - 1 <= exits.sum() <= trade_data.num_trades
+
+
+def test_tracing_simulate_grid():
+    """Test if lanes replaying a precomputed market structure record the
+    same structure events as a single trade log and every exit of every
+    lane."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    bars = BarArrays.from_frame(df)
+
+    tracer = tracing.enable(1 << 16)
+    try:
+        make_trade_logs(df)[0].simulate(df)
+        expected = tracer.decode(bars)
+        for fills in [None, IntrabarFills('ohlc')]:
+            tracer.clear()
+            grid = make_trade_logs(df, fills=fills)
+            TradeLog.simulate_grid(grid, df, grid[0].asset.ms.batch(df))
+            events = tracer.decode(bars)
+
+            structure = events['code'] <= tracing.STAYING_IN_RANGE
+            assert events[structure]['code'].tolist() == \
+                expected[expected['code'] <= tracing.STAYING_IN_RANGE][
+                    'code'].tolist()
+
+            take_profits = events['code'].isin([tracing.TAKE_PROFIT_LONG,
+                                                tracing.TAKE_PROFIT_SHORT])
+            assert take_profits.sum() == \
+                sum(log.trade_data.wins for log in grid)
+            assert (~structure).sum() > 0
+    finally:
+        tracing.disable()
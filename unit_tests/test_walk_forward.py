@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from src.Backtest import Backtest
+from src.WalkForward import WalkForward, Window, stitch_equity
+import src.utils.metrics as metrics
+from unit_tests.helpers import make_trade_logs
+
+
+def test_windows():
+    """Test if rolling and anchored windows cover the data."""
+
+    assert WalkForward(100, 40).windows(220) == \
+        [Window(0, 100, 140), Window(40, 140, 180), Window(80, 180, 220)]
+    assert WalkForward(100, 50, anchored=True).windows(220) == \
+        [Window(0, 100, 150), Window(0, 150, 200), Window(0, 200, 220)]
+
+
+def test_walk_forward():
+    """Test if every window finds the optimum of training on its own
+    candles, for rolling and anchored windows."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    bt = Backtest()
+    trade_logs = make_trade_logs(df)
+    structure = trade_logs[0].asset.ms.batch(df)
+
+    for anchored, workers in [(False, 1), (False, 2), (True, 1)]:
+        wf = WalkForward(1500, 1000, anchored=anchored, workers=workers)
+        results = wf.run(trade_logs, df, metrics.calculate_returns,
+                         metrics.calculate_sharpe)
+
+        assert [result.window for result in results] == wf.windows(len(df))
+        for result in results:
+            train = slice(result.window.train_start, result.window.train_end)
+            expected = bt.train(make_trade_logs(df), df.iloc[train],
+                                metrics.calculate_returns,
+                                metrics.calculate_sharpe, structure[train])
+
+            assert result.optimal_trade.params == expected.params
+            assert np.array_equal(result.equity_train,
+                                  expected.trade_data.equity_curve)
+            assert len(result.equity_test) == \
+                result.window.test_end - result.window.train_end + 1
+
+        stitched = stitch_equity(results)
+        assert len(stitched) == len(df) - 1500 + 1
+        assert np.isclose(stitched[-1] / stitched[0], np.prod(
+            [result.equity_test[-1] / result.equity_test[0]
+             for result in results]))
+
+        # A second run reuses the optimum of every training window.
+        cached = wf.run(trade_logs, df, metrics.calculate_returns,
+                        metrics.calculate_sharpe)
+        for result, again in zip(results, cached):
+            assert np.array_equal(result.equity_test, again.equity_test)
+
+
+def test_walk_forward_cache_key():
+    """Test if the cached optima of the training windows are not reused
+    with another reward metric or on other candles."""
+
+    df = pd.read_csv('./database/datasets/binance_futures/BTCBUSD/4h.csv')
+    trade_logs = make_trade_logs(df)
+
+    wf = WalkForward(1500, 1000)
+    sharpe = wf.run(trade_logs, df, metrics.calculate_returns,
+                    metrics.calculate_sharpe)
+    # Wiped out candidates divide by a peak of zero.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = wf.run(trade_logs, df, metrics.calculate_returns,
+                          metrics.calculate_max_drawdown)
+        fresh = WalkForward(1500, 1000).run(trade_logs, df,
+                                            metrics.calculate_returns,
+                                            metrics.calculate_max_drawdown)
+
+    assert [result.optimal_trade.params for result in drawdown] == \
+        [result.optimal_trade.params for result in fresh]
+    assert [result.optimal_trade.params for result in drawdown] != \
+        [result.optimal_trade.params for result in sharpe]
+    assert len(wf._trained) == 2 * len(wf.windows(len(df)))
+
+    # Same opening times and first candle, other prices afterwards
+    scaled = df.copy()
+    scaled.loc[1:, ['open', 'high', 'low', 'close']] *= 2
+    wf.run(make_trade_logs(scaled), scaled, metrics.calculate_returns,
+           metrics.calculate_sharpe)
+    assert len(wf._trained) == 3 * len(wf.windows(len(df)))